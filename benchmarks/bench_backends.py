@@ -0,0 +1,48 @@
+"""
+Compares the yaml and SQLite backends: loading the whole config, loading lazily and getting one setting, and a durable
+single setting change, set then save.
+
+Usage: python benchmarks/bench_backends.py
+"""
+import os
+import tempfile
+import time
+
+import synthetic
+import wxconfig
+from wxconfig import backends
+
+
+def timed(function):
+    """
+    :return: seconds taken to call function
+    """
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        config_path, meta_path, tree = synthetic.write(directory, depth=3, width=10, leaves=20)
+        paths = synthetic.config_paths(tree)
+        database_path = os.path.join(directory, 'config.db')
+        backends.SqliteBackend(database_path).write(tree)
+        print(f"{len(paths)} settings")
+
+        for name, backend in [('yaml', lambda: backends.YamlBackend(config_path)),
+                              ('sqlite', lambda: backends.SqliteBackend(database_path))]:
+            config = wxconfig.Config.new_instance()
+            load = timed(lambda: config.load(backend()))
+
+            config = wxconfig.Config.new_instance()
+            lazy = timed(lambda: (config.load(backend(), lazy=True), config.get(paths[0])))
+
+            def change():
+                for i in range(10):
+                    config.set(paths[i], f'changed {i}')
+                    config.save()
+
+            save = timed(change) / 10
+            print(f"{name:7} load {load * 1000:9.2f}ms  lazy load and get {lazy * 1000:9.2f}ms  "
+                  f"set and save {save * 1000:9.2f}ms")
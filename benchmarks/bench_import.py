@@ -0,0 +1,44 @@
+"""
+Times importing wxconfig and loading a config in a fresh interpreter, and checks that wxPython is not imported.
+
+Usage: python benchmarks/bench_import.py [runs]
+"""
+import os
+import subprocess
+import sys
+
+TEST_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests')
+
+# Run in a fresh interpreter so that nothing is already imported
+SCRIPT = f"""
+import sys
+import time
+start = time.perf_counter()
+import wxconfig
+wxconfig.Config().load({os.path.join(TEST_DIR, 'testconfig.yaml')!r})
+elapsed = time.perf_counter() - start
+print(elapsed, 'wx' in sys.modules)
+"""
+
+
+def run(runs):
+    """
+    Imports wxconfig and loads the test config in runs fresh interpreters.
+    :param runs: number of interpreters to start
+    :return: list of elapsed times in seconds
+    """
+    times = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', SCRIPT], check=True, capture_output=True, text=True).stdout
+        elapsed, wx_imported = output.split()
+        if wx_imported != 'False':
+            raise AssertionError("import wxconfig and Config().load() imported wx.")
+        times.append(float(elapsed))
+
+    return times
+
+
+if __name__ == '__main__':
+    times = run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
+    print(f"import wxconfig + Config().load(): min {min(times) * 1000:.2f}ms, "
+          f"mean {sum(times) / len(times) * 1000:.2f}ms over {len(times)} runs. wx was not imported.")
@@ -0,0 +1,47 @@
+"""
+Times get and set with instrumentation disabled, enabled, and enabled without per path counts.
+
+Usage: python benchmarks/bench_instrumentation.py
+"""
+import random
+import tempfile
+import time
+
+import synthetic
+import wxconfig
+
+
+def time_operations(config, sample, repeat=5):
+    """
+    Times get and set for each path in the sample.
+    :return: tuple of best get and set time per call in seconds
+    """
+    get_times, set_times = [], []
+    for run in range(repeat):
+        start = time.perf_counter()
+        for path in sample:
+            config.get(path)
+        get_times.append((time.perf_counter() - start) / len(sample))
+
+        start = time.perf_counter()
+        for path in sample:
+            config.set(path, f'value {run}')
+        set_times.append((time.perf_counter() - start) / len(sample))
+
+    return min(get_times), min(set_times)
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        config_path, meta_path, tree = synthetic.write(directory, depth=3, width=8, leaves=12)
+        paths = synthetic.config_paths(tree)
+        sample = random.Random(0).sample(paths, min(2000, len(paths)))
+        config = wxconfig.Config()
+        config.load(config_path, meta=meta_path)
+
+        for name, enable in [('disabled', None), ('enabled', True), ('enabled, no paths', False)]:
+            if enable is not None:
+                config.enable_instrumentation(track_paths=enable)
+            get_time, set_time = time_operations(config, sample)
+            config.disable_instrumentation()
+            print(f"{name:18} get {get_time * 1e6:7.3f}us  set {set_time * 1e6:7.3f}us")
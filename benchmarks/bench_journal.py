@@ -0,0 +1,36 @@
+"""
+Times durable single setting changes, set then save, when saving the whole config file and when saving to a journal.
+
+Usage: python benchmarks/bench_journal.py
+"""
+import random
+import tempfile
+import time
+
+import synthetic
+import wxconfig
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        config_path, meta_path, tree = synthetic.write(directory, depth=3, width=10, leaves=10)
+        paths = synthetic.config_paths(tree)
+        sample = random.Random(0).sample(paths, 100)
+        config = wxconfig.Config()
+        config.load(config_path)
+        print(f"{len(paths)} settings")
+
+        for mode in ['file', 'journal']:
+            if mode == 'journal':
+                config.start_journal(max_bytes=64 * 1024 * 1024, max_age=3600)
+
+            start = time.perf_counter()
+            for i, path in enumerate(sample):
+                config.set(path, f'{mode} {i}')
+                config.save()
+            elapsed = (time.perf_counter() - start) / len(sample)
+            print(f"{mode:8} {elapsed * 1000:8.3f}ms per durable change")
+
+        start = time.perf_counter()
+        config.compact()
+        print(f"compact  {(time.perf_counter() - start) * 1000:8.3f}ms")
+        config.stop_journal()
@@ -0,0 +1,50 @@
+"""
+Compares load time and peak memory of a full load and a lazy load, getting a setting from one root node.
+
+Usage: python benchmarks/bench_lazy.py
+"""
+import tempfile
+import time
+import tracemalloc
+
+import synthetic
+import wxconfig
+
+
+def measure(load):
+    """
+    Runs load, measuring time and peak memory allocated.
+    :return: tuple of seconds and peak bytes
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    load()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        config_path, _, tree = synthetic.write(directory, depth=3, width=10, leaves=10)
+        config = wxconfig.Config()
+        path = synthetic.config_paths(tree)[0]
+        print(f"{len(synthetic.config_paths(tree))} settings in {len(tree)} root nodes")
+
+        def full():
+            config.load(config_path)
+            config.get(path)
+
+        def lazy():
+            config.load(config_path, lazy=True)
+            config.get(path)
+
+        def lazy_roots_only():
+            config.load(config_path, lazy=True)
+            config.get_root_nodes()
+
+        for name, load in [('full load + get', full), ('lazy load + get', lazy),
+                           ('lazy load + get_root_nodes', lazy_roots_only)]:
+            elapsed, peak = measure(load)
+            print(f"{name:28} {elapsed * 1000:8.2f}ms  peak {peak / 1024 / 1024:6.2f}MB")
@@ -0,0 +1,55 @@
+"""
+Compares config loads without a cache, with a cold cache (parse and write cache) and with a warm cache.
+
+Usage: python benchmarks/bench_load_cache.py
+"""
+import os
+import tempfile
+import time
+import yaml
+
+import synthetic
+import wxconfig
+from wxconfig import cache
+
+
+def timed(fn, runs=5):
+    """
+    Runs fn runs times.
+    :return: fastest time in seconds
+    """
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        config_path, meta_path, _ = synthetic.write(directory, depth=3, width=6, leaves=12)
+        cache_dir = os.path.join(directory, 'cache')
+        size = os.path.getsize(config_path) + os.path.getsize(meta_path)
+        config = wxconfig.Config()
+
+        def pure_python():
+            for path in [config_path, meta_path]:
+                with open(path) as file:
+                    yaml.safe_load(file)
+
+        def cold():
+            for path in [config_path, meta_path]:
+                if os.path.exists(cache.cache_filepath(path, cache_dir)):
+                    os.remove(cache.cache_filepath(path, cache_dir))
+            config.load(config_path, meta=meta_path, cache_dir=cache_dir)
+
+        def warm():
+            config.load(config_path, meta=meta_path, cache_dir=cache_dir)
+
+        print(f"Config and metadata: {size / 1024:.0f}KB, libyaml: {cache.Loader is not yaml.SafeLoader}")
+        print(f"yaml.safe_load:     {timed(pure_python) * 1000:8.2f}ms")
+        print(f"load, no cache:     {timed(lambda: config.load(config_path, meta=meta_path)) * 1000:8.2f}ms")
+        print(f"load, cold cache:   {timed(cold) * 1000:8.2f}ms")
+        print(f"load, warm cache:   {timed(warm) * 1000:8.2f}ms")
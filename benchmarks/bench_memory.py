@@ -0,0 +1,45 @@
+"""
+Compares the memory used by a large config stored as dicts with a path index, and stored as a compact tree. Reports
+the estimated resident size of the loaded snapshot, the memory still allocated once loaded and the time to get
+100,000 settings.
+
+Usage: python benchmarks/bench_memory.py
+"""
+import gc
+import random
+import tempfile
+import time
+import tracemalloc
+
+import synthetic
+import wxconfig
+from wxconfig import store
+
+GETS = 100000
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        config_path, _, tree = synthetic.write(directory, depth=4, width=10, leaves=10)
+        paths = synthetic.config_paths(tree)
+        generator = random.Random(0)
+        gets = [generator.choice(paths) for _ in range(GETS)]
+        del tree
+        print(f"{len(paths)} settings")
+
+        for name, compact in [('dicts', False), ('compact', True)]:
+            config = wxconfig.Config.new_instance()
+            gc.collect()
+            tracemalloc.start()
+            config.load(config_path, compact=compact)
+            gc.collect()
+            allocated = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            size = store.resident_size(config.snapshot())
+
+            start = time.perf_counter()
+            for path in gets:
+                config.get(path)
+            get = time.perf_counter() - start
+            print(f"{name:8} resident {size / 1024 / 1024:7.2f}MB  allocated {allocated / 1024 / 1024:7.2f}MB  "
+                  f"get {get / GETS * 1e6:6.3f}us")
+            del config
@@ -0,0 +1,34 @@
+"""
+Times saving a single changed setting when the change is patched into the config file, and when the whole file is
+written because the structure of the config has changed.
+
+Usage: python benchmarks/bench_patch.py
+"""
+import random
+import tempfile
+import time
+
+import synthetic
+import wxconfig
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        config_path, meta_path, tree = synthetic.write(directory, depth=3, width=10, leaves=20)
+        paths = synthetic.config_paths(tree)
+        sample = random.Random(0).sample(paths, 20)
+        config = wxconfig.Config()
+        config.load(config_path)
+        print(f"{len(paths)} settings")
+
+        # The first patch records the position of every value in the file
+        start = time.perf_counter()
+        config.set(sample[0], 'first')
+        config.save()
+        print(f"first patch  {(time.perf_counter() - start) * 1000:9.2f}ms")
+
+        for name, value in [('patch', 'changed {}'), ('full write', ['changed {}'])]:
+            start = time.perf_counter()
+            for i, path in enumerate(sample):
+                config.set(path, value.format(i) if isinstance(value, str) else [value[0].format(i)])
+                config.save()
+            print(f"{name:12} {(time.perf_counter() - start) / len(sample) * 1000:9.2f}ms per save")
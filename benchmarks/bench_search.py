@@ -0,0 +1,28 @@
+"""
+Times building the search index and searching as each character of a search is typed.
+
+Usage: python benchmarks/bench_search.py
+"""
+import tempfile
+import time
+
+import synthetic
+import wxconfig
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        config_path, meta_path, tree = synthetic.write(directory, depth=3, width=8, leaves=12)
+        config = wxconfig.Config()
+        config.load(config_path, meta=meta_path)
+        print(f"{len(synthetic.config_paths(tree))} settings")
+
+        start = time.perf_counter()
+        config.search('x')
+        print(f"build index:  {(time.perf_counter() - start) * 1000:8.2f}ms")
+
+        query = 'root_3.branch_2.branch_5.value_1'
+        for length in range(1, len(query) + 1):
+            start = time.perf_counter()
+            matches = config.search(query[:length], limit=100)
+            elapsed = time.perf_counter() - start
+            print(f"{query[:length]:34} {elapsed * 1000:8.3f}ms  {len(matches)} results")
@@ -0,0 +1,44 @@
+"""
+Times working out what the settings dialog shows, the tabs, every branch and the leaves of every branch, when the
+dialog is first opened and when it is opened again. Doesn't need wx.
+
+Usage: python benchmarks/bench_settings_model.py
+"""
+import tempfile
+import time
+
+import synthetic
+import wxconfig
+
+
+def open_dialog(model):
+    """
+    Gets everything the settings dialog would show if every branch were expanded and selected.
+    :param model: SettingsModel
+    :return: number of settings shown
+    """
+    count = 0
+    pending = list(model.root_nodes(['settings_window']))
+    while len(pending) > 0:
+        path = pending.pop()
+        count += len(model.leaves(path))
+        for branch_path, _, _, _ in model.branches(path):
+            pending.append(branch_path)
+            count += 1
+    return count
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        config_path, meta_path, tree = synthetic.write(directory, depth=3, width=10, leaves=10)
+        config = wxconfig.Config.new_instance()
+        config.load(config_path, meta=meta_path)
+        model = config.settings_model()
+        path = synthetic.config_paths(tree)[0]
+
+        for name in ['first opening', 'reopening', 'reopening after set']:
+            if name == 'reopening after set':
+                config.set(path, 'changed')
+            start = time.perf_counter()
+            count = open_dialog(model)
+            print(f"{name:20} {count} settings {(time.perf_counter() - start) * 1000:9.2f}ms")
@@ -0,0 +1,84 @@
+"""
+Compares pre-forked workers each loading the config with workers attaching to a shared snapshot. Prints the time to
+load or attach, the time to get a sample of settings, and each workers proportional set size (its private memory plus
+its share of memory shared with other processes). PSS is read from /proc, so is only reported on Linux.
+
+Usage: python benchmarks/bench_shared.py [workers]
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+import synthetic
+import wxconfig
+
+
+def pss():
+    """
+    :return: proportional set size of this process in MB. None if not available.
+    """
+    try:
+        with open('/proc/self/smaps_rollup') as file:
+            for line in file:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def worker(mode, config_path, shared_path, sample, results):
+    """
+    Loads or attaches to the config, gets the sample, then reports timings and memory.
+    """
+    start = time.perf_counter()
+    if mode == 'load':
+        config = wxconfig.Config.new_instance()
+        config.load(config_path)
+    else:
+        config = wxconfig.SharedSnapshot(shared_path)
+    ready = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for path in sample:
+        config.get(path)
+    get = (time.perf_counter() - start) / len(sample)
+
+    results.put((ready, get, pss()))
+
+
+if __name__ == '__main__':
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    context = multiprocessing.get_context('fork')
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_path, meta_path, tree = synthetic.write(directory, depth=4, width=10, leaves=10)
+        paths = synthetic.config_paths(tree)
+        sample = random.Random(0).sample(paths, 1000)
+        shared_path = os.path.join(directory, 'config.shared')
+
+        start = time.perf_counter()
+        config = wxconfig.Config()
+        config.load(config_path)
+        config.publish_shared(shared_path)
+        print(f"{len(paths)} settings, publish {(time.perf_counter() - start) * 1000:.1f}ms, "
+              f"{os.path.getsize(shared_path) / 1024 / 1024:.1f}MB shared file")
+        del config
+
+        for mode in ['load', 'attach']:
+            results = context.Queue()
+            processes = [context.Process(target=worker, args=(mode, config_path, shared_path, sample, results))
+                         for _ in range(workers)]
+            for process in processes:
+                process.start()
+            measurements = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+
+            ready = max(x[0] for x in measurements)
+            get = max(x[1] for x in measurements)
+            memory = [x[2] for x in measurements if x[2] is not None]
+            memory = f"{sum(memory) / len(memory):8.1f}MB" if len(memory) > 0 else "     n/a"
+            print(f"{mode:7} {workers} workers: ready {ready * 1000:8.1f}ms  get {get * 1e6:7.2f}us  pss {memory}")
@@ -0,0 +1,89 @@
+"""
+Measures get throughput as the number of reader threads grows, with a writer thread setting values throughout, in
+the default and thread safe modes. Also times set on a large config in each mode.
+
+Usage: python benchmarks/bench_threads.py [max_threads]
+"""
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import synthetic
+import wxconfig
+
+DURATION = 1.0
+SETS = 10000
+
+
+def measure(config, paths, threads):
+    """
+    Runs reader threads and a writer thread for DURATION seconds.
+    :return: tuple of reads per second and writes per second
+    """
+    stop = threading.Event()
+    reads = [0] * threads
+    writes = [0]
+
+    def read(slot):
+        rnd = random.Random(slot)
+        count = 0
+        while not stop.is_set():
+            for path in rnd.sample(paths, 100):
+                config.get(path)
+            count += 100
+        reads[slot] = count
+
+    def write():
+        rnd = random.Random()
+        count = 0
+        while not stop.is_set():
+            path = rnd.choice(paths)
+            config.set(path, f'value {count}')
+            count += 1
+            time.sleep(0.001)
+        writes[0] = count
+
+    workers = [threading.Thread(target=read, args=(slot, )) for slot in range(threads)]
+    workers.append(threading.Thread(target=write))
+    for worker in workers:
+        worker.start()
+    time.sleep(DURATION)
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    return sum(reads) / DURATION, writes[0] / DURATION
+
+
+if __name__ == '__main__':
+    max_threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    with tempfile.TemporaryDirectory() as directory:
+        config_path, _, tree = synthetic.write(directory, depth=3, width=6, leaves=12)
+        paths = synthetic.config_paths(tree)
+        config = wxconfig.Config()
+        print(f"{len(paths)} settings")
+
+        for thread_safe in [False, True]:
+            config.load(config_path)
+            config.set_thread_safe(thread_safe)
+            threads = 1
+            while threads <= max_threads:
+                reads, writes = measure(config, paths, threads)
+                print(f"thread safe: {thread_safe!s:5}  readers: {threads:3}  reads/s: {reads:12,.0f}  "
+                      f"writes/s: {writes:8,.0f}")
+                threads *= 2
+
+        # Thread safe sets copy the changed branches and index entries, so should cost about the same for any size
+        config_path, _, tree = synthetic.write(directory, depth=4, width=10, leaves=10)
+        paths = synthetic.config_paths(tree)
+        updates = [random.Random(0).choice(paths) for _ in range(SETS)]
+        print(f"{len(paths)} settings")
+        for thread_safe in [False, True]:
+            config.load(config_path)
+            config.set_thread_safe(thread_safe)
+            start = time.perf_counter()
+            for i, path in enumerate(updates):
+                config.set(path, f'value {i}')
+            print(f"thread safe: {thread_safe!s:5}  set: {(time.perf_counter() - start) / SETS * 1000:8.4f}ms")
@@ -0,0 +1,48 @@
+"""
+Times validating and setting 100,000 updates, entered as strings as in the settings dialog, with constraints on every
+setting and without constraints. Also times compiling the constraints when the metadata is loaded.
+
+Usage: python benchmarks/bench_validation.py
+"""
+import os
+import random
+import tempfile
+import time
+
+import synthetic
+import wxconfig
+
+UPDATES = 100000
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        config_path, meta_path, tree = synthetic.write(directory, depth=3, width=10, leaves=10)
+        constrained_directory = os.path.join(directory, 'constrained')
+        os.mkdir(constrained_directory)
+        _, constrained_meta_path, _ = synthetic.write(constrained_directory, depth=3, width=10, leaves=10,
+                                                      constraints=True)
+        paths = synthetic.config_paths(tree)
+        generator = random.Random(0)
+        updates = [generator.choice(paths) for _ in range(UPDATES)]
+        print(f"{len(paths)} settings, {UPDATES} updates")
+
+        for name, meta in [('no constraints', meta_path), ('constraints', constrained_meta_path)]:
+            config = wxconfig.Config.new_instance()
+            start = time.perf_counter()
+            config.load(config_path, meta=meta)
+            print(f"{name:15} load {(time.perf_counter() - start) * 1000:9.2f}ms")
+
+            # Values as strings, as entered in the settings dialog
+            values = [str(config.get(path)) for path in updates]
+
+            start = time.perf_counter()
+            for path, value in zip(updates, values):
+                config.validate(path, value)
+            validate = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for i in range(0, UPDATES, 1000):
+                config.set_many(dict(zip(updates[i:i + 1000], values[i:i + 1000])), save=False)
+            set_many = time.perf_counter() - start
+            print(f"{name:15} validate {validate / UPDATES * 1e6:7.3f}us  set_many {set_many / UPDATES * 1e6:7.3f}us "
+                  f"per update")
@@ -0,0 +1,222 @@
+"""
+Benchmark suite for Config and the settings dialog. Times load, get, set, save, get_meta and get_root_nodes on
+synthetic configs of several shapes, and optionally SettingsDialog construction and tab and tree switching. Results
+are written as JSON so that they can be compared across commits.
+
+Usage:
+    python benchmarks/suite.py [--shapes small,medium] [--output results.json] [--compare baseline.json]
+    xvfb-run python benchmarks/suite.py --gui    # Include the dialog. Needs wxPython and a display, e.g. Xvfb.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import synthetic
+import wxconfig
+
+# name -> (depth, width, leaves)
+SHAPES = {
+    'small': (2, 3, 5),
+    'medium': (3, 6, 10),
+    'wide': (1, 40, 40),
+    'deep': (6, 2, 4),
+    'large': (3, 10, 20),
+}
+
+
+def timeit(fn, repeat, number=1):
+    """
+    Times fn.
+    :param fn: function to time
+    :param repeat: number of timings
+    :param number: calls of fn per timing
+    :return: list of seconds per call
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return times
+
+
+def result(shape, operation, times, settings):
+    """
+    Makes a result record.
+    :return: dict
+    """
+    return {'shape': shape, 'operation': operation, 'settings': settings, 'runs': len(times),
+            'min': min(times), 'median': statistics.median(times), 'mean': statistics.mean(times)}
+
+
+def bench_config(shape, directory, repeat):
+    """
+    Benchmarks Config operations for a shape.
+    :return: list of results
+    """
+    depth, width, leaves = SHAPES[shape]
+    config_path, meta_path, tree = synthetic.write(directory, depth, width, leaves)
+    paths = synthetic.config_paths(tree)
+    settings = len(paths)
+    sample = random.Random(0).sample(paths, min(1000, settings))
+    config = wxconfig.Config()
+    results = []
+
+    def load():
+        config.load(config_path, meta=meta_path)
+
+    results.append(result(shape, 'load', timeit(load, repeat), settings))
+
+    def get():
+        for path in sample:
+            config.get(path)
+
+    results.append(result(shape, 'get', [t / len(sample) for t in timeit(get, repeat)], settings))
+
+    def get_meta():
+        for path in sample:
+            config.get_meta(path, '__label')
+
+    results.append(result(shape, 'get_meta', [t / len(sample) for t in timeit(get_meta, repeat)], settings))
+
+    results.append(result(shape, 'get_root_nodes', timeit(config.get_root_nodes, repeat, 100), settings))
+
+    counter = [0]
+
+    def set_values():
+        counter[0] += 1
+        for path in sample:
+            config.set(path, f'value {counter[0]}')
+
+    results.append(result(shape, 'set', [t / len(sample) for t in timeit(set_values, repeat)], settings))
+
+    def save():
+        # Change a value so that save has something to write
+        counter[0] += 1
+        config.set(sample[0], f'value {counter[0]}')
+        config.save()
+
+    results.append(result(shape, 'save', timeit(save, repeat), settings))
+
+    return results
+
+
+def bench_dialog(shape, directory, repeat):
+    """
+    Benchmarks SettingsDialog construction and switching between tabs and tree items for a shape.
+    :return: list of results
+    """
+    import wx
+
+    depth, width, leaves = SHAPES[shape]
+    config_path, meta_path, tree = synthetic.write(directory, depth, width, leaves)
+    settings = len(synthetic.config_paths(tree))
+    wxconfig.Config().load(config_path, meta=meta_path)
+    app = wx.App(False)
+    results = []
+
+    def construct():
+        wxconfig.SettingsDialog(parent=None).Destroy()
+
+    results.append(result(shape, 'dialog_construct', timeit(construct, repeat), settings))
+
+    dialog = wxconfig.SettingsDialog(parent=None)
+    notebook = [child for child in dialog.GetChildren() if isinstance(child, wx.Notebook)][0]
+
+    def switch_tabs():
+        for page in range(notebook.GetPageCount()):
+            notebook.SetSelection(page)
+            wx.Yield()
+
+    results.append(result(shape, 'dialog_switch_tab', [t / notebook.GetPageCount()
+                                                       for t in timeit(switch_tabs, repeat)], settings))
+
+    tree_ctrl = [child for child in notebook.GetPage(0).GetChildren() if isinstance(child, wx.TreeCtrl)][0]
+
+    def switch_tree():
+        # Select every top level branch under the root
+        item, cookie = tree_ctrl.GetFirstChild(tree_ctrl.GetRootItem())
+        while item.IsOk():
+            tree_ctrl.SelectItem(item)
+            wx.Yield()
+            item, cookie = tree_ctrl.GetNextChild(tree_ctrl.GetRootItem(), cookie)
+
+    count = tree_ctrl.GetChildrenCount(tree_ctrl.GetRootItem(), recursively=False)
+    results.append(result(shape, 'dialog_switch_tree', [t / max(count, 1) for t in timeit(switch_tree, repeat)],
+                          settings))
+
+    dialog.Destroy()
+    app.Destroy()
+    return results
+
+
+def commit():
+    """
+    Gets the current git commit.
+    :return: commit hash. None if not in a git repository.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """
+    Prints the change in median time against a baseline results file.
+    :return:
+    """
+    with open(baseline_path) as file:
+        baseline = {(r['shape'], r['operation']): r for r in json.load(file)['results']}
+
+    print(f"\nCompared with {baseline_path}:")
+    for r in results:
+        base = baseline.get((r['shape'], r['operation']))
+        if base is not None:
+            print(f"{r['shape']:8} {r['operation']:20} {r['median'] / base['median']:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shapes', default='small,medium,wide,deep', help=f"comma separated, from {list(SHAPES)}")
+    parser.add_argument('--repeat', type=int, default=5, help="timings per operation")
+    parser.add_argument('--gui', action='store_true', help="include the settings dialog")
+    parser.add_argument('--output', help="file to write JSON results to. Printed if not set.")
+    parser.add_argument('--compare', help="JSON results file to compare with")
+    args = parser.parse_args()
+
+    results = []
+    for shape in args.shapes.split(','):
+        with tempfile.TemporaryDirectory() as directory:
+            results.extend(bench_config(shape, directory, args.repeat))
+        if args.gui:
+            with tempfile.TemporaryDirectory() as directory:
+                results.extend(bench_dialog(shape, directory, args.repeat))
+
+    report = {'commit': commit(), 'time': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+              'python': sys.version.split()[0], 'platform': platform.platform(), 'results': results}
+
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        for r in results:
+            print(f"{r['shape']:8} {r['operation']:20} {r['settings']:7} settings  median {r['median'] * 1e6:12.2f}us")
+
+    if args.compare is not None:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Generates synthetic config and metadata files for benchmarks.
+"""
+import os
+import yaml
+
+
+def make_config(depth, width, leaves):
+    """
+    Makes a config tree.
+    :param depth: number of branch levels below the root nodes
+    :param width: number of root nodes, and number of branches under every branch
+    :param leaves: number of leaf settings in every branch
+    :return: config as a dict
+    """
+    def branch(path, level):
+        node = {}
+        for leaf in range(leaves):
+            # Mix of value types, as found in real configs
+            node[f'value_{leaf}'] = [f'text value {path}.{leaf}', leaf, leaf * 1.5, leaf % 2 == 0][leaf % 4]
+        if level < depth:
+            for child in range(width):
+                node[f'branch_{child}'] = branch(f'{path}.branch_{child}', level + 1)
+        return node
+
+    return {f'root_{root}': branch(f'root_{root}', 1) for root in range(width)}
+
+
+def make_meta(config, constraints=False):
+    """
+    Makes a metadata tree with a label and helptext for every branch and leaf in config.
+    :param config: config as a dict
+    :param constraints: True to add a __type, and limits or a pattern, to every leaf
+    :return: metadata as a dict
+    """
+    meta = {}
+    for key, value in config.items():
+        node = make_meta(value, constraints) if isinstance(value, dict) else {}
+        node['__label'] = key.replace('_', ' ').title()
+        node['__helptext'] = f'Help for {key}'
+        if constraints and not isinstance(value, dict):
+            node['__type'] = type(value).__name__
+            if isinstance(value, str):
+                node['__pattern'] = '[^\n]*'
+            elif not isinstance(value, bool):
+                node['__min'] = 0
+                node['__max'] = 1000000
+        meta[key] = node
+    return meta
+
+
+def config_paths(config, path=None):
+    """
+    Gets the path of every leaf setting in config.
+    :param config: config as a dict
+    :param path: path to config, None for root.
+    :return: list of dotted paths
+    """
+    paths = []
+    for key, value in config.items():
+        key_path = key if path is None else f'{path}.{key}'
+        if isinstance(value, dict):
+            paths.extend(config_paths(value, key_path))
+        else:
+            paths.append(key_path)
+    return paths
+
+
+def write(directory, depth, width, leaves, constraints=False):
+    """
+    Writes a synthetic config and metadata file.
+    :param directory: directory to write to
+    :param depth: see make_config
+    :param width: see make_config
+    :param leaves: see make_config
+    :param constraints: see make_meta
+    :return: tuple of config path, metadata path and config dict
+    """
+    config = make_config(depth, width, leaves)
+    config_path = os.path.join(directory, 'config.yaml')
+    meta_path = os.path.join(directory, 'configmeta.yaml')
+    for path, tree in [(config_path, config), (meta_path, make_meta(config, constraints))]:
+        with open(path, 'w') as file:
+            file.write("---\n")
+            yaml.dump(tree, file, sort_keys=False)
+            file.write("...")
+    return config_path, meta_path, config
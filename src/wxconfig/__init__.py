@@ -1,2 +1,17 @@
 from wxconfig.config import Config
-from wxconfig.wxconfiggui import SettingsDialog
+from wxconfig.shared import SharedSnapshot
+from wxconfig.store import ConfigStore
+
+
+def __getattr__(name):
+    """
+    Imports the settings dialog on first access. wxPython is only loaded by applications that use the dialog, so
+    headless applications that only use Config don't pay for it.
+    :param name: attribute name
+    :return: the attribute
+    """
+    if name == 'SettingsDialog':
+        from wxconfig.wxconfiggui import SettingsDialog
+        return SettingsDialog
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
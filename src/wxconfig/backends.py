@@ -0,0 +1,311 @@
+import codecs
+import contextlib
+import functools
+import sqlite3
+import yaml
+from wxconfig import cache
+from wxconfig import lazyload
+from wxconfig import snapshot
+from wxconfig import watcher
+from wxconfig import writer
+from wxconfig import yamlpatch
+
+
+class Backend(object):
+    """
+    Storage for a config. Config.load reads the config from a backend, and Config.save writes it back.
+    """
+
+    # True if write only needs the changes made since the last write, so the whole config doesn't need reading first
+    incremental = False
+
+    def __init__(self, path):
+        """
+        :param path: path to the file that the config is stored in
+        """
+        self.path = path
+
+    def read(self):
+        """
+        Reads the whole config.
+        :return: config tree
+        """
+        raise NotImplementedError()
+
+    def read_lazily(self):
+        """
+        Reads the root keys of the config, so that each root node can be read when a setting in it is first used.
+        :return: object with keys, find_root and parse methods and an unparsed set, see lazyload.LazyDocument. None if
+            the config can't be read lazily.
+        """
+        return None
+
+    def write(self, config, changes=None):
+        """
+        Writes the config.
+        :param config: config tree. May have unread root nodes if the backend is incremental.
+        :param changes: list of (path, value) changed since the config was read or last written, in the order they
+            were made. None if not known, in which case the whole config must be written.
+        :return: list of files written
+        """
+        raise NotImplementedError()
+
+    def files(self):
+        """
+        Gets the files that the config is stored in.
+        :return: list of paths
+        """
+        return [self.path]
+
+
+class YamlBackend(Backend):
+    """
+    A config stored in a yaml file. If only scalar values have changed since the file was read or last written, and the
+    file hasn't been changed by anything else, the changed values are patched in place, keeping the files comments and
+    formatting. Otherwise the whole file is written.
+    """
+
+    def __init__(self, path, cache_dir=None):
+        """
+        :param path: path to yaml file
+        :param cache_dir: directory to cache the parsed file in. Optional, see Config.load.
+        """
+        Backend.__init__(self, path)
+        self.cache_dir = cache_dir
+        self.__stat = None  # stat of the file when last read or written
+        self.__document = None  # PatchableDocument of the file when last read or written. Composed on first patch.
+        self.__bom = False  # True if the file starts with a byte order mark, which is kept when it is patched
+
+    def read(self):
+        self.__stat = watcher.signature(self.path)
+        self.__document = None
+        return cache.load_yaml(self.path, self.cache_dir)
+
+    def read_lazily(self):
+        self.__stat = watcher.signature(self.path)
+        self.__document = None
+        with open(self.path, 'r') as yamlfile:
+            return lazyload.LazyDocument.scan(yamlfile.read())
+
+    def write(self, config, changes=None):
+        text = None if changes is None else self.__patch(changes)
+        if text is None:
+            text = writer.dump_yaml(config)
+            self.__document = None
+
+        try:
+            writer.atomic_write(self.path, text.encode())
+        except BaseException:
+            # The patched document is no longer the file
+            self.__document = None
+            raise
+        self.__stat = watcher.signature(self.path)
+        return [self.path]
+
+    def __patch(self, changes):
+        """
+        Patches the changes into the file as it was last read or written.
+        :param changes: list of (path, value)
+        :return: the patched file. None if the file can't be patched.
+        """
+        if self.__stat is None or watcher.signature(self.path) != self.__stat:
+            return None
+
+        document = self.__document
+        if document is None:
+            # Positions in the document are found without the byte order mark, so it is removed and added back
+            with open(self.path, 'rb') as yamlfile:
+                data = yamlfile.read()
+            self.__bom = data.startswith(codecs.BOM_UTF8)
+            document = yamlpatch.PatchableDocument.compose(data.decode('utf-8-sig'))
+            if document is None:
+                return None
+            self.__document = document
+
+        text = document.patch(changes)
+        return '\ufeff' + text if text is not None and self.__bom else text
+
+
+class SqliteBackend(Backend):
+    """
+    A config stored in a SQLite database, with a row for every dotted path. Branches are rows with no value. Keys and
+    values are stored as yaml, so the database can be edited by other tools using the same syntax as a config file.
+
+    Saves update only the rows for the settings that have changed. Loaded lazily, each root node is read with a single
+    indexed range query when a setting in it is first used. Use YamlBackend(path).read() and SqliteBackend(path).write()
+    to copy a yaml config file to a database.
+    """
+
+    incremental = True
+
+    def __init__(self, path, table='settings'):
+        """
+        :param path: path to the SQLite database. Created if it doesn't exist.
+        :param table: name of the settings table. Created if it doesn't exist.
+        """
+        Backend.__init__(self, path)
+        self.table = table
+        with self.connect() as connection:
+            connection.execute(f'CREATE TABLE IF NOT EXISTS {table} (path TEXT PRIMARY KEY, parent TEXT, '
+                               f'position INTEGER NOT NULL, key TEXT NOT NULL, value TEXT, branch INTEGER NOT NULL)')
+            connection.execute(f'CREATE INDEX IF NOT EXISTS {table}_parent ON {table} (parent, position)')
+
+    @contextlib.contextmanager
+    def connect(self):
+        """
+        Opens a connection to the database for the with block, committing if the block completes. A connection is
+            opened for each use, so the backend can be used from any thread.
+        :return: sqlite3.Connection
+        """
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def read(self):
+        with self.connect() as connection:
+            rows = connection.execute(f'SELECT path, parent, key, value, branch FROM {self.table} ORDER BY position')
+            return self.build(rows.fetchall(), None)
+
+    def read_lazily(self):
+        with self.connect() as connection:
+            rows = connection.execute(f'SELECT key FROM {self.table} WHERE parent IS NULL ORDER BY position')
+            return SqliteDocument(self, [decode_key(key) for key, in rows])
+
+    def read_branch(self, path):
+        """
+        Reads a branch and everything below it.
+        :param path: path to branch
+        :return: dict of the branchs settings
+        """
+        with self.connect() as connection:
+            # Every path below the branch starts with the branch path and a ., so sorts before the branch path and a /
+            rows = connection.execute(f'SELECT path, parent, key, value, branch FROM {self.table} '
+                                      f'WHERE path > ? AND path < ? ORDER BY position', (f'{path}.', f'{path}/'))
+            return self.build(rows.fetchall(), path)
+
+    @staticmethod
+    def build(rows, path):
+        """
+        Builds a tree from rows.
+        :param rows: list of (path, parent, key, value, branch) ordered by position
+        :param path: path to the tree. None for the root.
+        :return: tree
+        """
+        tree = {}
+        branches = {path: tree}
+        for row_path, _, _, _, branch in rows:
+            if branch:
+                branches[row_path] = {}
+        for row_path, parent, key, value, branch in rows:
+            branches[parent][decode_key(key)] = branches[row_path] if branch else decode(value)
+        return tree
+
+    def write(self, config, changes=None):
+        with self.connect() as connection:
+            if changes is None:
+                connection.execute(f'DELETE FROM {self.table}')
+                self.__insert(connection, config or {}, None)
+            else:
+                for path, value in changes:
+                    # Anything below the setting has been replaced
+                    connection.execute(f'DELETE FROM {self.table} WHERE path > ? AND path < ?',
+                                       (f'{path}.', f'{path}/'))
+                    is_branch = isinstance(value, dict)
+                    connection.execute(f'UPDATE {self.table} SET value = ?, branch = ? WHERE path = ?',
+                                       (None if is_branch else writer.dump_flow(value), is_branch, path))
+                    if is_branch:
+                        self.__insert(connection, value, path)
+
+        return [self.path]
+
+    def __insert(self, connection, tree, path):
+        """
+        Inserts a row for every setting in a tree.
+        :param connection: sqlite3.Connection
+        :param tree: dict of settings
+        :param path: path to tree. None for the root.
+        :return:
+        """
+        rows = []
+        stack = [(path, tree)]
+        while len(stack) > 0:
+            branch_path, branch = stack.pop()
+            for position, (key, value) in enumerate(branch.items()):
+                key_path = snapshot.join(branch_path, key)
+                is_branch = isinstance(value, dict)
+                rows.append((key_path, branch_path, position, writer.dump_flow(key),
+                             None if is_branch else writer.dump_flow(value), is_branch))
+                if is_branch:
+                    stack.append((key_path, value))
+
+        connection.executemany(f'INSERT INTO {self.table} (path, parent, position, key, value, branch) '
+                               f'VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+
+class SqliteDocument(object):
+    """
+    A config in a SQLite database whose root nodes are read individually, on demand. Has the same methods as
+    lazyload.LazyDocument.
+    """
+
+    def __init__(self, backend, keys):
+        """
+        :param backend: SqliteBackend
+        :param keys: list of root keys, in config order
+        """
+        self.__backend = backend
+        self.__keys = keys
+        self.__roots = {f'{key}': key for key in keys}  # root path -> root key
+        self.unparsed = set(keys)
+
+    def keys(self):
+        """
+        Gets the root keys.
+        :return: list of root keys, in config order
+        """
+        return list(self.__keys)
+
+    def find_root(self, path):
+        """
+        Gets the unparsed root node that a path is in.
+        :param path: dotted path
+        :return: root key. None if the path isn't in an unparsed root node.
+        """
+        key = self.__roots.get(f'{path}'.split('.', 1)[0], None)
+        return key if key in self.unparsed else None
+
+    def parse(self, key):
+        """
+        Reads a root node, marking it as read.
+        :param key: root key
+        :return: the root nodes value
+        """
+        path = f'{key}'
+        with self.__backend.connect() as connection:
+            row = connection.execute(f'SELECT value, branch FROM {self.__backend.table} WHERE path = ?',
+                                     (path, )).fetchone()
+        value = self.__backend.read_branch(path) if row[1] else decode(row[0])
+        self.unparsed.discard(key)
+        return value
+
+
+def decode(text):
+    """
+    Decodes a key or value encoded by writer.dump_flow.
+    :param text: str
+    :return: the key or value
+    """
+    return yaml.load(text, Loader=cache.Loader)
+
+
+@functools.lru_cache(maxsize=4096)
+def decode_key(text):
+    """
+    Decodes a key encoded by writer.dump_flow. Keys are repeated in many branches, and are immutable, so are cached.
+    :param text: str
+    :return: the key
+    """
+    return decode(text)
@@ -0,0 +1,75 @@
+import hashlib
+import os
+import pickle
+import yaml
+from wxconfig import writer
+
+# Use libyaml if it is available, it is many times faster than the pure python loader
+Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Tag of yaml strings
+STR_TAG = 'tag:yaml.org,2002:str'
+
+# Increment if the format of cache files changes, so that old cache files are ignored
+CACHE_VERSION = 1
+
+
+def fingerprint(path, data):
+    """
+    Gets the fingerprint of a yaml file. A cached parse of the file is only valid if the fingerprint matches.
+    :param path: path to the file
+    :param data: the files contents as bytes
+    :return: tuple of absolute path, size, modified time and content hash
+    """
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns, hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def cache_filepath(path, cache_dir):
+    """
+    Gets the path of the cache file for a yaml file.
+    :param path: path to the yaml file
+    :param cache_dir: directory containing cache files
+    :return: path to cache file
+    """
+    name = hashlib.blake2b(os.path.abspath(path).encode(), digest_size=16).hexdigest()
+    return os.path.join(cache_dir, f'{name}.pickle')
+
+
+def load_yaml(path, cache_dir=None):
+    """
+    Loads a yaml file. If a cache directory is provided, the parsed file is read from the cache if the file hasn't
+        changed since it was cached, or parsed and cached if it has. Cache files are trusted, so the cache directory
+        must not be writable by anyone that shouldn't be able to run code in the application.
+    :param path: path to the yaml file
+    :param cache_dir: directory to cache parsed files in. Optional, no caching if None.
+    :return: the parsed yaml
+    """
+    with open(path, 'rb') as yamlfile:
+        data = yamlfile.read()
+
+    if cache_dir is None:
+        return yaml.load(data, Loader=Loader)
+
+    key = (CACHE_VERSION, fingerprint(path, data))
+    cache_path = cache_filepath(path, cache_dir)
+
+    # Try the cache. Any problem reading it is treated as a miss.
+    try:
+        with open(cache_path, 'rb') as cachefile:
+            cached_key, tree = pickle.load(cachefile)
+        if cached_key == key:
+            return tree
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError, ImportError):
+        pass
+
+    # Miss or stale. Parse and write the cache, atomically so that a concurrent load never sees part of it.
+    tree = yaml.load(data, Loader=Loader)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        writer.atomic_write(cache_path, pickle.dumps((key, tree), protocol=pickle.HIGHEST_PROTOCOL))
+    except OSError:
+        # Caching is an optimisation only, don't fail the load.
+        pass
+
+    return tree
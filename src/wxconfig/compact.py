@@ -0,0 +1,226 @@
+import array
+import bisect
+import sys
+import yaml
+from wxconfig import snapshot
+
+
+class CompactBranch(object):
+    """
+    A branch of a compact config tree. Rather than a dict, a branch is a sorted table of interned key names with a list
+    of values alongside, found by binary search. The original order of the keys is kept for saving.
+
+    Getting a value that is a branch returns it as a dict, as for a config that isn't compact. items returns the
+    stored values, with branches as CompactBranch.
+    """
+
+    __slots__ = ('names', 'keys', 'values', 'order')
+
+    def __init__(self, tree):
+        """
+        :param tree: dict of settings. Branches below it are made compact too.
+        """
+        entries = sorted((sys.intern(f'{key}'), position, key) for position, key in enumerate(tree))
+        self.names = tuple(name for name, _, _ in entries)
+        self.values = [compact_value(tree[key]) for _, _, key in entries]
+
+        # Keys are only kept if they aren't all strings, and the order only if it isn't sorted
+        keys = tuple(key for _, _, key in entries)
+        self.keys = None if all(type(key) is str for key in keys) else keys
+        order = [position for _, position, _ in entries]
+        if order == sorted(order):
+            self.order = None
+        else:
+            self.order = array.array('I', bytes(4 * len(order)))
+            for sorted_position, position in enumerate(order):
+                self.order[position] = sorted_position
+
+    def find(self, name):
+        """
+        Finds a key.
+        :param name: the key as a str
+        :return: position in the key table. -1 if not found.
+        """
+        names = self.names
+        position = bisect.bisect_left(names, name)
+        return position if position < len(names) and names[position] == name else -1
+
+    def key(self, position):
+        """
+        :param position: position in the key table
+        :return: the original key
+        """
+        return self.names[position] if self.keys is None else self.keys[position]
+
+    def positions(self):
+        """
+        :return: positions in the key table, in the original order of the keys
+        """
+        return range(len(self.names)) if self.order is None else self.order
+
+    def __getitem__(self, key):
+        position = self.find(f'{key}')
+        if position < 0:
+            raise KeyError(key)
+        value = self.values[position]
+        return to_dict(value) if isinstance(value, CompactBranch) else value
+
+    def __setitem__(self, key, value):
+        position = self.find(f'{key}')
+        if position < 0:
+            raise KeyError(key)
+        self.values[position] = compact_value(value)
+
+    def __contains__(self, key):
+        return self.find(f'{key}') >= 0
+
+    def __iter__(self):
+        return (self.key(position) for position in self.positions())
+
+    def __len__(self):
+        return len(self.names)
+
+    def items(self):
+        """
+        :return: list of (key, stored value), in the original order of the keys
+        """
+        return [(self.key(position), self.values[position]) for position in self.positions()]
+
+    def copy(self):
+        """
+        Copies the branch, sharing its key table and values.
+        :return: CompactBranch
+        """
+        branch = CompactBranch.__new__(CompactBranch)
+        branch.names, branch.keys, branch.order = self.names, self.keys, self.order
+        branch.values = list(self.values)
+        return branch
+
+
+def compact_value(value):
+    """
+    :param value: a settings value
+    :return: the value, with dicts made compact
+    """
+    return CompactBranch(value) if isinstance(value, dict) else value
+
+
+def to_dict(branch):
+    """
+    Converts a compact branch back to dicts.
+    :param branch: CompactBranch
+    :return: dict
+    """
+    return {key: to_dict(value) if isinstance(value, CompactBranch) else value for key, value in branch.items()}
+
+
+# Compact branches are saved as mappings, in their original order, without converting them to dicts first
+yaml.add_representer(CompactBranch, lambda dumper, branch: dumper.represent_dict(branch))
+
+
+class CompactIndex(object):
+    """
+    Path index of a compact tree. Has the same methods as the path index dict of a Snapshot, but finds paths by
+    walking the tree rather than holding an entry for every path.
+    """
+
+    __slots__ = ('root', )
+
+    def __init__(self, root):
+        """
+        :param root: CompactBranch at the root of the config
+        """
+        self.root = root
+
+    def get(self, path, default=None):
+        """
+        :param path: dotted path
+        :param default: returned if the path doesn't exist
+        :return: (CompactBranch containing the path, key)
+        """
+        branch = self.root
+        names = path.split('.')
+        for name in names[:-1]:
+            position = branch.find(name)
+            if position < 0:
+                return default
+            branch = branch.values[position]
+            if not isinstance(branch, CompactBranch):
+                return default
+
+        position = branch.find(names[-1])
+        return default if position < 0 else (branch, branch.key(position))
+
+    def __getitem__(self, path):
+        entry = self.get(path)
+        if entry is None:
+            raise KeyError(path)
+        return entry
+
+    def __contains__(self, path):
+        return self.get(path) is not None
+
+    def items(self):
+        """
+        :return: generator of (path, (CompactBranch containing the path, key)) for every path, in config order
+        """
+        stack = [(None, self.root)]
+        while len(stack) > 0:
+            path, branch = stack.pop()
+            children = []
+            for position in branch.positions():
+                key = branch.key(position)
+                key_path = snapshot.join(path, key)
+                yield key_path, (branch, key)
+                value = branch.values[position]
+                if isinstance(value, CompactBranch):
+                    children.append((key_path, value))
+            stack.extend(reversed(children))
+
+
+class CompactSnapshot(snapshot.Snapshot):
+    """
+    A snapshot of a config stored as a compact tree, for configs so large that the memory used by dicts and the path
+    index matters. Getting a property walks the tree, comparing one key at each level, so is slower than for a Snapshot
+    but doesn't need the index.
+    """
+
+    __slots__ = []
+
+    @classmethod
+    def build(cls, config, meta=None, meta_index=None, version=0):
+        if meta is not None:
+            meta_index = {}
+            snapshot.index_meta(meta_index, meta, None)
+
+        root = CompactBranch(config or {})
+        return cls(root, CompactIndex(root), {} if meta_index is None else meta_index, version)
+
+    def tree(self):
+        return to_dict(self.config)
+
+    def set_in_place(self, changes):
+        for path, value in changes:
+            parent, key = self.index[path]
+            parent[key] = value
+
+        return CompactSnapshot(self.config, self.index, self.meta_index, self.version + 1)
+
+    def set_copy_on_write(self, changes):
+        root = self.config.copy()
+        copies = {id(root)}  # ids of the branches copied for the new snapshot. These can be changed.
+        for path, value in changes:
+            # Copy each branch from the root to the property, unless already copied
+            branch = root
+            names = path.split('.')
+            for name in names[:-1]:
+                position = branch.find(name)
+                child = branch.values[position]
+                if id(child) not in copies:
+                    child = child.copy()
+                    copies.add(id(child))
+                    branch.values[position] = child
+                branch = child
+            branch[names[-1]] = value
+
+        return CompactSnapshot(root, CompactIndex(root), self.meta_index, self.version + 1)
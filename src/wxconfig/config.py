@@ -1,4 +1,23 @@
-import yaml
+import contextlib
+import functools
+import logging
+import os
+import threading
+from wxconfig import backends
+from wxconfig import cache
+from wxconfig import compact
+from wxconfig import instrumentation
+from wxconfig import journal
+from wxconfig import layers
+from wxconfig import schema
+from wxconfig import search
+from wxconfig import settingsmodel
+from wxconfig import shared
+from wxconfig import snapshot
+from wxconfig import subscriptions
+from wxconfig import transaction
+from wxconfig import watcher
+from wxconfig import writer
 
 
 class Config(object):
@@ -7,8 +26,29 @@ class Config(object):
     """
 
     config_filepath = None
-    __config = None
-    __meta = None
+    __state = snapshot.Snapshot(None, {}, {}, 0)  # Current snapshot. Replaced, never changed, in thread safe mode.
+    __thread_safe = False
+    __lock = None  # RLock held by anything changing the config. Never held by readers.
+    __dirty = False  # True if config has been set since it was loaded or saved
+    __save_lock = None  # Lock held whilst writing
+    __writer = None  # BackgroundWriter if background saving is enabled
+    __journal = None  # Journal if saving to a journal is enabled
+    __unsaved = None  # dict of path to value of changes not yet saved, in the order made. None if loaded from layers.
+    __journal_limits = None  # tuple of max bytes and max age in seconds before the journal is compacted
+    __backend = None  # Backend that the config was loaded from. None if loaded from layers.
+    __meta_filepath = None
+    __cache_dir = None
+    __watcher = None  # FileWatcher if watching for file changes is enabled
+    __reload_listeners = ()
+    __subscriptions = None  # Subscriptions. Created on first subscribe.
+    __transactions = None  # threading.local holding the active transaction for each thread
+    __search_index = None  # SearchIndex. Built on first search after a load.
+    __settings_model = None  # SettingsModel. Created when first got.
+    __validators = {}  # path -> validator compiled from the constraints in the metadata. See schema.
+    __layers = None  # LayerStack if loaded from layers
+    __lazy = None  # LazyDocument if loaded lazily and root nodes remain unparsed
+    __compact = False  # True if the config is stored as a compact tree. See load.
+    __instrumentation = None  # Instrumentation if enabled
     __instance = None
 
     def __new__(cls):
@@ -17,37 +57,668 @@ class Config(object):
         :return:
         """
         if cls.__instance is None:
-            cls.__instance = super(Config, cls).__new__(cls)
+            cls.__instance = cls.new_instance()
         return cls.__instance
 
-    def load(self, path, meta=None):
+    @classmethod
+    def new_instance(cls):
+        """
+        Creates a config that is independent of the singleton instance, with its own settings and indexes. Use for
+            applications that need more than one config, see ConfigStore.
+        :return: Config
+        """
+        instance = super(Config, cls).__new__(cls)
+        instance.__lock = threading.RLock()
+        instance.__save_lock = threading.Lock()
+        instance.__transactions = threading.local()
+        return instance
+
+    def load(self, path, meta=None, cache_dir=None, lazy=False, compact=False):
         """
         Loads the applications config file
-        :param path: Path to config file
+        :param path: Path to config file, or a backends.Backend to load the config from, for example a
+            backends.SqliteBackend. The config is saved to the same file or backend.
         :param meta: Path to metadata file. Metadata is optional information about a setting that can be used for
             settings gui and can include labels and help text.
+        :param cache_dir: Directory to cache parsed config and metadata files in. Optional. If set, the files are only
+            parsed if they have changed since they were last cached.
+        :param lazy: True to parse each root node of the config file only when a setting in it is first used. The
+            file is scanned to find the root nodes, which is much faster than parsing it. Use for large config files
+            where only some root nodes are used. The config file isn't cached. Files that can't be split into root
+            nodes, for example those using anchors, are parsed in full. Backends read each root node when first
+            used if they support it.
+        :param compact: True to store the config as a compact tree, with interned keys and sorted key tables rather
+            than dicts, and without a path index. Uses much less memory for very large configs, but get and set walk
+            the tree so are slower. Can't be combined with lazy.
+        :return:
+        """
+        backend = path if isinstance(path, backends.Backend) else backends.YamlBackend(path, cache_dir)
+        document = backend.read_lazily() if lazy and not compact else None
+
+        # Changes saved to the journal since it was last compacted are applied to the config file. These can be
+        # anywhere in the config, so the file can't be loaded lazily.
+        changes = [] if backend.incremental else journal.read(journal.journal_filepath(backend.path))[0]
+        if len(changes) > 0:
+            document = None
+
+        config = backend.read() if document is None else {key: None for key in document.keys()}
+        journal.replay(config, changes)
+        meta_tree = None if meta is None else cache.load_yaml(meta, cache_dir)
+
+        self.__record_read(backend.files() + [meta])
+
+        with self.__lock:
+            self.__compact = compact
+            self.__swap(config, meta_tree, document)
+            if self.__journal is not None:
+                self.__close_journal()
+                if not backend.incremental:
+                    self.__open_journal(backend.path)
+            self.__unsaved = {}
+
+            # Store paths so that we can save and reload later
+            self.config_filepath = backend.path
+            self.__backend = backend
+            self.__layers = None
+            if meta is not None:
+                self.__meta_filepath = meta
+            self.__cache_dir = cache_dir
+            self.__dirty = False
+
+    def load_layers(self, layer_list, meta=None, cache_dir=None):
+        """
+        Loads the applications config from a stack of layers, for example defaults, site and host config files and
+            environment variables. Each layers settings override those in the layers below it. The layers are merged
+            once, so getting settings is as fast as for a single config file. Saving writes changed settings to the
+            layer that they came from.
+        :param layer_list: list of layers.FileLayer, layers.DictLayer or layers.EnvLayer, lowest priority first.
+        :param meta: Path to metadata file. See load.
+        :param cache_dir: Directory to cache the parsed metadata file in. See load. FileLayers take their own cache_dir.
+        :return:
+        """
+        stack = layers.LayerStack(layer_list)
+        meta_tree = None if meta is None else cache.load_yaml(meta, cache_dir)
+
+        with self.__lock:
+            self.__compact = False
+            self.__swap(stack.read(), meta_tree)
+            self.__record_read(stack.files() + [meta])
+
+            # Layers are saved to their own files, not a journal
+            self.__close_journal()
+            self.__backend = None
+            self.__unsaved = None
+            self.config_filepath = None
+            self.__layers = stack
+            if meta is not None:
+                self.__meta_filepath = meta
+            self.__cache_dir = cache_dir
+            self.__dirty = False
+
+    def update_layer(self, name, tree=None):
+        """
+        Updates one layer, either with new settings or by reading it again, and merges only the branches that have
+            changed into the config. Listeners added with add_reload_listener are called with the paths that have
+            changed.
+        :param name: name of the layer
+        :param tree: the layers new settings. None to read the layer again.
+        :return: list of changed paths
+        """
+        with self.__lock:
+            stack = self.__layers
+            if stack is None:
+                raise ValueError("Config was not loaded from layers.")
+            tops = stack.replace(name, stack.layer(name).read() if tree is None else tree)
+
+            # Find the branches to merge again. A path that has been added or removed can only be merged in the branch
+            # that contains it. If that is the root, merge everything.
+            state = self.__state
+            targets = set()
+            for path in tops:
+                target = path
+                while target is not None and (target not in state.index or
+                                              stack.merged(target) is layers.MISSING):
+                    target = layers.branch_path(target)
+                if target is None:
+                    targets = None
+                    break
+                targets.add(target)
+
+            if targets is None:
+                config = stack.merged(None)
+                changed = watcher.diff_trees(state.config, config)
+                self.__swap(config, None)
+            else:
+                # Merge the changed branches, skipping any inside another being merged
+                changes = []
+                changed = []
+                for target in targets:
+                    branch_path = layers.branch_path(target)
+                    while branch_path is not None and branch_path not in targets:
+                        branch_path = layers.branch_path(branch_path)
+                    if branch_path is None:
+                        parent, key = state.index[target]
+                        value = stack.merged(target)
+                        changed.extend(watcher.diff_trees({key: parent[key]}, {key: value},
+                                                          layers.branch_path(target)))
+                        changes.append((target, value))
+                self.__apply(state, changes, from_layers=True)
+
+        self.__notify_reload(changed)
+        self.__publish_paths(changed)
+        return changed
+
+    def reload(self):
+        """
+        Reloads the config and metadata files that were last loaded, discarding any unsaved changes. Listeners added
+            with add_reload_listener are called with the paths that have changed.
+        :return: list of changed paths
+        """
+        return self.__reload()
+
+    def __reload(self, watched=False):
+        """
+        Reloads the config and metadata files. See reload.
+        :param watched: True if reloading because the watcher has seen a file change. An empty config is then not
+            loaded, as it is more likely to be a file that is being written than a config with no settings.
+        :return: list of changed paths
+        """
+        meta_tree = None if self.__meta_filepath is None else cache.load_yaml(self.__meta_filepath, self.__cache_dir)
+
+        # Parse the config file before locking so that changes aren't blocked whilst it is parsed. Layers are read under
+        # the lock as reading them updates the layer stack.
+        config = None
+        backend = self.__backend
+        if backend is not None:
+            config = backend.read()
+            if not backend.incremental:
+                journal.replay(config, journal.read(journal.journal_filepath(backend.path))[0])
+
+        with self.__lock:
+            if self.__layers is not None:
+                config = self.__layers.read()
+            if watched and not config:
+                logging.getLogger(__name__).warning("Changed config is empty. Not reloaded.")
+                return []
+
+            self.__parse_all()
+            changed = watcher.diff_trees(self.__state.tree(), config)
+            self.__swap(config, meta_tree)
+            self.__dirty = False
+            if self.__unsaved is not None:
+                self.__unsaved = {}
+            self.__record_read((backend.files() if self.__layers is None else self.__layers.files()) +
+                               [self.__meta_filepath])
+
+        self.__notify_reload(changed)
+        self.__publish_paths(changed)
+        return changed
+
+    async def aload(self, path, meta=None, cache_dir=None, lazy=False, compact=False, executor=None):
+        """
+        Loads the applications config file without blocking the event loop. The files are parsed in an executor and
+            the loaded config replaces the current one in a single step, so coroutines calling get whilst it loads see
+            either the old config or the new one. See load.
+        :param path: Path to config file
+        :param meta: Path to metadata file
+        :param cache_dir: Directory to cache parsed config and metadata files in
+        :param lazy: True to parse each root node only when a setting in it is first used
+        :param compact: True to store the config as a compact tree
+        :param executor: concurrent.futures.Executor to parse in. None for the event loops default executor.
+        :return:
+        """
+        # asyncio is only imported by applications that use it, as it is slow to import
+        import asyncio
+        await asyncio.get_running_loop().run_in_executor(executor, functools.partial(self.load, path, meta=meta,
+                                                                                     cache_dir=cache_dir, lazy=lazy,
+                                                                                     compact=compact))
+
+    async def areload(self, executor=None):
+        """
+        Reloads the config and metadata files without blocking the event loop. See reload. Reload listeners are called
+            in the executor.
+        :param executor: concurrent.futures.Executor to parse in. None for the event loops default executor.
+        :return: list of changed paths
+        """
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(executor, self.reload)
+
+    def enable_instrumentation(self, track_paths=True):
+        """
+        Records counters and latency histograms for config operations, access counts for each path and bytes read and
+            written. See stats. The configs methods are replaced with instrumented versions, and restored when
+            instrumentation is disabled, so there is no cost when it isn't enabled.
+        :param track_paths: False to not count accesses for each path
+        :return: Instrumentation. Use its add_hook to export metrics.
+        """
+        self.disable_instrumentation()
+        recorder = instrumentation.Instrumentation(track_paths)
+        for operation in instrumentation.OPERATIONS + instrumentation.PATH_OPERATIONS:
+            setattr(self, operation, recorder.wrap(operation, getattr(self, operation)))
+        self.__instrumentation = recorder
+
+        return recorder
+
+    def disable_instrumentation(self):
+        """
+        Stops recording statistics, restoring the uninstrumented methods.
+        :return:
+        """
+        if self.__instrumentation is not None:
+            for operation in instrumentation.OPERATIONS + instrumentation.PATH_OPERATIONS:
+                delattr(self, operation)
+            self.__instrumentation = None
+
+    def stats(self, top_paths=20):
+        """
+        Gets the statistics recorded since instrumentation was enabled.
+        :param top_paths: number of most accessed paths to include
+        :return: dict, see Instrumentation.stats. None if instrumentation isn't enabled.
+        """
+        recorder = self.__instrumentation
+        return None if recorder is None else recorder.stats(top_paths)
+
+    def __record_read(self, paths):
+        """
+        Records the bytes read from files if instrumentation is enabled.
+        :param paths: paths of the files read. None entries are ignored.
+        :return:
+        """
+        if self.__instrumentation is not None:
+            self.__instrumentation.add_bytes_read(sum(os.path.getsize(path) for path in paths
+                                                      if path is not None and os.path.exists(path)))
+
+    def __notify_reload(self, changed):
+        """
+        Calls the reload listeners if anything has changed.
+        :param changed: list of changed paths
+        :return:
+        """
+        if len(changed) > 0:
+            for listener in self.__reload_listeners:
+                try:
+                    listener(changed)
+                except Exception:
+                    logging.getLogger(__name__).exception("Reload listener failed.")
+
+    def add_reload_listener(self, listener):
+        """
+        Adds a function to be called when the config is reloaded, either by reload or when watching files.
+        :param listener: function taking a list of the paths that changed. Not called if nothing changed.
+        :return:
+        """
+        self.__reload_listeners = self.__reload_listeners + (listener, )
+
+    def remove_reload_listener(self, listener):
+        """
+        Removes a function added with add_reload_listener.
+        :param listener: the function to remove
+        :return:
+        """
+        self.__reload_listeners = tuple(x for x in self.__reload_listeners if x != listener)
+
+    def subscribe(self, path_prefix, callback, deliver=subscriptions.CALLER):
+        """
+        Subscribes to changes to settings at or below a path, whether made by set, set_many, a transaction, the
+            settings dialog, a reload or a layer update. Changes made together are delivered together, so a
+            transaction or set_many calls the callback once.
+        :param path_prefix: path separated by . None for all settings.
+        :param callback: function taking a dict of changed path to new value. Where a branch containing the path
+            prefix has changed, the dict has the branch path and its new value.
+        :param deliver: where to call the callback. subscriptions.CALLER on the thread making the change, once it has
+            been made, subscriptions.WORKER on a background thread, or subscriptions.WX on the wx main thread.
+        :return:
+        """
+        with self.__lock:
+            if self.__subscriptions is None:
+                self.__subscriptions = subscriptions.Subscriptions()
+        self.__subscriptions.subscribe(path_prefix, callback, deliver)
+
+    def unsubscribe(self, path_prefix, callback):
+        """
+        Removes a subscription made with subscribe.
+        :param path_prefix: the path prefix subscribed to
+        :param callback: the function subscribed
+        :return:
+        """
+        if self.__subscriptions is not None:
+            self.__subscriptions.unsubscribe(path_prefix, callback)
+
+    def __publish(self, changes):
+        """
+        Delivers changes to subscribers. Called once the changes have been made and the lock released.
+        :param changes: list of (path, new value)
+        :return:
+        """
+        if self.__subscriptions is not None and len(changes) > 0:
+            self.__subscriptions.publish(changes)
+
+    def __publish_paths(self, changed):
+        """
+        Delivers changes to subscribers, getting the new values from the config.
+        :param changed: list of changed paths
+        :return:
+        """
+        if self.__subscriptions is not None and len(changed) > 0:
+            state = self.__state
+            self.__subscriptions.publish([(path, state.get(path)) for path in changed])
+
+    def start_watching(self, interval=1.0):
+        """
+        Watches the config and metadata files, reloading them on a background thread when they change. Files are
+            reloaded once they have been unchanged for an interval, so that a file being written isn't reloaded. A file
+            that can't be parsed, or an empty config, isn't reloaded.
+        :param interval: seconds between checks for changes. Checks only stat the files.
+        :return:
+        """
+        self.stop_watching()
+        paths = self.__backend.files() if self.__layers is None else self.__layers.files()
+        paths += [] if self.__meta_filepath is None else [self.__meta_filepath]
+        self.__watcher = watcher.FileWatcher(paths, functools.partial(self.__reload, watched=True), interval)
+
+    def stop_watching(self):
+        """
+        Stops watching the config and metadata files.
+        :return:
+        """
+        if self.__watcher is not None:
+            self.__watcher.stop()
+            self.__watcher = None
+
+    def __swap(self, config, meta, document=None):
+        """
+        Replaces the config, and metadata if provided, with newly loaded trees. The new snapshot, including the indexes
+            that mean get and set don't need to split paths and walk the tree, is built before it replaces the current
+            one.
+        :param config: config tree
+        :param meta: metadata tree. None to keep the current metadata.
+        :param document: LazyDocument if config has been loaded lazily. Its root nodes are in config with no value.
+        :return:
+        """
+        snapshot_class = compact.CompactSnapshot if self.__compact else snapshot.Snapshot
+        state = snapshot_class.build(config, meta, self.__state.meta_index, self.__state.version + 1)
+        validators = self.__validators if meta is None else schema.compile_validators(state.meta_index)
+
+        # Unparsed root nodes aren't indexed. They are parsed and indexed when a setting in them is first used.
+        if document is not None:
+            for key in document.keys():
+                del state.index[key]
+
+        self.__state = state
+        self.__validators = validators
+        self.__lazy = document
+        self.__search_index = None
+        if self.__settings_model is not None:
+            self.__settings_model.clear()
+
+    def __parse_root(self, path):
+        """
+        Parses and indexes the unparsed root node containing path, if any.
+        :param path: path to property
+        :return: True if a root node was parsed
+        """
+        with self.__lock:
+            document = self.__lazy
+            key = None if document is None else document.find_root(path)
+            if key is None:
+                return False
+
+            # Add the root node to the current tree and index. The snapshot isn't replaced as its settings haven't
+            # changed, they have only been parsed.
+            state = self.__state
+            value = document.parse(key)
+            state.config[key] = value
+            state.index[key] = (state.config, key)
+            snapshot.index_tree(state.index, value, key)
+            if len(document.unparsed) == 0:
+                self.__lazy = None
+
+            return True
+
+    def __parse_all(self):
+        """
+        Parses any unparsed root nodes. Required by anything that uses the whole config.
+        :return:
+        """
+        with self.__lock:
+            document = self.__lazy
+            if document is not None:
+                for key in list(document.unparsed):
+                    self.__parse_root(key)
+
+    def set_thread_safe(self, thread_safe=True):
+        """
+        Sets thread safe mode. In thread safe mode, readers never lock and never see a partly made change. Each change
+            builds a new snapshot of the config, copying only the branches that it changes, and publishes it by
+            replacing the current snapshot. This makes set slower for large configs and should only be used if the
+            config is changed whilst other threads are reading it.
+        :param thread_safe: True for thread safe mode. False to change the current snapshot in place.
         :return:
         """
-        with open(path, 'r') as yamlfile:
-            self.__config = yaml.safe_load(yamlfile)
+        with self.__lock:
+            # Parsing root nodes on demand changes the current snapshot, so parse them all first
+            if thread_safe:
+                self.__parse_all()
+            self.__thread_safe = thread_safe
+
+    def snapshot(self):
+        """
+        Gets the current snapshot of the config. Reading from a snapshot gives consistent values across properties
+            even if the config is changed, but changes made after the snapshot was taken are only seen if in thread
+            safe mode. See set_thread_safe.
+        :return: Snapshot with get, get_root_nodes, get_meta and get_all_meta methods.
+        """
+        self.__parse_all()
+        return self.__state
+
+    def publish_shared(self, path):
+        """
+        Publishes a read only snapshot of the config for other processes, for example pre-forked workers, to read with
+            wxconfig.SharedSnapshot. Workers map the file into memory rather than each parsing and holding their own
+            copy of the config. Publish again after changing the config, workers pick up the new snapshot when they
+            call SharedSnapshot.refresh.
+        :param path: path to the shared snapshot file. Use a file in /dev/shm to keep it in shared memory.
+        :return: generation of the published snapshot
+        """
+        with self.__lock:
+            self.__parse_all()
+            generation = shared.read_generation(path) + 1
+            shared.write(path, self.__state, generation)
 
-        if meta is not None:
-            with open(meta, 'r') as metafile:
-                self.__meta = yaml.safe_load(metafile)
+        return generation
 
-        # Store path so that we can save later
-        self.config_filepath = path
+    @property
+    def dirty(self):
+        """
+        True if config has been changed since it was loaded or last saved.
+        """
+        return self.__dirty
 
     def save(self):
         """
-        Saves config file
+        Saves config file. Does nothing if config hasn't changed since it was loaded or last saved. If background
+            saving is enabled, the save is made on the background thread.
+        :return:
+        """
+        if not self.__dirty:
+            return
+
+        if self.__writer is not None:
+            self.__writer.schedule()
+        else:
+            self.__write()
+
+    async def asave(self, executor=None):
+        """
+        Saves config file without blocking the event loop. The config is dumped and written in an executor. Concurrent
+            saves are made one at a time, and a save that finds nothing has changed since the last one does nothing.
+            Settings changed whilst saving are saved by the next save. Use thread safe mode, see set_thread_safe, if
+            coroutines change several settings together whilst saving, so that the file never has only some of them.
+        :param executor: concurrent.futures.Executor to write in. None for the event loops default executor.
         :return:
         """
+        import asyncio
+        if not self.__dirty:
+            return
+
+        await asyncio.get_running_loop().run_in_executor(executor, self.__write)
+
+    def start_background_save(self, delay=0.5):
+        """
+        Saves on a background thread. Saves made within delay seconds of each other are merged into a single write.
+        :param delay: seconds to wait after a save before writing.
+        :return:
+        """
+        self.stop_background_save()
+        self.__writer = writer.BackgroundWriter(self.__write, delay)
+
+    def stop_background_save(self):
+        """
+        Stops saving on a background thread, writing any pending save first. Saves are then made on the calling thread.
+        :return:
+        """
+        if self.__writer is not None:
+            self.__writer.stop()
+            self.__writer = None
+
+    def flush(self):
+        """
+        Writes any pending background save now.
+        :return:
+        """
+        if self.__writer is not None:
+            self.__writer.flush()
+
+    def start_journal(self, max_bytes=1024 * 1024, max_age=300.0):
+        """
+        Saves changes by appending them to a journal file next to the config file, rather than writing the whole config
+            file. Each save then costs the size of the changes made since the last save, not the size of the config.
+            The journal is replayed when the config is loaded, and is compacted, by saving the whole config file and
+            emptying the journal, on a background thread once it reaches max_bytes or its first change is max_age
+            seconds old.
+        :param max_bytes: size of journal to compact at
+        :param max_age: age in seconds of the oldest change in the journal to compact at
+        :return:
+        :raises ValueError: if the config was loaded from layers
+        """
+        if self.__layers is not None:
+            raise ValueError("Journals aren't supported for configs loaded from layers.")
+        if self.__backend.incremental:
+            raise ValueError("Journals aren't needed for backends that only save changes.")
+
+        # Changes made before journaling started are saved to the config file
+        self.__write()
+        with self.__save_lock:
+            with self.__lock:
+                self.__journal_limits = (max_bytes, max_age)
+                if self.__journal is None:
+                    self.__open_journal(self.__backend.path)
+
+    def stop_journal(self):
+        """
+        Stops saving to a journal. Any unsaved changes remain unsaved. Changes in the journal are saved to the config
+            file and the journal is removed.
+        :return:
+        """
+        self.compact()
+        with self.__save_lock:
+            with self.__lock:
+                self.__close_journal()
+
+    def compact(self):
+        """
+        Saves the whole config file and empties the journal. Also saves any changes not yet saved. Does nothing if not
+            saving to a journal.
+        :return:
+        """
+        self.__write(compact=True)
+
+    def __open_journal(self, path):
+        """
+        Opens the journal for a config file, closing any open journal. Must be called holding the lock.
+        :param path: path to the config file
+        :return:
+        """
+        self.__close_journal()
+        self.__journal = journal.Journal(journal.journal_filepath(path))
+
+    def __close_journal(self):
+        """
+        Closes the journal if open. Must be called holding the lock.
+        :return:
+        """
+        if self.__journal is not None:
+            self.__journal.close()
+            self.__journal = None
+
+    def __write(self, compact=False):
+        """
+        Writes config file if changed. Yaml files are replaced atomically so that they are never left partly written.
+            If saving to a journal, the changes are appended to the journal instead.
+        :param compact: True to write the config file and empty the journal, even if the config hasn't changed.
+        :return:
+        """
+        with self.__save_lock:
+            journal_file = self.__journal
+            compact = compact and journal_file is not None and (self.__dirty or journal_file.size > 0)
+            if not self.__dirty and not compact:
+                return
+
+            # Clear dirty before dumping. A set during the dump will mark it dirty again so that it is saved next time.
+            self.__dirty = False
+            changes = {}
+            size = 0  # bytes appended to the journal
+            try:
+                if self.__layers is not None:
+                    # Changes are written to the layers that they were made in
+                    written = self.__layers.write()
+                elif journal_file is not None and not compact:
+                    with self.__lock:
+                        changes, self.__unsaved = self.__unsaved, {}
+                    size = journal_file.append(list(changes.items()))
+                    written = []
+                else:
+                    # Backends can write only the changes. Compacting a journal writes everything as the changes in
+                    # the journal are no longer known.
+                    backend = self.__backend
+                    if not backend.incremental:
+                        self.__parse_all()
+
+                    # A journal left by a config that was saving to one, for example after a crash, was replayed when
+                    # the config was loaded. Write everything, then remove it so that it isn't replayed over this save.
+                    journal_path = None if backend.incremental else journal.journal_filepath(backend.path)
+                    leftover = journal_file is None and journal_path is not None and os.path.exists(journal_path)
+                    with self.__lock:
+                        changes, self.__unsaved = self.__unsaved, {}
+                    written = backend.write(self.__state.config,
+                                            None if journal_file is not None or leftover else list(changes.items()))
 
-        with open(self.config_filepath, 'w') as file:
-            file.write("---\n")
-            yaml.dump(self.__config, file, sort_keys=False)
-            file.write("...")
+                    # The config file now has every change in the journal
+                    if journal_file is not None:
+                        journal_file.clear()
+                    elif leftover:
+                        os.remove(journal_path)
+
+                if self.__instrumentation is not None:
+                    self.__instrumentation.add_bytes_written(sum(os.path.getsize(path) for path in written) + size)
+
+                # Don't reload our own save
+                if self.__watcher is not None and len(written) > 0:
+                    self.__watcher.ignore_changes()
+            except BaseException:
+                # Keep the changes for the next save, before any made since
+                if len(changes) > 0:
+                    with self.__lock:
+                        changes.update(self.__unsaved)
+                        self.__unsaved = changes
+                self.__dirty = True
+                raise
+
+            # Compact in the background once the journal is large or old enough
+            if journal_file is not None and not compact:
+                max_bytes, max_age = self.__journal_limits
+                if journal_file.size >= max_bytes or journal_file.age() >= max_age:
+                    threading.Thread(target=self.compact, name='wxconfig-compact', daemon=True).start()
 
     def get(self, path):
         """
@@ -56,49 +727,209 @@ class Config(object):
         :return: property value
         """
 
-        elements = path.split('.')
-        last = None
+        entry = self.__state.index.get(path)
+        if entry is None:
+            # If loaded lazily, the path may be in a root node that hasn't been parsed yet
+            if self.__lazy is None or not self.__parse_root(path):
+                return None
+            entry = self.__state.index.get(path)
+            if entry is None:
+                return None
 
-        for element in elements:
-            if last is None:
-                if element in self.__config:
-                    last = self.__config[element]
-            else:
-                if element in last:
-                    last = last[element]
-                else:
-                    last = None
-
-        return last
+        parent, key = entry
+        return parent[key]
 
     def get_root_nodes(self):
         """
         Returns all root notes as a list
         :return: dict of root notes of YAML config file
         """
-        nodes = []
-        for key in self.__config:
-            nodes.append(key)
-
-        return nodes
+        return self.__state.get_root_nodes()
 
     def set(self, path, value):
         """
         Sets a config property value. Only sets if property already exists.
         :param path: path to property. Path separated by .
-        :param value: Value to set property to
+        :param value: Value to set property to. Converted to the __type in the properties metadata, if any.
+        :return:
+        :raises ValueError: if the value doesn't meet the constraints in the properties metadata. See validate.
+        """
+        validator = self.__validators.get(path)
+        if validator is not None:
+            value = validator(value)
+
+        with self.__lock:
+            state = self.__state
+
+            # does path exist
+            entry = state.index.get(path)
+            if entry is None and self.__lazy is not None and self.__parse_root(path):
+                entry = state.index.get(path)
+            if entry is None:
+                return
+
+            parent, key = entry
+            orig_value = parent[key]
+            if orig_value is None:
+                return
+
+            # Nothing to do if unchanged. Compare types too, a change from 1 to True is a change.
+            if type(orig_value) is type(value) and orig_value == value:
+                return
+
+            self.__apply(state, [(path, value)])
+
+        self.__publish([(path, value)])
+
+    def get_many(self, paths):
+        """
+        Gets many config property values. Values are read from the same snapshot, so are consistent with each other in
+            thread safe mode.
+        :param paths: list of paths to properties. Paths separated by .
+        :return: dict of path to property value. Value is None for paths that don't exist.
+        """
+        if self.__lazy is not None:
+            for path in paths:
+                self.__parse_root(path)
+
+        state = self.__state
+        index = state.index
+        values = {}
+        for path in paths:
+            entry = index.get(path)
+            if entry is None:
+                values[path] = None
+            else:
+                parent, key = entry
+                values[path] = parent[key]
+
+        return values
+
+    def set_many(self, mapping, save=True):
+        """
+        Sets many config property values, all or none. Every path is checked before anything is set, and the config
+            is then saved once.
+        :param mapping: dict of path to value. Paths separated by . Values are converted to the __type in their
+            metadata, if any.
+        :param save: False to set without saving
+        :return:
+        :raises KeyError: if a path doesn't exist. Nothing is set.
+        :raises ValueError: if a path is below another path being set, or a value doesn't meet the constraints in its
+            metadata. Nothing is set.
+        """
+        validators = self.__validators
+        if len(validators) > 0:
+            mapping = {path: value if path not in validators else validators[path](value)
+                       for path, value in mapping.items()}
+
+        with self.__lock:
+            if self.__lazy is not None:
+                for path in mapping:
+                    self.__parse_root(path)
+
+            state = self.__state
+            changes = []
+            for path, value in mapping.items():
+                # Check path exists. As with set, a property with no value can't be set.
+                entry = state.index.get(path)
+                orig_value = None if entry is None else entry[0][entry[1]]
+                if orig_value is None:
+                    raise KeyError(f"Config property {path} does not exist.")
+
+                # A branch being set along with properties below it is ambiguous
+                parent, key = entry
+                branch_path = snapshot.parent_path(path, key)
+                while branch_path is not None:
+                    if branch_path in mapping:
+                        raise ValueError(f"Config property {path} is below {branch_path} which is also being set.")
+                    parent, key = state.index[branch_path]
+                    branch_path = snapshot.parent_path(branch_path, key)
+
+                if not (type(orig_value) is type(value) and orig_value == value):
+                    changes.append((path, value))
+
+            if len(changes) > 0:
+                self.__apply(state, changes)
+
+        self.__publish(changes)
+        if save:
+            self.save()
+
+    @contextlib.contextmanager
+    def transaction(self, save=True):
+        """
+        Groups changes so that they are set together, all or none, when the with block completes. Changes are made
+            through the transaction, which also gets values including changes made in it. Changes are discarded if the
+            block raises an exception. Transactions on the same thread can be nested, changes are set when the
+            outermost completes.
+
+            with Config().transaction() as txn:
+                txn.set('app.setting_1', 'a')
+                txn.set('app.setting_2', 'b')
+
+        :param save: False to set without saving. The config is saved once when the transaction completes.
+        :return: Transaction
+        """
+        txn = getattr(self.__transactions, 'active', None)
+        if txn is None:
+            txn = transaction.Transaction(self, save)
+            self.__transactions.active = txn
+
+        txn.enter()
+        commit = False
+        try:
+            yield txn
+            commit = True
+        finally:
+            try:
+                if txn.exit(commit):
+                    self.__transactions.active = None
+            except BaseException:
+                self.__transactions.active = None
+                raise
+
+    def __apply(self, state, changes, from_layers=False):
+        """
+        Publishes a new snapshot with changes applied. Must be called holding the lock.
+        :param state: the current snapshot
+        :param changes: list of (path, value). Paths must exist.
+        :param from_layers: True if the changes have been merged from layers, so don't need saving.
         :return:
         """
+        # Searches find paths, so only need reindexing if branches are changed
+        if self.__search_index is not None:
+            if any(isinstance(value, dict) or isinstance(state.get(path), dict) for path, value in changes):
+                self.__search_index = None
+        if self.__settings_model is not None:
+            self.__settings_model.update(state, changes)
 
-        # does path exist
-        if self.get(path) is not None:
-            obj = self.__config
-            key_list = path.split(".")
+        if self.__thread_safe:
+            self.__state = state.set_copy_on_write(changes)
+        else:
+            self.__state = state.set_in_place(changes)
 
-            for k in key_list[:-1]:
-                obj = obj[k]
+        if not from_layers:
+            if self.__layers is not None:
+                for path, value in changes:
+                    self.__layers.set(path, value)
+            elif self.__unsaved is not None:
+                # Moved to the end so that the journal keeps the order of changes to a branch and the paths below it
+                for path, value in changes:
+                    self.__unsaved.pop(path, None)
+                    self.__unsaved[path] = value
+            self.__dirty = True
 
-            obj[key_list[-1]] = value
+    def validate(self, path, value):
+        """
+        Checks a value against the constraints in a properties metadata, converting it to the properties __type. The
+            constraints are compiled when the metadata is loaded, see schema.compile_validator.
+        :param path: path to property. Path separated by .
+        :param value: the value
+        :return: the value, converted to the properties __type if it has one
+        :raises ValueError: if the value doesn't meet the constraints
+        """
+        validator = self.__validators.get(path)
+        return value if validator is None else validator(value)
 
     def get_meta(self, path, metakey):
         """
@@ -110,19 +941,42 @@ class Config(object):
         :return: property metadata for metakey
         """
 
-        path += f'.{metakey}'
-        elements = path.split('.')
-        last = None
+        return self.__state.get_meta(path, metakey)
 
-        if self.__meta is not None:
-            for element in elements:
-                if last is None:
-                    if element in self.__meta:
-                        last = self.__meta[element]
-                else:
-                    if element in last:
-                        last = last[element]
-                    else:
-                        last = None
+    def get_all_meta(self, path):
+        """
+        Gets all metadata for a config property. Use this rather than get_meta when more than one metakey is needed
+            for a property.
+        :param path: path to property. Path separated by.
+
+        :return: read only dict of metakey to metadata value. Empty if no metadata is available for the property.
+        """
+
+        return self.__state.get_all_meta(path)
+
+    def settings_model(self):
+        """
+        Gets the model of the settings shown by the settings dialog. The model is kept up to date as the config
+            changes, so is shared by every opening of the dialog. See settingsmodel.SettingsModel.
+        :return: SettingsModel
+        """
+        with self.__lock:
+            if self.__settings_model is None:
+                self.__settings_model = settingsmodel.SettingsModel(self)
+            return self.__settings_model
+
+    def search(self, text, limit=None):
+        """
+        Finds settings, branches and leaves, whose path, key, label or help text contains text. The search index is
+            built on the first search after the config is loaded.
+        :param text: text to search for. Case insensitive. Searches of less than 3 characters match the start of words.
+        :param limit: maximum number of paths to return. None for all.
+        :return: list of matching paths, in config order
+        """
+        index = self.__search_index
+        if index is None:
+            self.__parse_all()
+            index = search.SearchIndex(self.__state)
+            self.__search_index = index
 
-        return last
+        return index.search(text, limit)
@@ -0,0 +1,179 @@
+import collections
+import functools
+import logging
+import threading
+import time
+
+# Config methods that are instrumented. Those with a path as their first argument record per path access counts.
+OPERATIONS = ['load', 'load_layers', 'reload', 'update_layer', 'save', 'get_root_nodes', 'search', 'get_many',
+              'set_many']
+PATH_OPERATIONS = ['get', 'set', 'get_meta', 'get_all_meta']
+
+
+class Histogram(object):
+    """
+    Latency histogram with power of 2 microsecond buckets.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = collections.Counter()  # bucket -> count. Bucket n holds latencies below 2**n microseconds.
+
+    def add(self, seconds):
+        """
+        Adds a latency.
+        :param seconds: latency in seconds
+        :return:
+        """
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[int(seconds * 1e6).bit_length()] += 1
+
+    def percentile(self, percent):
+        """
+        Gets the upper bound of the bucket containing a percentile.
+        :param percent: percentile, 0 to 100
+        :return: latency in seconds. 0 if there are no latencies.
+        """
+        target = self.count * percent / 100
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return min(2 ** bucket / 1e6, self.max)
+        return 0.0
+
+    def to_dict(self):
+        """
+        :return: dict of count, total, mean, max, p50, p90, p99 in seconds and buckets of microsecond upper bound to
+            count
+        """
+        return {'count': self.count, 'total': self.total, 'mean': 0.0 if self.count == 0 else self.total / self.count,
+                'max': self.max, 'p50': self.percentile(50), 'p90': self.percentile(90),
+                'p99': self.percentile(99),
+                'buckets': {2 ** bucket: count for bucket, count in sorted(self.buckets.items())}}
+
+
+class Instrumentation(object):
+    """
+    Records counters, latency histograms, per path access counts and bytes read and written for a Config. Created by
+    Config.enable_instrumentation, which replaces the configs methods with instrumented versions. The methods are
+    restored when disabled, so there is no cost when instrumentation isn't enabled.
+    """
+
+    def __init__(self, track_paths=True):
+        """
+        :param track_paths: False to not count accesses per path
+        """
+        self.__log = logging.getLogger(__name__)
+        self.__lock = threading.Lock()
+        self.__track_paths = track_paths
+        self.__hooks = ()
+        self.reset()
+
+    def reset(self):
+        """
+        Clears the recorded statistics.
+        :return:
+        """
+        with self.__lock:
+            self.__histograms = collections.defaultdict(Histogram)
+            self.__misses = collections.Counter()
+            self.__paths = collections.Counter()
+            self.__bytes_read = 0
+            self.__bytes_written = 0
+
+    def add_hook(self, hook):
+        """
+        Adds a function to be called after every instrumented operation, for example to export metrics.
+        :param hook: function taking operation name, latency in seconds and path (None if the operation has no path)
+        :return:
+        """
+        self.__hooks = self.__hooks + (hook, )
+
+    def remove_hook(self, hook):
+        """
+        Removes a function added with add_hook.
+        :param hook: the function to remove
+        :return:
+        """
+        self.__hooks = tuple(x for x in self.__hooks if x != hook)
+
+    def wrap(self, operation, method):
+        """
+        Wraps a config method to record its latency.
+        :param operation: operation name
+        :param method: bound method
+        :return: wrapped method
+        """
+        has_path = operation in PATH_OPERATIONS
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            value = method(*args, **kwargs)
+            seconds = time.perf_counter() - start
+            path = args[0] if has_path and len(args) > 0 else kwargs.get('path')
+            self.record(operation, seconds, path, miss=operation == 'get' and value is None)
+            return value
+
+        return wrapper
+
+    def record(self, operation, seconds, path=None, miss=False):
+        """
+        Records an operation.
+        :param operation: operation name
+        :param seconds: latency
+        :param path: path accessed, if any
+        :param miss: True if a get returned None
+        :return:
+        """
+        with self.__lock:
+            self.__histograms[operation].add(seconds)
+            if miss:
+                self.__misses[operation] += 1
+            if path is not None and self.__track_paths:
+                self.__paths[path] += 1
+
+        for hook in self.__hooks:
+            try:
+                hook(operation, seconds, path)
+            except Exception:
+                self.__log.exception("Instrumentation hook failed.")
+
+    def add_bytes_read(self, count):
+        """
+        Records bytes read from config files.
+        :param count: number of bytes
+        :return:
+        """
+        with self.__lock:
+            self.__bytes_read += count
+
+    def add_bytes_written(self, count):
+        """
+        Records bytes written to config files.
+        :param count: number of bytes
+        :return:
+        """
+        with self.__lock:
+            self.__bytes_written += count
+
+    def stats(self, top_paths=20):
+        """
+        Gets the recorded statistics.
+        :param top_paths: number of most accessed paths to include
+        :return: dict of operations (operation name -> count, misses and latency histogram as a dict), paths (most
+            accessed paths -> count), bytes_read and bytes_written
+        """
+        with self.__lock:
+            operations = {}
+            for operation, histogram in self.__histograms.items():
+                operations[operation] = histogram.to_dict()
+                operations[operation]['misses'] = self.__misses[operation]
+
+            return {'operations': operations, 'paths': dict(self.__paths.most_common(top_paths)),
+                    'bytes_read': self.__bytes_read, 'bytes_written': self.__bytes_written}
@@ -0,0 +1,136 @@
+import logging
+import os
+import struct
+import time
+import yaml
+import zlib
+from wxconfig import cache
+from wxconfig import snapshot
+
+# Each record is its length and crc32, followed by a yaml list of [path, value]. A record that was only partly
+# written, or is corrupt, ends the journal. Records are yaml rather than pickle, as the journal is read by every load
+# and must not be able to run code.
+RECORD_HEADER = struct.Struct('<II')
+
+# Use libyaml if it is available
+Dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+
+def journal_filepath(path):
+    """
+    Gets the path of the journal for a config file.
+    :param path: path to the config file
+    :return: path to the journal file
+    """
+    return f'{path}.journal'
+
+
+def read(path):
+    """
+    Reads the changes recorded in a journal.
+    :param path: path to the journal file
+    :return: tuple of list of (path, value) in the order they were made, and the length of the journal up to the end
+        of the last complete record. ([], 0) if there is no journal.
+    """
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        return [], 0
+
+    changes = []
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        length, crc = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        try:
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                raise ValueError("Incomplete record.")
+            record = yaml.load(payload.decode(), Loader=cache.Loader)
+        except (ValueError, yaml.YAMLError):
+            logging.getLogger(__name__).warning(f"Ignoring incomplete record at {offset} in journal {path}.")
+            break
+        changes.extend((change_path, value) for change_path, value in record)
+        offset = start + length
+
+    return changes, offset
+
+
+def replay(config, changes):
+    """
+    Applies changes read from a journal to a config tree. Changes to paths that no longer exist are ignored.
+    :param config: config tree. Changed in place.
+    :param changes: list of (path, value)
+    :return:
+    """
+    # Each change is checked against the index as changed by those before it, as a change can be below a branch set
+    # earlier in the journal
+    state = snapshot.Snapshot.build(config)
+    for path, value in changes:
+        if path in state.index:
+            state.set_in_place([(path, value)])
+
+
+class Journal(object):
+    """
+    Append only journal of changes to a config file. Each save appends the changes made since the last, so costs the
+    size of the changes rather than of the config. The journal is replayed when the config is loaded and is compacted by
+    saving the whole config and emptying the journal.
+    """
+
+    def __init__(self, path):
+        """
+        Opens the journal for appending, discarding any incomplete record at its end.
+        :param path: path to the journal file
+        """
+        self.path = path
+        _, length = read(path)
+        self.__file = open(path, 'ab')
+        self.__file.truncate(length)
+        self.size = length
+        self.started = None if length == 0 else time.monotonic()  # When the first record since compaction was added
+
+    def append(self, changes):
+        """
+        Appends changes and waits until they are on disk.
+        :param changes: list of (path, value)
+        :return: number of bytes written
+        """
+        payload = yaml.dump([[path, value] for path, value in changes], Dumper=Dumper, allow_unicode=True,
+                            default_flow_style=True).encode()
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        self.__file.write(record)
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+
+        self.size += len(record)
+        if self.started is None:
+            self.started = time.monotonic()
+        return len(record)
+
+    def age(self):
+        """
+        :return: seconds since the first record was added since the journal was last emptied. 0 if empty.
+        """
+        return 0.0 if self.started is None else time.monotonic() - self.started
+
+    def clear(self):
+        """
+        Empties the journal. Call once its changes have been saved to the config file.
+        :return:
+        """
+        self.__file.truncate(0)
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+        self.size = 0
+        self.started = None
+
+    def close(self):
+        """
+        Closes the journal file. The file is removed if it is empty.
+        :return:
+        """
+        self.__file.close()
+        if self.size == 0 and os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,303 @@
+import copy
+import os
+import yaml
+from wxconfig import cache
+from wxconfig import watcher
+from wxconfig import writer
+
+# Marks a path that isn't in a tree
+MISSING = object()
+
+
+def branch_path(path):
+    """
+    Gets the path of the branch containing a path. Layer paths are split on every ., so keys must not contain dots.
+    :param path: dotted path
+    :return: path of the branch. None for root nodes.
+    """
+    branch = path.rpartition('.')[0]
+    return None if branch == '' else branch
+
+
+def lookup(tree, path):
+    """
+    Gets the value at a path in a tree.
+    :param tree: config tree
+    :param path: dotted path. None for the whole tree.
+    :return: value, or MISSING if the path isn't in the tree
+    """
+    if path is None:
+        return tree
+
+    value = tree
+    for element in path.split('.'):
+        if not isinstance(value, dict) or element not in value:
+            return MISSING
+        value = value[element]
+
+    return value
+
+
+def merge(values):
+    """
+    Deep merges values. Dicts are merged key by key, any other value replaces the values before it.
+    :param values: values to merge, lowest priority first. MISSING values are skipped.
+    :return: merged value. New dicts are created for merged branches, leaves are shared. MISSING if all are MISSING.
+    """
+    merged = MISSING
+    for value in values:
+        if value is MISSING:
+            continue
+        if isinstance(value, dict):
+            base = merged if isinstance(merged, dict) else {}
+            merged = {key: merge([base.get(key, MISSING), value.get(key, MISSING)]) for key in list(base) +
+                      [key for key in value if key not in base]}
+        else:
+            merged = value
+
+    return merged
+
+
+class Layer(object):
+    """
+    A layer of config. Layers are stacked, with the settings in each layer overriding those in the layers below.
+    """
+
+    # False if changes to the layer can't be saved
+    writable = True
+
+    def __init__(self, name):
+        """
+        :param name: name of the layer. Unique within a stack.
+        """
+        self.name = name
+        self.tree = {}
+
+    def read(self):
+        """
+        Reads the layers settings.
+        :return: config tree
+        """
+        return self.tree
+
+    def write(self):
+        """
+        Writes the layers settings.
+        :return:
+        """
+        pass
+
+    def files(self):
+        """
+        Gets the files that the layer is read from.
+        :return: list of paths
+        """
+        return []
+
+
+class DictLayer(Layer):
+    """
+    A layer of settings held in a dict.
+    """
+
+    def __init__(self, tree, name='dict'):
+        """
+        :param tree: config tree
+        :param name: name of the layer
+        """
+        Layer.__init__(self, name)
+        self.tree = tree
+
+
+class FileLayer(Layer):
+    """
+    A layer of settings in a yaml file.
+    """
+
+    def __init__(self, path, name=None, cache_dir=None):
+        """
+        :param path: path to yaml file. The layer is empty if the file doesn't exist, and is created on save.
+        :param name: name of the layer. Defaults to path.
+        :param cache_dir: directory to cache the parsed file in. Optional, see Config.load.
+        """
+        Layer.__init__(self, path if name is None else name)
+        self.path = path
+        self.cache_dir = cache_dir
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return {}
+
+        tree = cache.load_yaml(self.path, self.cache_dir)
+        return {} if tree is None else tree
+
+    def write(self):
+        writer.atomic_write(self.path, writer.dump_yaml(self.tree))
+
+    def files(self):
+        return [self.path]
+
+
+class EnvLayer(Layer):
+    """
+    A layer of settings from environment variables starting with a prefix. The rest of the variable name is the path,
+    with separator between elements. Values are parsed as yaml scalars, so numbers and booleans keep their types. For
+    example, with prefix MYAPP_, MYAPP_DATABASE__PORT=5432 sets database.port to 5432. The layer can't be saved.
+    """
+
+    writable = False
+
+    def __init__(self, prefix, separator='__', lowercase=True, name=None):
+        """
+        :param prefix: prefix of the environment variables to read
+        :param separator: separator between path elements in variable names
+        :param lowercase: True to lowercase paths
+        :param name: name of the layer. Defaults to prefix.
+        """
+        Layer.__init__(self, prefix if name is None else name)
+        self.prefix = prefix
+        self.separator = separator
+        self.lowercase = lowercase
+
+    def read(self):
+        tree = {}
+        for variable, text in os.environ.items():
+            if not variable.startswith(self.prefix) or variable == self.prefix:
+                continue
+
+            path = variable[len(self.prefix):]
+            path = path.lower() if self.lowercase else path
+            elements = path.split(self.separator)
+            try:
+                value = yaml.safe_load(text)
+            except yaml.YAMLError:
+                value = text
+            value = text if isinstance(value, (dict, list)) or value is None else value
+
+            branch = tree
+            for element in elements[:-1]:
+                if not isinstance(branch.get(element), dict):
+                    branch[element] = {}
+                branch = branch[element]
+            branch[elements[-1]] = value
+
+        return tree
+
+
+class LayerStack(object):
+    """
+    An ordered stack of layers, merged into a single config tree.
+    """
+
+    def __init__(self, layers):
+        """
+        :param layers: list of Layer, lowest priority first.
+        """
+        self.layers = list(layers)
+        self.__dirty = set()  # Names of layers with unsaved changes
+
+        names = [layer.name for layer in self.layers]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Layer names must be unique. Got {names}.")
+
+    def read(self):
+        """
+        Reads every layer and merges them.
+        :return: merged config tree
+        """
+        for layer in self.layers:
+            layer.tree = layer.read()
+        self.__dirty = set()
+
+        return self.merged(None)
+
+    def merged(self, path):
+        """
+        Merges the layers at a path.
+        :param path: dotted path. None for the whole tree.
+        :return: merged value. MISSING if no layer has the path.
+        """
+        merged = merge([lookup(layer.tree, path) for layer in self.layers])
+        return {} if merged is MISSING and path is None else merged
+
+    def layer(self, name):
+        """
+        Gets a layer by name.
+        :param name: layer name
+        :return: Layer
+        :raises KeyError: if there is no layer with name
+        """
+        for layer in self.layers:
+            if layer.name == name:
+                return layer
+
+        raise KeyError(f"No config layer named {name}.")
+
+    def owner(self, path):
+        """
+        Gets the layer that owns a path, the highest priority layer that has it.
+        :param path: dotted path
+        :return: Layer. None if no layer has path.
+        """
+        for layer in reversed(self.layers):
+            if lookup(layer.tree, path) is not MISSING:
+                return layer
+
+        return None
+
+    def set(self, path, value):
+        """
+        Sets a value in the layer that owns path.
+        :param path: dotted path. Must be in a layer.
+        :param value: value to set
+        :return:
+        """
+        layer = self.owner(path)
+        lookup(layer.tree, branch_path(path))[path.rpartition('.')[2]] = copy.deepcopy(value)
+        self.__dirty.add(layer.name)
+
+    def write(self):
+        """
+        Writes the layers with unsaved changes. Changes to layers that can't be written are kept in memory only.
+        :return: list of the files written
+        """
+        written = []
+        for layer in self.layers:
+            if layer.name in self.__dirty and layer.writable:
+                layer.write()
+                written.extend(layer.files())
+        self.__dirty = set()
+
+        return written
+
+    def files(self):
+        """
+        Gets the files that the layers are read from.
+        :return: list of paths
+        """
+        return [path for layer in self.layers for path in layer.files()]
+
+    def replace(self, name, tree):
+        """
+        Replaces a layers settings.
+        :param name: layer name
+        :param tree: the layers new config tree
+        :return: list of the top most changed paths. Only the merged tree at these paths needs to be merged again.
+        """
+        layer = self.layer(name)
+        old_tree, layer.tree = layer.tree, tree
+        self.__dirty.discard(name)
+
+        # Only the branches containing changes need merging again. Keep the top most of each, those without a changed
+        # branch above them.
+        changed = watcher.diff_trees(old_tree, tree)
+        changed_set = set(changed)
+        tops = []
+        for path in changed:
+            branch_path = path.rpartition('.')[0]
+            while branch_path != '' and branch_path not in changed_set:
+                branch_path = branch_path.rpartition('.')[0]
+            if branch_path == '':
+                tops.append(path)
+
+        return tops
@@ -0,0 +1,129 @@
+import yaml
+from wxconfig import cache
+
+# Line breaks, other than \n, that yaml recognises. Documents containing them are parsed in full.
+OTHER_LINE_BREAKS = ['\r', '\x85', '\u2028', '\u2029']
+
+
+class LazyDocument(object):
+    """
+    A yaml document whose root nodes are parsed individually, on demand. The document is scanned once to find the
+    lines of each root node.
+    """
+
+    def __init__(self, lines, roots):
+        """
+        Use scan to create.
+        :param lines: the documents lines
+        :param roots: dict of root key -> (first line, end line) of the root node, including its key
+        """
+        self.__lines = lines
+        self.__roots = roots
+        self.unparsed = set(roots)
+
+    @classmethod
+    def scan(cls, text):
+        """
+        Scans a yaml document for its root nodes. The scan reads the documents events, which is much faster than
+            loading it.
+        :param text: the yaml document
+        :return: LazyDocument. None if the document can't be split into root nodes, for example if it isn't a block
+            mapping, root keys aren't strings, or it uses anchors which could be shared between root nodes.
+        """
+        text = text.replace('\r\n', '\n')
+        if any(line_break in text for line_break in OTHER_LINE_BREAKS):
+            return None
+
+        resolver = yaml.resolver.Resolver()
+        starts = []  # (key, first line) of each root node
+        end_line = None
+        root_started = False
+        depth = 0
+        expect_key = True
+        try:
+            for event in yaml.parse(text, Loader=cache.Loader):
+                if isinstance(event, (yaml.StreamStartEvent, yaml.DocumentStartEvent)):
+                    continue
+
+                if isinstance(event, yaml.AliasEvent) or getattr(event, 'anchor', None) is not None:
+                    return None
+
+                # The root node must be a block mapping
+                if not root_started:
+                    if not isinstance(event, yaml.MappingStartEvent) or event.flow_style:
+                        return None
+                    root_started = True
+                    continue
+
+                if depth == 0 and expect_key:
+                    if isinstance(event, yaml.MappingEndEvent):
+                        end_line = event.start_mark.line
+                        break
+
+                    # Root key. Must be a unique string starting its own line.
+                    if not isinstance(event, yaml.ScalarEvent) or event.start_mark.column != 0 or \
+                            (len(starts) > 0 and starts[-1][1] == event.start_mark.line):
+                        return None
+                    tag = event.tag if event.tag is not None else \
+                        resolver.resolve(yaml.ScalarNode, event.value, event.implicit)
+                    if tag != cache.STR_TAG or event.value in [key for key, _ in starts]:
+                        return None
+
+                    starts.append((event.value, event.start_mark.line))
+                    expect_key = False
+                    continue
+
+                # Root value. Track depth to find where it ends.
+                if isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+                    depth += 1
+                elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+                    depth -= 1
+                expect_key = depth == 0
+        except yaml.YAMLError:
+            return None
+
+        if end_line is None:
+            return None
+
+        lines = text.split('\n')
+        roots = {}
+        for i, (key, first_line) in enumerate(starts):
+            roots[key] = (first_line, starts[i + 1][1] if i + 1 < len(starts) else end_line)
+
+        return cls(lines, roots)
+
+    def keys(self):
+        """
+        Gets the root keys.
+        :return: list of root keys, in document order
+        """
+        return list(self.__roots)
+
+    def find_root(self, path):
+        """
+        Gets the unparsed root node that a path is in.
+        :param path: dotted path
+        :return: root key. None if the path isn't in an unparsed root node.
+        """
+        if path in self.unparsed:
+            return path
+
+        position = path.find('.')
+        while position >= 0:
+            if path[:position] in self.unparsed:
+                return path[:position]
+            position = path.find('.', position + 1)
+
+        return None
+
+    def parse(self, key):
+        """
+        Parses a root node, marking it as parsed.
+        :param key: root key
+        :return: the root nodes value
+        """
+        # The line break ending the root nodes last line is part of a block scalar ending the node
+        first_line, end_line = self.__roots[key]
+        tree = yaml.load('\n'.join(self.__lines[first_line:end_line]) + '\n', Loader=cache.Loader)
+        self.unparsed.discard(key)
+        return tree[key]
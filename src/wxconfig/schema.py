@@ -0,0 +1,177 @@
+import re
+
+# Metakeys that constrain a settings value
+CONSTRAINTS = ('__type', '__min', '__max', '__choices', '__pattern')
+
+# Strings that are converted to booleans
+TRUE_STRINGS = frozenset(['true', '1', 'yes', 't', 'on'])
+FALSE_STRINGS = frozenset(['false', '0', 'no', 'f', 'off', ''])
+
+
+def to_bool(value):
+    """
+    Converts a value to a bool. Strings such as 'true' and 'no' are converted, as entered in the settings dialog.
+    :param value: bool, int or str
+    :return: bool
+    :raises ValueError: if the value can't be converted
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return value != 0
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in TRUE_STRINGS:
+            return True
+        if text in FALSE_STRINGS:
+            return False
+    raise ValueError(f"{value!r} is not a boolean.")
+
+
+def to_int(value):
+    """
+    Converts a value to an int. Floats are only converted if they are whole numbers.
+    :param value: int, float or str
+    :return: int
+    :raises ValueError: if the value can't be converted
+    """
+    if isinstance(value, bool):
+        raise ValueError(f"{value!r} is not an integer.")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        return int(value.strip())
+    raise ValueError(f"{value!r} is not an integer.")
+
+
+def to_float(value):
+    """
+    Converts a value to a float.
+    :param value: int, float or str
+    :return: float
+    :raises ValueError: if the value can't be converted
+    """
+    if isinstance(value, bool):
+        raise ValueError(f"{value!r} is not a number.")
+    if isinstance(value, (int, float, str)):
+        return float(value)
+    raise ValueError(f"{value!r} is not a number.")
+
+
+def to_str(value):
+    """
+    Converts a scalar value to a str.
+    :param value: str, int, float or bool
+    :return: str
+    :raises ValueError: if the value isn't a scalar
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return str(value)
+    raise ValueError(f"{value!r} is not a string.")
+
+
+# __type name -> converter
+CONVERTERS = {'str': to_str, 'int': to_int, 'float': to_float, 'bool': to_bool}
+
+# Type of a settings value -> converter. Used by the settings dialog for settings without a __type.
+TYPE_CONVERTERS = {str: to_str, int: to_int, float: to_float, bool: to_bool}
+
+
+def convert_like(path, value, like):
+    """
+    Converts a value entered as a str, for example in the settings dialog, to the type of a settings current value.
+        Use for settings without a __type, before validating.
+    :param path: path to the setting, for error messages
+    :param value: the entered value
+    :param like: the settings current value
+    :return: the value converted. Unchanged if it isn't a str or the current value has no converter.
+    :raises ValueError: if the value can't be converted
+    """
+    convert = TYPE_CONVERTERS.get(type(like))
+    if not isinstance(value, str) or convert is None:
+        return value
+    try:
+        return convert(value)
+    except ValueError:
+        raise ValueError(f"{path} must be of type {type(like).__name__}, not {value!r}.")
+
+
+def compile_validator(path, record):
+    """
+    Compiles the constraints in a settings metadata record into a single function that checks and converts a value.
+        Constraints are:
+            __type: str, int, float or bool. Values are converted to the type.
+            __min, __max: inclusive limits.
+            __choices: list of allowed values.
+            __pattern: regular expression that the whole value must match.
+    :param path: path to the setting, for error messages
+    :param record: the settings metadata
+    :return: function taking a value and returning it converted. Raises ValueError if the value isn't valid. None if
+        the setting has no constraints.
+    :raises ValueError: if a constraint is invalid
+    """
+    if not any(key in record for key in CONSTRAINTS):
+        return None
+
+    type_name = record.get('__type')
+    convert = None
+    if type_name is not None:
+        convert = CONVERTERS.get(type_name)
+        if convert is None:
+            raise ValueError(f"Unknown __type {type_name} for {path}. Use one of {', '.join(CONVERTERS)}.")
+
+    choices = record.get('__choices')
+    if choices is not None:
+        choices = list(choices) if convert is None else [convert(choice) for choice in choices]
+        try:
+            choices = frozenset(choices)
+        except TypeError:
+            pass
+    minimum = record.get('__min')
+    maximum = record.get('__max')
+    pattern = record.get('__pattern')
+    if pattern is not None:
+        try:
+            pattern = re.compile(pattern)
+        except re.error as error:
+            raise ValueError(f"Invalid __pattern for {path}: {error}.")
+
+    def validate(value):
+        if convert is not None:
+            try:
+                value = convert(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{path} must be of type {type_name}, not {value!r}.")
+        if choices is not None and value not in choices:
+            raise ValueError(f"{path} must be one of {', '.join(str(x) for x in choices)}, not {value!r}.")
+        try:
+            if minimum is not None and value < minimum:
+                raise ValueError(f"{path} must be at least {minimum}, not {value!r}.")
+            if maximum is not None and value > maximum:
+                raise ValueError(f"{path} must be at most {maximum}, not {value!r}.")
+        except TypeError:
+            raise ValueError(f"{path} must be comparable with its limits, not {value!r}.")
+        if pattern is not None and (not isinstance(value, str) or pattern.fullmatch(value) is None):
+            raise ValueError(f"{path} must match {pattern.pattern}, not {value!r}.")
+        return value
+
+    return validate
+
+
+def compile_validators(meta_index):
+    """
+    Compiles a validator for every setting with constraints in its metadata.
+    :param meta_index: dotted path -> metadata record. See snapshot.index_meta.
+    :return: dict of path -> validator, see compile_validator
+    :raises ValueError: if a constraint is invalid
+    """
+    validators = {}
+    for path, record in meta_index.items():
+        validator = compile_validator(path, record)
+        if validator is not None:
+            validators[path] = validator
+    return validators
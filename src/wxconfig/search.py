@@ -0,0 +1,85 @@
+import bisect
+import re
+
+# Splits searchable text into words for the prefix index
+WORD_SPLIT = re.compile(r'[^0-9a-z]+')
+
+
+def trigrams(text):
+    """
+    Gets the trigrams, every 3 character substring, of text.
+    :param text: text
+    :return: set of trigrams
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex(object):
+    """
+    Index for finding settings by text in their path, key, label or help text. Searches of 3 or more characters match
+    anywhere in the text using a trigram index, shorter searches match the start of words using a sorted word list.
+    """
+
+    def __init__(self, state):
+        """
+        Builds the index for every branch and leaf in a config snapshot.
+        :param state: Snapshot
+        """
+        self.__paths = []
+        self.__texts = []
+        self.__trigrams = {}
+        words = {}
+
+        for path, (_, key) in state.index.items():
+            meta = state.get_all_meta(path)
+            text = ' '.join(f'{part}' for part in [path, key, meta.get('__label'), meta.get('__helptext')]
+                            if part is not None).lower()
+
+            entry = len(self.__paths)
+            self.__paths.append(path)
+            self.__texts.append(text)
+            for trigram in trigrams(text):
+                self.__trigrams.setdefault(trigram, []).append(entry)
+            for word in WORD_SPLIT.split(text):
+                if word != '':
+                    words.setdefault(word, []).append(entry)
+
+        self.__words = sorted(words)
+        self.__word_entries = [words[word] for word in self.__words]
+
+    def search(self, text, limit=None):
+        """
+        Finds settings matching text. Case insensitive.
+        :param text: text to search for
+        :param limit: maximum number of paths to return. None for all.
+        :return: list of matching paths, in config order
+        """
+        text = text.strip().lower()
+        if text == '':
+            return []
+
+        if len(text) >= 3:
+            # Candidates are the entries containing every trigram in text. Start from the rarest.
+            postings = sorted((self.__trigrams.get(trigram, []) for trigram in trigrams(text)), key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+                if len(candidates) == 0:
+                    break
+
+            # Trigrams can match out of order. Check the text is really there.
+            matches = sorted(entry for entry in candidates if text in self.__texts[entry])
+        else:
+            # Entries with a word starting with text
+            start = bisect.bisect_left(self.__words, text)
+            matches = set()
+            for i in range(start, len(self.__words)):
+                if not self.__words[i].startswith(text):
+                    break
+                matches.update(self.__word_entries[i])
+            matches = sorted(matches)
+
+        if limit is not None:
+            matches = matches[:limit]
+
+        return [self.__paths[entry] for entry in matches]
@@ -0,0 +1,138 @@
+import threading
+from wxconfig import snapshot
+
+
+class SettingsModel(object):
+    """
+    The structure of the config as shown by the settings dialog: the tabs, the branches in each tree and the leaf
+    settings of each branch, with their labels and help text. Doesn't need wx, so can be tested and benchmarked
+    without a display.
+
+    Each branch is worked out when it is first shown and kept until the config is loaded or reloaded, so reopening the
+    dialog doesn't repeat the work. Setting a leaf value changes nothing here, values are always got from the config.
+    Replacing a branch, or a leaf with a branch, forgets only the branches around it. Get the model for a config with
+    Config.settings_model.
+    """
+
+    def __init__(self, config):
+        """
+        :param config: Config whose settings are modelled
+        """
+        self.__config = config
+        self.__lock = threading.Lock()  # Held whilst changing the nodes. Never held whilst using the config.
+        self.__nodes = {}  # branch path -> (branches, leaves). See branches and leaves.
+        self.__root_nodes = {}  # frozenset of excluded root nodes -> list of root nodes
+        self.__generation = 0  # Incremented whenever anything is forgotten
+
+    def root_nodes(self, exclude=()):
+        """
+        Gets the root nodes shown as tabs.
+        :param exclude: root nodes not to show
+        :return: list of root nodes, in config order
+        """
+        exclude = frozenset(exclude)
+        root_nodes = self.__root_nodes.get(exclude)
+        if root_nodes is None:
+            generation = self.__generation
+            root_nodes = [node for node in self.__config.get_root_nodes() if node not in exclude]
+            with self.__lock:
+                if generation == self.__generation:
+                    self.__root_nodes[exclude] = root_nodes
+        return root_nodes
+
+    def branches(self, path):
+        """
+        Gets the branches directly under a branch, shown as nodes in the tree.
+        :param path: path of the branch
+        :return: list of (path, label, help text, True if it has branches under it), in config order. The label is
+            the key if there is no __label in the metadata. Help text is None if there is no __helptext.
+        """
+        return self.__node(path)[0]
+
+    def leaves(self, path):
+        """
+        Gets the leaf settings of a branch, shown as rows in the value panel.
+        :param path: path of the branch
+        :return: list of (path, label, help text), in config order. See branches.
+        """
+        return self.__node(path)[1]
+
+    def is_branch(self, path):
+        """
+        :param path: path of a setting
+        :return: True if the setting is a branch
+        """
+        parent = path.rsplit('.', 1)[0] if '.' in path else None
+        if parent is None:
+            return isinstance(self.__config.get(path), dict)
+        return any(branch_path == path for branch_path, _, _, _ in self.branches(parent))
+
+    def update(self, state, changes):
+        """
+        Forgets the branches changed by a set. Called by Config before the changes are made.
+        :param state: the snapshot being changed
+        :param changes: list of (path, value)
+        :return:
+        """
+        for path, value in changes:
+            # Leaf values aren't held, so only changes to or from a branch matter
+            if not isinstance(value, dict) and not isinstance(state.get(path), dict):
+                continue
+
+            # The branch and everything under it, its parent whose list of branches and leaves has changed, and the
+            # parents parent which shows whether the parent has branches under it.
+            with self.__lock:
+                self.__generation += 1
+                prefix = f'{path}.'
+                for node_path in [node_path for node_path in self.__nodes
+                                  if node_path == path or node_path.startswith(prefix)]:
+                    del self.__nodes[node_path]
+                for _ in range(2):
+                    if '.' not in path:
+                        break
+                    path = path.rsplit('.', 1)[0]
+                    self.__nodes.pop(path, None)
+
+    def clear(self):
+        """
+        Forgets everything. Called by Config when the config is loaded or reloaded.
+        :return:
+        """
+        with self.__lock:
+            self.__generation += 1
+            self.__nodes = {}
+            self.__root_nodes = {}
+
+    def __node(self, path):
+        """
+        Gets the branches and leaves of a branch, working them out if not already known.
+        :param path: path of the branch
+        :return: tuple of branches and leaves
+        """
+        node = self.__nodes.get(path)
+        if node is not None:
+            return node
+
+        # Work out the node. If anything is forgotten meanwhile, it may have been worked out from the old config so
+        # isn't kept.
+        generation = self.__generation
+        config = self.__config
+        branches = []
+        leaves = []
+        settings = config.get(path)
+        for key, value in (settings.items() if isinstance(settings, dict) else ()):
+            setting_path = snapshot.join(path, key)
+            meta = config.get_all_meta(setting_path)
+            label = meta.get('__label')
+            label = f'{key}' if label is None else label
+            if isinstance(value, dict):
+                branches.append((setting_path, label, meta.get('__helptext'),
+                                 any(isinstance(child, dict) for child in value.values())))
+            else:
+                leaves.append((setting_path, label, meta.get('__helptext')))
+
+        node = (branches, leaves)
+        with self.__lock:
+            if generation == self.__generation:
+                self.__nodes[path] = node
+        return node
@@ -0,0 +1,267 @@
+import mmap
+import os
+import pickle
+import struct
+import types
+from wxconfig import snapshot
+from wxconfig import writer
+
+# Shared snapshot file layout. All offsets are from the start of the file.
+#   header: magic, format version, generation, record count, records offset, root keys offset and length, metadata
+#       offset and length
+#   records: one for each path, sorted by path so that paths can be found by binary search. Keys in paths are
+#       separated by \0 rather than . so that every path below a branch sorts directly after it.
+#   data: paths, and pickled (key, value) for each path. Branches are pickled with no value and built from the paths
+#       below them when got.
+MAGIC = b'WXCS'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHxxQIIIIII')
+RECORD = struct.Struct('<IIIIII')  # path offset, path length, data offset, data length, config order, is branch
+PATH_FIELDS = struct.Struct('<II')  # the path offset and length at the start of a record
+
+
+def encode_path(path):
+    """
+    Encodes a dotted path as stored in a shared snapshot file.
+    :param path: path separated by .
+    :return: bytes
+    """
+    return path.replace('.', '\0').encode()
+
+
+def write(path, state, generation):
+    """
+    Writes a snapshot of the config to a shared snapshot file. The file is replaced atomically, so processes attached
+        to the previous file can keep reading it.
+    :param path: path to the shared snapshot file. Use a file in /dev/shm to keep it in shared memory.
+    :param state: Snapshot of the config to write
+    :param generation: generation of the snapshot. Must be greater than that of the file being replaced.
+    :return:
+    """
+    # List every path in config order
+    config = state.tree() or {}
+    entries = []
+    stack = [(None, config)]
+    while len(stack) > 0:
+        branch_path, tree = stack.pop()
+        children = []
+        for key, value in tree.items():
+            key_path = snapshot.join(branch_path, key)
+            is_branch = isinstance(value, dict)
+            entries.append((encode_path(key_path), len(entries),
+                            pickle.dumps((key, None if is_branch else value), pickle.HIGHEST_PROTOCOL), is_branch))
+            if is_branch:
+                children.append((key_path, value))
+        stack.extend(reversed(children))
+    entries.sort()
+
+    roots = pickle.dumps(list(config), pickle.HIGHEST_PROTOCOL)
+    meta = pickle.dumps({path: dict(record) for path, record in state.meta_index.items()}, pickle.HIGHEST_PROTOCOL)
+
+    # Lay out the records, then the data they point to
+    records_offset = HEADER.size
+    offset = records_offset + RECORD.size * len(entries)
+    records = bytearray()
+    data = [roots, meta]
+    roots_offset = offset
+    meta_offset = roots_offset + len(roots)
+    offset = meta_offset + len(meta)
+    for encoded_path, order, value, is_branch in entries:
+        records += RECORD.pack(offset, len(encoded_path), offset + len(encoded_path), len(value), order, is_branch)
+        data.append(encoded_path)
+        data.append(value)
+        offset += len(encoded_path) + len(value)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, generation, len(entries), records_offset, roots_offset, len(roots),
+                         meta_offset, len(meta))
+    writer.atomic_write(path, b''.join([header, bytes(records)] + data))
+
+
+def read_generation(path):
+    """
+    Reads the generation of a shared snapshot file.
+    :param path: path to the shared snapshot file
+    :return: generation. 0 if there is no file.
+    """
+    try:
+        with open(path, 'rb') as file:
+            header = file.read(HEADER.size)
+    except FileNotFoundError:
+        return 0
+
+    return MappedFile.unpack_header(header)[2]
+
+
+class MappedFile(object):
+    """
+    A shared snapshot file mapped into memory. Values are decoded from the mapping only when they are got.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path to the shared snapshot file
+        """
+        with open(path, 'rb') as file:
+            self.stat = os.fstat(file.fileno())
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (_, _, self.generation, self.count, self.records_offset, roots_offset, roots_length, meta_offset,
+         meta_length) = self.unpack_header(self.map[:HEADER.size])
+        self.roots = (roots_offset, roots_length)
+        self.meta = (meta_offset, meta_length)
+        self.meta_index = None  # Decoded when metadata is first got
+
+    @staticmethod
+    def unpack_header(header):
+        """
+        Unpacks and checks a shared snapshot file header.
+        :param header: header bytes
+        :return: tuple of header fields
+        :raises ValueError: if it isn't a shared snapshot file of this format version
+        """
+        if len(header) < HEADER.size:
+            raise ValueError("Not a shared config snapshot.")
+        fields = HEADER.unpack(header)
+        if fields[0] != MAGIC or fields[1] != FORMAT_VERSION:
+            raise ValueError("Not a shared config snapshot, or written by a different version of wxconfig.")
+        return fields
+
+    def record(self, i):
+        """
+        :param i: record number
+        :return: tuple of path offset, path length, data offset, data length, config order, is branch
+        """
+        return RECORD.unpack_from(self.map, self.records_offset + i * RECORD.size)
+
+    def path(self, i):
+        """
+        :param i: record number
+        :return: encoded path of record i
+        """
+        path_offset, path_length = PATH_FIELDS.unpack_from(self.map, self.records_offset + i * RECORD.size)
+        return self.map[path_offset:path_offset + path_length]
+
+    def bisect(self, encoded_path):
+        """
+        Finds the first record whose path is not less than encoded_path.
+        :param encoded_path: path encoded by encode_path
+        :return: record number
+        """
+        mapped, records_offset, unpack_from = self.map, self.records_offset, PATH_FIELDS.unpack_from
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            path_offset, path_length = unpack_from(mapped, records_offset + middle * RECORD.size)
+            if mapped[path_offset:path_offset + path_length] < encoded_path:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def decode(self, offset, length):
+        """
+        Decodes pickled data.
+        :return: the unpickled object
+        """
+        return pickle.loads(self.map[offset:offset + length])
+
+
+class SharedSnapshot(object):
+    """
+    A read only config snapshot shared between processes, for example pre-forked workers. The parent publishes the
+    config with Config.publish_shared, and each worker attaches to the published file. The file is mapped into memory
+    rather than read, so every worker shares the same pages, and values are decoded only when they are got. Has the
+    same get, get_root_nodes, get_meta and get_all_meta methods as Snapshot.
+
+    Each publish increments the generation. Workers call refresh, for example before handling each request, to pick
+    up a newer snapshot.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path to the shared snapshot file
+        """
+        self.path = path
+        self.__file = MappedFile(path)
+
+    @property
+    def generation(self):
+        """
+        The generation of the snapshot being read.
+        """
+        return self.__file.generation
+
+    def refresh(self):
+        """
+        Attaches to a newer snapshot if one has been published. Only stats the file if none has.
+        :return: True if a newer snapshot was attached
+        """
+        current = self.__file
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if (stat.st_ino, stat.st_mtime_ns, stat.st_size) == (current.stat.st_ino, current.stat.st_mtime_ns,
+                                                             current.stat.st_size):
+            return False
+
+        # The old mapping is closed when no longer used by any reader
+        mapped = MappedFile(self.path)
+        if mapped.generation <= current.generation:
+            return False
+        self.__file = mapped
+        return True
+
+    def get(self, path):
+        """
+        Gets a config property value. See Config.get. Branches are built from the values below them.
+        """
+        mapped = self.__file
+        encoded_path = encode_path(path)
+        i = mapped.bisect(encoded_path)
+        if i == mapped.count or mapped.path(i) != encoded_path:
+            return None
+
+        _, _, data_offset, data_length, _, is_branch = mapped.record(i)
+        value = mapped.decode(data_offset, data_length)[1]
+        if not is_branch:
+            return value
+
+        # Every path below the branch sorts between the branch and the branch path followed by \1
+        end = mapped.bisect(encoded_path + b'\1')
+        below = sorted((mapped.record(j) for j in range(i + 1, end)), key=lambda record: record[4])
+        branches = {encoded_path: {}}
+        for path_offset, path_length, data_offset, data_length, _, is_branch in below:
+            child_path = mapped.map[path_offset:path_offset + path_length]
+            key, value = mapped.decode(data_offset, data_length)
+            if is_branch:
+                value = {}
+                branches[child_path] = value
+            branches[child_path[:child_path.rindex(b'\0')]][key] = value
+
+        return branches[encoded_path]
+
+    def get_root_nodes(self):
+        """
+        Returns all root notes as a list. See Config.get_root_nodes.
+        """
+        mapped = self.__file
+        return mapped.decode(*mapped.roots)
+
+    def get_meta(self, path, metakey):
+        """
+        Gets the metadata for a config property. See Config.get_meta.
+        """
+        return self.get_all_meta(path).get(metakey)
+
+    def get_all_meta(self, path):
+        """
+        Gets all metadata for a config property. See Config.get_all_meta.
+        """
+        mapped = self.__file
+        meta_index = mapped.meta_index
+        if meta_index is None:
+            meta_index = {path: types.MappingProxyType(record) for path, record in mapped.decode(*mapped.meta).items()}
+            mapped.meta_index = meta_index
+
+        return meta_index.get(path, snapshot.NO_META)
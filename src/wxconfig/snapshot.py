@@ -0,0 +1,313 @@
+import types
+
+# Returned for paths without metadata
+NO_META = types.MappingProxyType({})
+
+# Marks a path removed from a LayeredIndex
+REMOVED = object()
+
+
+def join(path, key):
+    """
+    Joins a path and a key.
+    :param path: path. None for the root of the config.
+    :param key: key under path
+    :return: dotted path to key
+    """
+    return f'{key}' if path is None else f'{path}.{key}'
+
+
+def parent_path(path, key):
+    """
+    Gets the path of the branch containing a property.
+    :param path: path to property
+    :param key: key of the property in its branch
+    :return: path of the branch. None if the property is a root node.
+    """
+    length = len(path) - len(f'{key}') - 1
+    return None if length < 0 else path[:length]
+
+
+def index_tree(index, tree, path):
+    """
+    Adds every path in tree to a path index.
+    :param index: the path index to add to.
+    :param tree: dict of settings to index.
+    :param path: path to tree. None if tree is the root of the config.
+    :return:
+    """
+    if not isinstance(tree, dict):
+        return
+
+    for key, value in tree.items():
+        key_path = join(path, key)
+        index[key_path] = (tree, key)
+        if isinstance(value, dict):
+            index_tree(index, value, key_path)
+
+
+def unindex_tree(index, tree, path):
+    """
+    Removes every path below tree from a path index.
+    :param index: the path index to remove from.
+    :param tree: dict of settings that have been removed from the config.
+    :param path: path to tree.
+    :return:
+    """
+    for key, value in tree.items():
+        key_path = f'{path}.{key}'
+        index.pop(key_path, None)
+        if isinstance(value, dict):
+            unindex_tree(index, value, key_path)
+
+
+def index_meta(meta_index, tree, path):
+    """
+    Adds a metadata record for every path in the metadata tree to a metadata index. Keys starting with __ are
+        metakeys, all other keys are paths to further properties.
+    :param meta_index: the metadata index to add to.
+    :param tree: dict of metadata to index.
+    :param path: path to tree. None if tree is the root of the metadata.
+    :return:
+    """
+    if not isinstance(tree, dict):
+        return
+
+    record = {}
+    for key, value in tree.items():
+        if f'{key}'.startswith('__'):
+            record[key] = value
+        elif isinstance(value, dict):
+            index_meta(meta_index, value, join(path, key))
+
+    if path is not None and len(record) > 0:
+        meta_index[path] = types.MappingProxyType(record)
+
+
+class LayeredIndex(object):
+    """
+    A path index made of a base index, shared with earlier snapshots, and the entries changed since it was made. Has
+    the same methods as a path index dict. Used in thread safe mode, so that each change copies only the entries
+    changed since the base, not the whole index. See Snapshot.set_copy_on_write.
+    """
+
+    __slots__ = ('base', 'changes')
+
+    def __init__(self, base, changes):
+        """
+        :param base: path index dict. Never changed.
+        :param changes: dict of path -> entry, or REMOVED, for the paths changed since base
+        """
+        self.base = base
+        self.changes = changes
+
+    def get(self, path, default=None):
+        entry = self.changes.get(path)
+        if entry is None:
+            return self.base.get(path, default)
+        return default if entry is REMOVED else entry
+
+    def __getitem__(self, path):
+        entry = self.get(path, REMOVED)
+        if entry is REMOVED:
+            raise KeyError(path)
+        return entry
+
+    def __contains__(self, path):
+        return self.get(path, REMOVED) is not REMOVED
+
+    def __setitem__(self, path, entry):
+        self.changes[path] = entry
+
+    def __delitem__(self, path):
+        if self.pop(path, REMOVED) is REMOVED:
+            raise KeyError(path)
+
+    def pop(self, path, default=None):
+        entry = self.get(path, REMOVED)
+        if entry is REMOVED:
+            return default
+        self.changes[path] = REMOVED
+        return entry
+
+    def items(self):
+        """
+        :return: generator of (path, entry), in the order of the base index with added paths last
+        """
+        base = self.base
+        changes = self.changes
+        for path, entry in base.items():
+            changed = changes.get(path)
+            if changed is None:
+                yield path, entry
+            elif changed is not REMOVED:
+                yield path, changed
+        for path, entry in changes.items():
+            if entry is not REMOVED and path not in base:
+                yield path, entry
+
+    def flatten(self):
+        """
+        Merges the changes into a copy of the base.
+        :return: path index dict
+        """
+        index = dict(self.base)
+        for path, entry in self.changes.items():
+            if entry is REMOVED:
+                index.pop(path, None)
+            else:
+                index[path] = entry
+        return index
+
+
+class Snapshot(object):
+    """
+    A version of the config: the config tree, its path index and the metadata index. Config publishes a new snapshot
+    by replacing its reference to the current one, so a snapshot is always complete and consistent.
+
+    In thread safe mode snapshots are never changed once published and can be read from any thread without locking.
+    Values returned are shared with the config and must not be modified.
+    """
+
+    __slots__ = ['config', 'index', 'meta_index', 'version']
+
+    def __init__(self, config, index, meta_index, version):
+        """
+        :param config: config tree
+        :param index: flattened dotted path -> (parent container, key)
+        :param meta_index: dotted path -> read only dict of all metakeys for that path
+        :param version: incremented for every change to the config
+        """
+        self.config = config
+        self.index = index
+        self.meta_index = meta_index
+        self.version = version
+
+    @classmethod
+    def build(cls, config, meta=None, meta_index=None, version=0):
+        """
+        Builds a snapshot from newly loaded trees.
+        :param config: config tree
+        :param meta: metadata tree. Optional.
+        :param meta_index: metadata index to use if meta is None.
+        :param version: version of the snapshot
+        :return: Snapshot
+        """
+        index = {}
+        index_tree(index, config, None)
+
+        if meta is not None:
+            meta_index = {}
+            index_meta(meta_index, meta, None)
+
+        return cls(config, index, {} if meta_index is None else meta_index, version)
+
+    def get(self, path):
+        """
+        Gets a config property value. See Config.get.
+        """
+        entry = self.index.get(path)
+        if entry is None:
+            return None
+
+        parent, key = entry
+        return parent[key]
+
+    def tree(self):
+        """
+        Gets the whole config tree as dicts.
+        :return: config tree
+        """
+        return self.config
+
+    def get_root_nodes(self):
+        """
+        Returns all root notes as a list. See Config.get_root_nodes.
+        """
+        return [] if self.config is None else list(self.config)
+
+    def get_meta(self, path, metakey):
+        """
+        Gets the metadata for a config property. See Config.get_meta.
+        """
+        return self.meta_index.get(path, NO_META).get(metakey)
+
+    def get_all_meta(self, path):
+        """
+        Gets all metadata for a config property. See Config.get_all_meta.
+        """
+        return self.meta_index.get(path, NO_META)
+
+    def set_in_place(self, changes):
+        """
+        Sets existing properties, changing this snapshot's tree and index.
+        :param changes: list of (path, value) to set. Paths must exist and must not be below other paths in changes.
+        :return: Snapshot for the next version, sharing this snapshot's tree and index
+        """
+        # An index left by thread safe mode is merged, as changes made in place don't need to be kept apart
+        if isinstance(self.index, LayeredIndex):
+            self.index = self.index.flatten()
+
+        for path, value in changes:
+            parent, key = self.index[path]
+            orig_value = parent[key]
+            parent[key] = value
+
+            # If a branch was replaced, or a leaf replaced by a branch, the paths below it have changed. Reindex them.
+            if isinstance(orig_value, dict):
+                unindex_tree(self.index, orig_value, path)
+            if isinstance(value, dict):
+                index_tree(self.index, value, path)
+
+        return Snapshot(self.config, self.index, self.meta_index, self.version + 1)
+
+    def set_copy_on_write(self, changes):
+        """
+        Sets existing properties without changing this snapshot. The branches from the root to each property are
+            copied once, all other branches are shared with this snapshot. The index is a LayeredIndex, so only the
+            entries for the copied branches are added, and the entries changed since the base index are copied. These
+            are merged into a new base once copying them costs more than merging, about every sqrt(2n) changed
+            entries for an index of n paths.
+        :param changes: list of (path, value) to set. Paths must exist and must not be below other paths in changes.
+        :return: Snapshot for the next version
+        """
+        if isinstance(self.index, LayeredIndex):
+            index = LayeredIndex(self.index.base, dict(self.index.changes))
+        else:
+            index = LayeredIndex(self.index, {})
+        copies = set()  # ids of the branches copied for the new snapshot. These can be changed.
+        root = self.config
+
+        for path, value in changes:
+            orig_parent, orig_key = index[path]
+            orig_value = orig_parent[orig_key]
+
+            # Copy each branch from the property up to the root, pointing the index at the copies. Stop at a branch
+            # that has already been copied, it is already linked to the root.
+            child_path, child_value = path, value
+            while True:
+                parent, key = index[child_path]
+                if id(parent) in copies:
+                    parent[key] = child_value
+                    break
+
+                branch = dict(parent)
+                branch[key] = child_value
+                copies.add(id(branch))
+                branch_path = parent_path(child_path, key)
+                for sibling in branch:
+                    index[join(branch_path, sibling)] = (branch, sibling)
+
+                if branch_path is None:
+                    root = branch
+                    break
+                child_path, child_value = branch_path, branch
+
+            if isinstance(orig_value, dict):
+                unindex_tree(index, orig_value, path)
+            if isinstance(value, dict):
+                index_tree(index, value, path)
+
+        if len(index.changes) * len(index.changes) > 2 * len(index.base):
+            index = index.flatten()
+        return Snapshot(root, index, self.meta_index, self.version + 1)
@@ -0,0 +1,235 @@
+import collections
+import sys
+import threading
+from wxconfig import config
+
+
+def resident_size(state):
+    """
+    Estimates the memory used by a config snapshot: its tree, path index and metadata index. Strings and numbers
+        shared between the tree and the indexes are counted once.
+    :param state: Snapshot or compact.CompactSnapshot
+    :return: estimated size in bytes
+    """
+    seen = set()
+    size = 0
+    pending = [state.config, state.index, state.meta_index]
+    while len(pending) > 0:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            pending.extend(obj)
+        elif hasattr(type(obj), '__slots__'):
+            # Branches and index of a compact tree
+            pending.extend(getattr(obj, name) for name in type(obj).__slots__)
+        elif hasattr(obj, 'items'):
+            # Read only metadata records
+            for key, value in obj.items():
+                pending.extend([key, value])
+
+    return size
+
+
+class ConfigStore(object):
+    """
+    Holds many named configs, for example one per tenant. Each is loaded on first access and has its own settings and
+    indexes. When more than max_configs are loaded, or they use more than max_bytes, the least recently used are
+    unloaded. An unloaded config is loaded again on its next access.
+
+    Configs are loaded, and saved when unloaded, without holding the store lock, so that loading or saving one config
+    doesn't block access to the others. Each config has its own guard, so that it is only loaded or unloaded by one
+    thread at a time.
+    """
+
+    def __init__(self, max_configs=128, max_bytes=None):
+        """
+        :param max_configs: maximum number of configs to hold loaded. None for no limit.
+        :param max_bytes: maximum estimated memory for the loaded configs. None for no limit. The most recently used
+            config is always held, even if it alone is larger.
+        """
+        self.max_configs = max_configs
+        self.max_bytes = max_bytes
+        self.__lock = threading.RLock()  # Held whilst changing the store. Never held whilst loading or saving.
+        self.__guards = {}  # name -> Lock held whilst loading or unloading the config
+        self.__sources = {}  # name -> function that loads a Config
+        self.__loaded = collections.OrderedDict()  # name -> (Config, size). Least recently used first.
+        self.__resident_bytes = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    def register(self, name, path, meta=None, cache_dir=None):
+        """
+        Registers a config file. The config isn't loaded until it is first got.
+        :param name: name of the config
+        :param path: path to config file. See Config.load.
+        :param meta: path to metadata file. See Config.load.
+        :param cache_dir: directory to cache parsed files in. See Config.load.
+        :return:
+        """
+        self.__register(name, lambda cfg: cfg.load(path, meta=meta, cache_dir=cache_dir))
+
+    def register_layers(self, name, layer_factory, meta=None, cache_dir=None):
+        """
+        Registers a layered config. The config isn't loaded until it is first got.
+        :param name: name of the config
+        :param layer_factory: function returning a new list of layers each time the config is loaded. See
+            Config.load_layers.
+        :param meta: path to metadata file. See Config.load.
+        :param cache_dir: directory to cache parsed metadata in. See Config.load.
+        :return:
+        """
+        self.__register(name, lambda cfg: cfg.load_layers(layer_factory(), meta=meta, cache_dir=cache_dir))
+
+    def unregister(self, name):
+        """
+        Unloads and removes a config.
+        :param name: name of the config
+        :return:
+        """
+        self.__unload(name)
+        with self.__lock:
+            del self.__sources[name]
+            self.__guards.pop(name, None)
+
+    def get(self, name):
+        """
+        Gets a config, loading it if it isn't loaded. Loading may unload the least recently used configs, saving
+            them. If a save fails its error is raised and that config stays loaded, the config got is still loaded.
+        :param name: name of the config
+        :return: Config
+        :raises KeyError: if no config is registered with name
+        """
+        cfg = self.__hit(name)
+        if cfg is not None:
+            return cfg
+
+        with self.__guard(name):
+            # Another thread may have loaded it whilst we waited
+            cfg = self.__hit(name)
+            if cfg is not None:
+                return cfg
+            with self.__lock:
+                load = self.__sources[name]
+                self.__misses += 1
+
+            cfg = config.Config.new_instance()
+            load(cfg)
+            size = resident_size(cfg.snapshot())
+            with self.__lock:
+                self.__loaded[name] = (cfg, size)
+                self.__resident_bytes += size
+
+        self.__evict()
+        return cfg
+
+    def names(self):
+        """
+        Gets the names of the registered configs.
+        :return: list of names
+        """
+        with self.__lock:
+            return list(self.__sources)
+
+    def stats(self):
+        """
+        Gets statistics for the store.
+        :return: dict of hits, misses, hit_rate, evictions, resident (configs loaded) and resident_bytes (estimated
+            memory used by the loaded configs, measured when each was loaded)
+        """
+        with self.__lock:
+            accesses = self.__hits + self.__misses
+            return {'hits': self.__hits, 'misses': self.__misses,
+                    'hit_rate': 0.0 if accesses == 0 else self.__hits / accesses,
+                    'evictions': self.__evictions, 'resident': len(self.__loaded),
+                    'resident_bytes': self.__resident_bytes}
+
+    def clear(self):
+        """
+        Unloads every config. They are loaded again on next access.
+        :return:
+        """
+        with self.__lock:
+            names = list(self.__loaded)
+        for name in names:
+            self.__unload(name)
+
+    def __register(self, name, load):
+        self.__unload(name)
+        with self.__lock:
+            self.__sources[name] = load
+
+    def __hit(self, name):
+        """
+        Gets a config if it is loaded, marking it as the most recently used.
+        :param name: name of the config
+        :return: Config. None if not loaded.
+        """
+        with self.__lock:
+            entry = self.__loaded.get(name)
+            if entry is None:
+                return None
+            self.__hits += 1
+            self.__loaded.move_to_end(name)
+            return entry[0]
+
+    def __guard(self, name):
+        """
+        :param name: name of the config
+        :return: Lock held whilst loading or unloading the config
+        """
+        with self.__lock:
+            return self.__guards.setdefault(name, threading.Lock())
+
+    def __evict(self):
+        """
+        Unloads the least recently used configs until within the limits.
+        :return:
+        """
+        # Choose the configs to unload, then unload them without holding the lock
+        with self.__lock:
+            victims = []
+            count = len(self.__loaded)
+            resident_bytes = self.__resident_bytes
+            for name, (_, size) in self.__loaded.items():
+                if count <= 1 or not ((self.max_configs is not None and count > self.max_configs) or
+                                      (self.max_bytes is not None and resident_bytes > self.max_bytes)):
+                    break
+                victims.append(name)
+                count -= 1
+                resident_bytes -= size
+
+        for name in victims:
+            if self.__unload(name):
+                with self.__lock:
+                    self.__evictions += 1
+
+    def __unload(self, name):
+        """
+        Unloads a config, saving any changes first. The config stays loaded if the save fails, or if it is changed
+            whilst being saved.
+        :param name: name of the config
+        :return: True if the config was unloaded
+        """
+        with self.__guard(name):
+            with self.__lock:
+                entry = self.__loaded.get(name)
+            if entry is None:
+                return False
+
+            cfg, size = entry
+            cfg.stop_watching()
+            cfg.stop_background_save()
+            cfg.save()
+            with self.__lock:
+                if self.__loaded.get(name) is not entry or cfg.dirty:
+                    return False
+                del self.__loaded[name]
+                self.__resident_bytes -= size
+            return True
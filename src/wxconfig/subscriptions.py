@@ -0,0 +1,164 @@
+import logging
+import queue
+import threading
+
+# Where subscribers callbacks are called
+CALLER = 'caller'  # On the thread that made the change, once the change has been published
+WORKER = 'worker'  # On a background thread, in the order that changes were made
+WX = 'wx'  # On the wx main thread, using wx.CallAfter
+
+
+class TrieNode(object):
+    """
+    Node of the subscription trie. There is a node for each key in the subscribed path prefixes.
+    """
+    __slots__ = ('children', 'subscribers')
+
+    def __init__(self):
+        self.children = {}  # key -> TrieNode
+        self.subscribers = ()  # tuple of (callback, deliver) subscribed to the path prefix ending at this node
+
+
+class Subscriptions(object):
+    """
+    Subscribers to changes to settings, indexed by path prefix in a trie so that publishing a change only visits the
+    subscribers whose prefixes are above or below the changed path.
+    """
+
+    def __init__(self):
+        self.__root = TrieNode()
+        self.__lock = threading.Lock()
+        self.__queue = None  # Queue of deliveries for the worker thread. Created when first needed.
+        self.__log = logging.getLogger(__name__)
+
+    def subscribe(self, path_prefix, callback, deliver=CALLER):
+        """
+        Subscribes to changes to settings at or below a path.
+        :param path_prefix: path separated by . None or '' for all settings.
+        :param callback: function taking a dict of changed path to new value
+        :param deliver: CALLER, WORKER or WX
+        :return:
+        """
+        if deliver not in (CALLER, WORKER, WX):
+            raise ValueError(f"Unknown delivery {deliver}.")
+
+        with self.__lock:
+            node = self.__root
+            for key in self.__keys(path_prefix):
+                child = node.children.get(key)
+                if child is None:
+                    child = TrieNode()
+                    node.children[key] = child
+                node = child
+            node.subscribers = node.subscribers + ((callback, deliver), )
+
+    def unsubscribe(self, path_prefix, callback):
+        """
+        Removes a subscription made with subscribe. Empty nodes are removed from the trie.
+        :param path_prefix: the path prefix subscribed to
+        :param callback: the function subscribed
+        :return:
+        """
+        with self.__lock:
+            nodes = [(None, self.__root)]
+            for key in self.__keys(path_prefix):
+                node = nodes[-1][1].children.get(key)
+                if node is None:
+                    return
+                nodes.append((key, node))
+
+            node = nodes[-1][1]
+            node.subscribers = tuple(x for x in node.subscribers if x[0] != callback)
+
+            # Prune nodes that no longer lead to a subscriber
+            for i in range(len(nodes) - 1, 0, -1):
+                key, node = nodes[i]
+                if len(node.subscribers) > 0 or len(node.children) > 0:
+                    break
+                del nodes[i - 1][1].children[key]
+
+    def publish(self, changes):
+        """
+        Delivers a batch of changes. Each subscriber is called once with the changes at or below its path prefix, or
+            above it where a branch containing it has changed.
+        :param changes: list of (path, new value)
+        :return:
+        """
+        batches = {}  # subscriber -> dict of path to value
+        with self.__lock:
+            for path, value in changes:
+                for subscriber in self.__match(path):
+                    batches.setdefault(subscriber, {})[path] = value
+
+        for (callback, deliver), batch in batches.items():
+            if deliver == CALLER:
+                self.__call(callback, batch)
+            elif deliver == WORKER:
+                self.__worker_queue().put((callback, batch))
+            else:
+                import wx
+                wx.CallAfter(self.__call, callback, batch)
+
+    def __match(self, path):
+        """
+        Gets the subscribers whose prefixes are at, above or below a path. Must be called holding the lock.
+        :param path: changed path
+        :return: list of subscribers
+        """
+        node = self.__root
+        matched = list(node.subscribers)
+        for key in path.split('.'):
+            node = node.children.get(key)
+            if node is None:
+                return matched
+            matched.extend(node.subscribers)
+
+        # Everything below the path has changed too
+        stack = list(node.children.values())
+        while len(stack) > 0:
+            node = stack.pop()
+            matched.extend(node.subscribers)
+            stack.extend(node.children.values())
+
+        return matched
+
+    @staticmethod
+    def __keys(path_prefix):
+        """
+        :param path_prefix: path separated by . None or '' for the root
+        :return: list of keys
+        """
+        return [] if path_prefix is None or path_prefix == '' else path_prefix.split('.')
+
+    def __call(self, callback, batch):
+        """
+        Calls a subscriber, logging rather than raising any exception so that other subscribers are still called.
+        :return:
+        """
+        try:
+            callback(batch)
+        except Exception:
+            self.__log.exception("Subscriber failed.")
+
+    def __worker_queue(self):
+        """
+        Gets the queue for the worker thread, starting the thread if not already started.
+        :return: Queue
+        """
+        with self.__lock:
+            if self.__queue is None:
+                self.__queue = queue.Queue()
+                threading.Thread(target=self.__run_worker, args=(self.__queue, ), name='wxconfig-subscriptions',
+                                 daemon=True).start()
+            return self.__queue
+
+    def __run_worker(self, deliveries):
+        """
+        Worker thread. Delivers changes in the order they were published.
+        :param deliveries: Queue of (callback, batch)
+        :return:
+        """
+        while True:
+            callback, batch = deliveries.get()
+            self.__call(callback, batch)
+            deliveries.task_done()
@@ -0,0 +1,67 @@
+class Transaction(object):
+    """
+    A group of changes to the config that are applied together, all or none, when the transaction completes. Use
+    Config.transaction to create.
+    """
+
+    def __init__(self, config, save):
+        """
+        :param config: the Config to change
+        :param save: True to save the config once the changes have been applied
+        """
+        self.__config = config
+        self.__save = save
+        self.__levels = []  # dict of path to value changed at each nesting level, outermost first
+
+    def get(self, path):
+        """
+        Gets a config property value, including changes set in this transaction.
+        :param path: path to property. Path separated by .
+        :return: property value
+        """
+        for changes in reversed(self.__levels):
+            if path in changes:
+                return changes[path]
+
+        return self.__config.get(path)
+
+    def set(self, path, value):
+        """
+        Sets a config property value when the transaction completes.
+        :param path: path to property. Path separated by .
+        :param value: Value to set property to
+        :return:
+        """
+        self.__levels[-1][path] = value
+
+    def set_many(self, mapping):
+        """
+        Sets config property values when the transaction completes.
+        :param mapping: dict of path to value
+        :return:
+        """
+        self.__levels[-1].update(mapping)
+
+    def enter(self):
+        """
+        Enters the transaction. Transactions can be nested, the changes are applied when the outermost completes.
+        :return: nesting depth
+        """
+        self.__levels.append({})
+        return len(self.__levels)
+
+    def exit(self, commit):
+        """
+        Exits the transaction. If commit is True, the changes made at this nesting level are added to the enclosing
+            level, or applied if this is the outermost transaction.
+        :param commit: False to discard the changes made at this nesting level
+        :return: True if the transaction has completed
+        """
+        changes = self.__levels.pop()
+        if commit and len(changes) > 0:
+            if len(self.__levels) > 0:
+                self.__levels[-1].update(changes)
+            else:
+                self.__config.set_many(changes, save=self.__save)
+
+        return len(self.__levels) == 0
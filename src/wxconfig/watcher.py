@@ -0,0 +1,108 @@
+import logging
+import os
+import threading
+
+
+def signature(path):
+    """
+    Gets a cheap signature of a file that changes when the file is modified or replaced.
+    :param path: path to file
+    :return: tuple of inode, size and modified time. None if the file doesn't exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def diff_trees(old, new, path=None):
+    """
+    Gets the paths that differ between two config trees. If a branch has been added, removed or replaced by a leaf,
+        every path below it is included.
+    :param old: old config tree
+    :param new: new config tree
+    :param path: path to old and new. None for the root of the config.
+    :return: list of changed paths
+    """
+    changed = []
+    old = old if isinstance(old, dict) else {}
+    new = new if isinstance(new, dict) else {}
+
+    for key in list(old) + [key for key in new if key not in old]:
+        key_path = f'{key}' if path is None else f'{path}.{key}'
+        old_value = old.get(key)
+        new_value = new.get(key)
+        old_exists = key in old
+        new_exists = key in new
+
+        if old_exists and new_exists and isinstance(old_value, dict) and isinstance(new_value, dict):
+            changed.extend(diff_trees(old_value, new_value, key_path))
+        elif old_exists != new_exists or type(old_value) is not type(new_value) or old_value != new_value:
+            changed.append(key_path)
+
+            # Include everything below a branch that has gone or appeared
+            if isinstance(old_value, dict) or isinstance(new_value, dict):
+                changed.extend(diff_trees(old_value if isinstance(old_value, dict) else {},
+                                          new_value if isinstance(new_value, dict) else {}, key_path))
+
+    return changed
+
+
+class FileWatcher(object):
+    """
+    Polls files on a background thread, calling a function when any of them change. The function is only called once
+    the files have been the same for two polls, so that files that are still being written aren't read.
+    """
+
+    def __init__(self, paths, on_change, interval):
+        """
+        Starts watching.
+        :param paths: paths of files to watch
+        :param on_change: function to call, on the watcher thread, when a file changes
+        :param interval: seconds between polls
+        """
+        self.__log = logging.getLogger(__name__)
+        self.__paths = list(paths)
+        self.__on_change = on_change
+        self.__interval = interval
+        self.__stopped = threading.Event()
+        self.__signatures = None
+        self.__pending = None  # signatures of changed files, seen at the last poll
+        self.ignore_changes()
+        self.__thread = threading.Thread(target=self.__run, name='wxconfig-watcher', daemon=True)
+        self.__thread.start()
+
+    def ignore_changes(self):
+        """
+        Treats the files as they are now as unchanged. Call after writing a watched file.
+        :return:
+        """
+        self.__signatures = [signature(path) for path in self.__paths]
+        self.__pending = None
+
+    def stop(self):
+        """
+        Stops watching.
+        :return:
+        """
+        self.__stopped.set()
+        if threading.current_thread() is not self.__thread:
+            self.__thread.join()
+
+    def __run(self):
+        while not self.__stopped.wait(self.__interval):
+            signatures = [signature(path) for path in self.__paths]
+            if signatures == self.__signatures:
+                self.__pending = None
+            elif signatures != self.__pending:
+                # Changed since the last poll. Wait until the files stop changing.
+                self.__pending = signatures
+            else:
+                self.__signatures = signatures
+                self.__pending = None
+                try:
+                    self.__on_change()
+                except Exception:
+                    self.__log.exception("Failed to handle file change.")
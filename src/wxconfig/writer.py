@@ -0,0 +1,133 @@
+import atexit
+import logging
+import os
+import tempfile
+import threading
+import yaml
+
+
+def dump_flow(value):
+    """
+    Dumps a value as yaml in flow style, on one line unless it is a multi line string.
+    :param value: the value
+    :return: yaml as str
+    """
+    text = yaml.dump(value, default_flow_style=True, width=float('inf'), allow_unicode=True)
+
+    # Scalars are dumped as a document with an end marker
+    if text.endswith('\n...\n'):
+        text = text[:-len('\n...\n')]
+    return text.rstrip('\n')
+
+
+def dump_yaml(tree):
+    """
+    Dumps a config tree as a yaml document, keeping the order of keys.
+    :param tree: config tree
+    :return: yaml document as str
+    """
+    return "---\n" + yaml.dump(tree, sort_keys=False) + "..."
+
+
+def atomic_write(path, data):
+    """
+    Writes a file atomically. Data is written to a temp file in the same directory which then replaces the file, so
+        a crash part way through can never leave a truncated file.
+    :param path: path to file
+    :param data: str or bytes to write
+    :return:
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb' if isinstance(data, bytes) else 'w') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+
+        # Keep the permissions of the file being replaced. mkstemp creates files readable only by the owner.
+        if os.path.exists(path):
+            os.chmod(temp_path, os.stat(path).st_mode & 0o7777)
+
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class BackgroundWriter(object):
+    """
+    Runs a write function on a background thread. All writes scheduled within delay seconds of the first are merged
+    into a single write.
+    """
+
+    def __init__(self, write, delay):
+        """
+        Starts the writer thread.
+        :param write: function to call to write.
+        :param delay: seconds to wait after a write is scheduled, merging further scheduled writes, before writing.
+        """
+        self.__log = logging.getLogger(__name__)
+        self.__write = write
+        self.__delay = delay
+        self.__pending = False
+        self.__stopped = False
+        self.__condition = threading.Condition()
+        self.__thread = threading.Thread(target=self.__run, name='wxconfig-writer', daemon=True)
+        self.__thread.start()
+
+        # Don't lose a pending write when the application exits
+        atexit.register(self.stop)
+
+    def schedule(self):
+        """
+        Schedules a write. Does nothing if a write is already scheduled.
+        :return:
+        """
+        with self.__condition:
+            if not self.__pending:
+                self.__pending = True
+                self.__condition.notify_all()
+
+    def flush(self):
+        """
+        Writes now on the calling thread if a write is scheduled.
+        :return:
+        """
+        with self.__condition:
+            pending = self.__pending
+            self.__pending = False
+
+        if pending:
+            self.__write()
+
+    def stop(self):
+        """
+        Stops the writer thread, writing first if a write is scheduled.
+        :return:
+        """
+        atexit.unregister(self.stop)
+        with self.__condition:
+            self.__stopped = True
+            self.__condition.notify_all()
+        self.__thread.join()
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(lambda: self.__pending or self.__stopped)
+                if not self.__pending:
+                    return
+
+                # Wait out the delay so that writes scheduled during it are merged. Stop ends the wait early.
+                self.__condition.wait_for(lambda: self.__stopped, timeout=self.__delay)
+                if not self.__pending:
+                    # Flushed whilst waiting
+                    continue
+                self.__pending = False
+
+            try:
+                self.__write()
+            except Exception:
+                self.__log.exception("Background write failed.")
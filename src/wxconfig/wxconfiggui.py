@@ -1,6 +1,8 @@
 import wx
+import wx.dataview
 import logging
 from wxconfig import Config
+from wxconfig import schema
 
 
 class SettingsDialog(wx.Dialog):
@@ -15,6 +17,9 @@ class SettingsDialog(wx.Dialog):
     # Store any settings that have changed
     changed_settings = {}
 
+    # Maximum number of search results to show
+    SEARCH_LIMIT = 100
+
     def __init__(self, parent, exclude=None):
         """
         Open the settings dialog
@@ -49,9 +54,10 @@ class SettingsDialog(wx.Dialog):
 
         self.SetTitle("Settings")
 
-        # Create logger and get config
+        # Create logger and get config, and the model of its settings which is kept between openings of the dialog
         self.__log = logging.getLogger(__name__)
         self.__settings = Config()
+        self.__model = self.__settings.settings_model()
 
         # Dict of changes. Will commit only on ok
         self.__changes = {}
@@ -66,21 +72,24 @@ class SettingsDialog(wx.Dialog):
         main_sizer = wx.BoxSizer(wx.VERTICAL)  # Notebook panel
         button_sizer = wx.BoxSizer(wx.HORIZONTAL)  # Button sizer
 
+        # Search box, and a list of matching settings that is shown whilst searching
+        self.__search = wx.SearchCtrl(self, wx.ID_ANY)
+        self.__search.ShowCancelButton(True)
+        self.__search_results = wx.ListBox(self, wx.ID_ANY, style=wx.LB_SINGLE)
+        self.__search_results.Hide()
+
         # Notebook
         self.__notebook = wx.Notebook(self, wx.ID_ANY)  # The notebook
 
-        # A tab for each root node in config. We will store the tabs components in lists which can be accessed by the
-        # index returned from notebook.GetSelectedItem()
-        root_nodes = self.__settings.get_root_nodes()
+        # A tab for each root node in config that isn't excluded. We will store the tabs components in lists which can
+        # be accessed by the index returned from notebook.GetSelectedItem()
         self.__tabs = []
-        for node in root_nodes:
-            # Exclude?
-            if node not in exclude:
-                # Create new tab
-                self.__tabs.append(SettingsTab(self, self.__notebook, node))
+        for node in self.__model.root_nodes(exclude):
+            # Create new tab
+            self.__tabs.append(SettingsTab(self, self.__notebook, node, self.__model))
 
-                # Add tab to notebook
-                self.__notebook.AddPage(self.__tabs[-1], node)
+            # Add tab to notebook
+            self.__notebook.AddPage(self.__tabs[-1], f"{node}")
 
         # Buttons
         button_ok = wx.Button(self, label="Update")
@@ -88,7 +97,9 @@ class SettingsDialog(wx.Dialog):
         button_sizer.Add(button_ok, 0, wx.ALL, 1)
         button_sizer.Add(button_cancel, 0, wx.ALL, 1)
 
-        # Add notebook and button sizer to main sizer and set main sizer for window
+        # Add search, notebook and button sizer to main sizer and set main sizer for window
+        main_sizer.Add(self.__search, 0, wx.ALL | wx.EXPAND, 5)
+        main_sizer.Add(self.__search_results, 0, wx.LEFT | wx.RIGHT | wx.EXPAND, 5)
         main_sizer.Add(self.__notebook, 1, wx.ALL | wx.EXPAND, 5)
         main_sizer.Add(button_sizer)
         self.SetSizer(main_sizer)
@@ -98,6 +109,11 @@ class SettingsDialog(wx.Dialog):
         button_cancel.Bind(wx.EVT_BUTTON, self.__on_cancel)
         self.Bind(wx.EVT_NOTEBOOK_PAGE_CHANGED, self.__on_page_select)
 
+        # Bind search
+        self.__search.Bind(wx.EVT_TEXT, self.__on_search)
+        self.__search.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, self.__on_search_cancel)
+        self.__search_results.Bind(wx.EVT_LISTBOX, self.__on_search_result)
+
         # Bind window close event
         self.Bind(wx.EVT_CLOSE, self.__on_close, self)
 
@@ -109,6 +125,44 @@ class SettingsDialog(wx.Dialog):
         index = self.__notebook.GetSelection()
         self.__tabs[index].select()
 
+    def __on_search(self, event):
+        # Show the settings matching the search text, excluding those that aren't in a tab.
+        matches = [path for path in self.__settings.search(self.__search.GetValue(), limit=self.SEARCH_LIMIT)
+                   if self.__get_tab_index(path) is not None]
+        self.__search_results.Set(matches)
+        self.__search_results.Show(len(matches) > 0)
+        self.Layout()
+
+    def __on_search_cancel(self, event):
+        self.__search.SetValue("")
+
+    def __on_search_result(self, event):
+        # Show the selected setting. If it is a leaf, show its branch and select it in the value panel.
+        path = event.GetString()
+        if path == "":
+            return
+
+        if self.__model.is_branch(path):
+            branch_path, leaf_path = path, None
+        else:
+            branch_path, leaf_path = path.rsplit('.', 1)[0], path
+
+        index = self.__get_tab_index(path)
+        self.__notebook.SetSelection(index)
+        self.__tabs[index].show_setting(branch_path, leaf_path)
+
+    def __get_tab_index(self, path):
+        """
+        Gets the index of the tab containing a setting
+        :param path: setting path
+        :return: tab index. None if the setting is not in any tab, or is a tabs root node.
+        """
+        for index, tab in enumerate(self.__tabs):
+            if path.startswith(f"{tab.root_node_name}."):
+                return index
+
+        return None
+
     def __on_cancel(self, event):
         # Clear changed settings and close
         self.changed_settings = {}
@@ -118,38 +172,53 @@ class SettingsDialog(wx.Dialog):
     def __on_ok(self, event):
         # Update settings and save
         delkeys = []
+        new_values = {}
+        orig_values = self.__settings.get_many(self.changed_settings)
         for setting in self.changed_settings:
             # Get the current and new setting
-            orig_value = self.__settings.get(setting)
+            orig_value = orig_values[setting]
             new_value = self.changed_settings[setting]
 
-            # We need to retain data type. New values will all be string as they were retrieved from textctl.
-            # Get the data type of the original and cast new to it. Note boolean needs to be handled differently as it
-            # doesn't cast directly.
-            if isinstance(orig_value, bool):
-                new_value = new_value.lower() in ['true', '1', 'yes', 't']
-            else:
-                new_value = type(orig_value)(new_value)
+            # New values will all be string as they were retrieved from textctl. Convert them to the __type in the
+            # settings metadata, or if it has none, to the type of the original value, then check the constraints.
+            try:
+                if self.__settings.get_meta(setting, '__type') is None:
+                    new_value = schema.convert_like(setting, new_value, orig_value)
+                new_value = self.__settings.validate(setting, new_value)
+            except ValueError as error:
+                wx.MessageBox(str(error), "Invalid setting", wx.OK | wx.ICON_ERROR, self)
+                return
 
             # If they are the same, discard from changes. We will use a list of items to delete (delkeys) as we cant
             # delete whilst iterating. If they are different, update settings.
             if orig_value == new_value:
                 delkeys.append(setting)
             else:
-                self.__settings.set(setting, new_value)
+                new_values[setting] = new_value
 
         # Now delete the items that were the same from changed_settings. changed_settings may be used by settings
         # dialog caller.
         for key in delkeys:
             del(self.changed_settings[key])
 
-        # Save the settings and close dialog
+        # Set the changed settings together, all or none. Save the settings, including the window position and size so
+        # that closing doesn't need to save again, and close dialog
+        self.__settings.set_many(new_values, save=False)
+        self.__store_window()
         self.__settings.save()
         self.EndModal(wx.ID_OK)
         self.Close()
 
     def __on_close(self, event):
-        # Save pos and size
+        # Save pos and size. Save only writes if they or the settings have changed.
+        self.__store_window()
+        self.__settings.save()
+
+        # Destroy
+        self.Destroy()
+
+    def __store_window(self):
+        # Pos and size
         x, y = self.GetPosition()
         width, height = self.GetSize()
         self.__settings.set('settings_window.x', x)
@@ -161,12 +230,6 @@ class SettingsDialog(wx.Dialog):
         style = self.GetWindowStyle()
         self.__settings.set('settings_window.style', style)
 
-        # Save
-        self.__settings.save()
-
-        # Destroy
-        self.Destroy()
-
 
 class SettingsTab(wx.Panel):
     """
@@ -184,16 +247,17 @@ class SettingsTab(wx.Panel):
     __tree = None
     __tab_sizer = None
 
-    # Currently displayed value panel. Will be switched when tree menu items are selected.
+    # Value panel. Created when a tree item is first selected and reused to show the values for other items.
     __current_value_panel = None
 
-    def __init__(self, parent_frame, notebook, root_node):
+    def __init__(self, parent_frame, notebook, root_node, model):
         """
         Creates a tab for the settings notebook.
 
         :param parent_frame: The frame containing the notebook.
         :param notebook. The notebook that this tab should be part of.
         :param root_node. The root node name for the settings
+        :param model. The SettingsModel to show the settings from
         """
         # Super Constructor
         wx.Panel.__init__(self, parent=notebook)
@@ -201,29 +265,33 @@ class SettingsTab(wx.Panel):
         # Store the parent frame and get the settings for this tab.
         self.__parent_frame = parent_frame
 
-        # Store the root node for this tab
+        # Store the root node for this tab and the model
         self.__root_node_name = root_node
+        self.__model = model
 
         # Create logger
         self.__log = logging.getLogger(__name__)
 
-        # Build the tab and set it's sizer.
+        # Set the tabs sizer. The tree is built when the tab is first selected, so that opening the dialog only
+        # builds the visible tab.
         self.__tab_sizer = wx.BoxSizer(wx.HORIZONTAL)
         self.SetSizer(self.__tab_sizer)
 
-        # Create tree control and add it to sizer
-        self.__tree = SettingsTree(self, self.__root_node_name)
-        self.__tab_sizer.Add(self.__tree, 1, wx.ALL | wx.EXPAND, 1)
-
-        # Bind tree selection changed
-        self.__tree.Bind(wx.EVT_TREE_SEL_CHANGED, self.__on_tree_select)
-
     def select(self):
         """
         To be called when this tab is selected. Populate value sizer for the selected item, If no item is selected,
         populate for root.
         :return:
         """
+        # Build the tree if this is the first time the tab has been selected
+        if self.__tree is None:
+            # Create tree control and add it to sizer
+            self.__tree = SettingsTree(self, self.__root_node_name, self.__model)
+            self.__tab_sizer.Add(self.__tree, 1, wx.ALL | wx.EXPAND, 1)
+
+            # Bind tree selection changed
+            self.__tree.Bind(wx.EVT_TREE_SEL_CHANGED, self.__on_tree_select)
+
         selected_item = self.__tree.GetSelection()
         if selected_item.ID is None:
             root_node = self.__tree.GetRootItem()
@@ -234,6 +302,25 @@ class SettingsTab(wx.Panel):
         # Set the panel
         self.__switch_value_panel(setting_path)
 
+    @property
+    def root_node_name(self):
+        """
+        The root node for this tab
+        """
+        return self.__root_node_name
+
+    def show_setting(self, branch_path, leaf_path=None):
+        """
+        Selects a branch in the tree, showing its values, and selects a leaf setting in the value panel.
+        :param branch_path: path of the branch to select
+        :param leaf_path: path of the leaf setting to select. Optional.
+        :return:
+        """
+        self.select()
+        self.__tree.select_path(branch_path)
+        if leaf_path is not None and self.__current_value_panel is not None:
+            self.__current_value_panel.select_setting(leaf_path)
+
     def __on_tree_select(self, event):
         """
         Called when an item in the tree is selected. Displays the correct settings panel
@@ -253,19 +340,18 @@ class SettingsTab(wx.Panel):
 
     def __switch_value_panel(self, setting_path):
         """
-        Switched the value panel to the correct one for the settings path
+        Switches the value panel to show the values for the settings path. The panel is created the first time and
+        reused after that.
         :param setting_path:
         :return:
         """
-        # Get current panel and delete.
-        if self.__current_value_panel is not None:
-            self.__current_value_panel.Destroy()
-
-        # Create the new value panel and add to sizer.
-        self.__current_value_panel = SettingsValuePanel(self.__parent_frame, self, setting_path)
-        self.__tab_sizer.Add(self.__current_value_panel, 1, wx.ALL | wx.EXPAND, 1)
+        # Create the value panel and add to sizer if this is the first time.
+        if self.__current_value_panel is None:
+            self.__current_value_panel = SettingsValuePanel(self.__parent_frame, self, self.__model)
+            self.__tab_sizer.Add(self.__current_value_panel, 1, wx.ALL | wx.EXPAND, 1)
 
-        # Redraw
+        # Show the values and redraw
+        self.__current_value_panel.show(setting_path)
         self.__tab_sizer.Layout()
 
 
@@ -277,66 +363,96 @@ class SettingsTree(wx.TreeCtrl):
     __root_node_name = None
     __helptext = {}
 
-    def __init__(self, settings_tab, settings_node):
+    def __init__(self, settings_tab, settings_node, model):
         """
         Creates a tree control for specified settings node.
 
         :param settings_tab. The settings_tab on which this tree control should be displayed.
         :param settings_node. The node name for the settings who's values will be presented
+        :param model. The SettingsModel to show the branches from
         """
         # Super Constructor
         wx.TreeCtrl.__init__(self, parent=settings_tab)
 
-        # Set root node
+        # Set root node and model
         self.__root_node_name = settings_node
+        self.__model = model
 
-        # Build the tree. Bind the
-        self.__build_tree(None, self.__root_node_name)
+        # Paths of the nodes whose children have been added. Children are added when a node is first expanded, so
+        # that the time taken to build the tree depends on what is shown, not on the size of the config.
+        self.__populated = set()
+
+        # Build the root of the tree. Bind expanding to add children, and tooltips.
+        root = self.AddRoot(f"{self.__root_node_name}")
+        self.SetItemData(root, self.__root_node_name)
+        self.__populate(root)
+        self.Bind(wx.EVT_TREE_ITEM_EXPANDING, self.__on_expanding)
         self.Bind(wx.EVT_TREE_ITEM_GETTOOLTIP, self.__display_tooltip)
 
         # Set max size. Width should be best size width, height should be auto (-1)
         best_width = self.GetBestSize()[0] * 2  # Hack, best size not working
         self.SetMaxSize((best_width, -1))
 
-    def __build_tree(self, node, node_name):
+    def select_path(self, path):
+        """
+        Selects the node for a settings path, adding and expanding the nodes above it.
+        :param path: settings path of a branch
+        :return:
         """
-        Recursive function to build the tree and value panels from the node using the settings
-        :param node: The tree view node to build from. If none, builds from root.
-        :param node_name. The name of the node to build from.
+        node = self.GetRootItem()
+        while self.GetItemData(node) != path:
+            # Find the child that is, or is above, the path
+            self.__populate(node)
+            child, cookie = self.GetFirstChild(node)
+            while child.IsOk():
+                child_path = self.GetItemData(child)
+                if path == child_path or path.startswith(f"{child_path}."):
+                    break
+                child, cookie = self.GetNextChild(node, cookie)
+
+            if not child.IsOk():
+                return
+            node = child
+
+        self.EnsureVisible(node)
+        self.SelectItem(node)
+
+    def __on_expanding(self, event):
         """
+        Adds the children of a node when it is expanded, if they haven't already been added.
+        :param event:
+        :return:
+        """
+        item = event.GetItem()
+        if item.IsOk():
+            self.__populate(item)
 
-        # Build root node if node is None
-        if node is None:
-            node = self.AddRoot(self.__root_node_name)
-            self.SetItemData(node, self.__root_node_name)
-
-        # Get settings
+    def __populate(self, node):
+        """
+        Adds the branches directly under a node to the tree. Branches that have branches under them are shown as
+            expandable, their children are added when they are expanded.
+        :param node: The tree view node to add the branches of.
+        """
+        # Nothing to do if already populated.
         node_path = self.GetItemData(node)
-        settings = Config().get(node_path)
-
-        # Iterate settings, adding branches. Recurse to add sub branches.
-        for setting in settings:
-            # Get settings path
-            settings_path = f"{self.GetItemData(node)}.{setting}"
-
-            # Get value. If dict, add the node and recursively call this function again.
-            value = settings[setting]
-            if type(value) is dict:
-                # Get metadata for branch if available
-                branch_name = Config().get_meta(settings_path, '__label')
-                branch_helptext = Config().get_meta(settings_path, '__helptext')
+        if node_path in self.__populated:
+            return
+        self.__populated.add(node_path)
 
-                # Add the node and set its settings path
-                node_id = self.AppendItem(node, setting if branch_name is None else branch_name)
-                self.SetItemData(node_id, settings_path)
+        # Add the branches, labelled from metadata by the model
+        for settings_path, branch_name, branch_helptext, has_branches in self.__model.branches(node_path):
+            # Add the node and set its settings path
+            node_id = self.AppendItem(node, branch_name)
+            self.SetItemData(node_id, settings_path)
 
-                # If there is helptext for the branch, store it against node_id. We will use it in get tool tip event
-                # handler.
-                if branch_helptext is not None:
-                    self.__helptext[node_id] = branch_helptext
+            # If there is helptext for the branch, store it against node_id. We will use it in get tool tip event
+            # handler.
+            if branch_helptext is not None:
+                self.__helptext[node_id] = branch_helptext
 
-                # Recurse
-                self.__build_tree(node_id, value)
+            # If the branch has branches under it, show it as expandable. They will be added when it is expanded.
+            if has_branches:
+                self.SetItemHasChildren(node_id, True)
 
     def __display_tooltip(self, event):
         """
@@ -350,91 +466,159 @@ class SettingsTree(wx.TreeCtrl):
             event.SetToolTip(helptext)
 
 
-class SettingsValuePanel(wx.ScrolledWindow):
+class SettingsValuePanel(wx.Panel):
     """
-    A panel containing text boxes for editing values for a settings node
+    A panel for editing the values for a settings node. Values are shown in a virtual list so that only the visible
+    rows are drawn, however many settings the node has. The panel is reused to show other nodes.
     """
 
-    __value_sizer = None
-    __value_boxes = []
-
-    def __init__(self, parent_frame, settings_tab, node):
+    def __init__(self, parent_frame, settings_tab, model):
         """
-        Creates a panel containing values for a settings node.
+        Creates a panel for editing values.
 
         :param parent_frame: The frame containing the notebook.
         :param settings_tab. The settings_tab on which this panel should be displayed.
-        :param node. The node name for the settings who's values will be presented
+        :param model. The SettingsModel to show the leaf settings from
         """
         # Super Constructor
-        wx.ScrolledWindow.__init__(self, parent=settings_tab)
+        wx.Panel.__init__(self, parent=settings_tab)
 
-        # Create logger
-        self.__log = logging.getLogger(__name__)
+        # Create the model and a view with a column for labels and an editable column for values.
+        self.__model = SettingsValueModel(parent_frame, model)
+        self.__view = wx.dataview.DataViewCtrl(self, wx.ID_ANY, style=wx.dataview.DV_ROW_LINES)
+        self.__view.AssociateModel(self.__model)
+        self.__view.AppendTextColumn("Setting", 0, width=200)
+        self.__view.AppendTextColumn("Value", 1, mode=wx.dataview.DATAVIEW_CELL_EDITABLE, width=300)
 
-        # Store the parent frame and get the settings for this node.
-        self.__parent_frame = parent_frame
-        self.__settings = Config().get(node)
+        # Help text for the selected setting is shown below the values
+        self.__help = wx.StaticText(self, wx.ID_ANY, "", style=wx.ALIGN_LEFT)
 
-        leaf_settings = {}
-        for setting in self.__settings:
-            if type(self.__settings[setting]) is not dict:
-                leaf_settings[setting] = self.__settings[setting]
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(self.__view, 1, wx.EXPAND)
+        sizer.Add(self.__help, 0, wx.ALL | wx.EXPAND, 2)
+        self.SetSizer(sizer)
 
-        # Add the value sizer for settings values.
-        self.__value_sizer = wx.FlexGridSizer(rows=len(leaf_settings), cols=2, vgap=2, hgap=2)
+        # Bind selection to show help text
+        self.__view.Bind(wx.dataview.EVT_DATAVIEW_SELECTION_CHANGED, self.__on_select)
 
-        # Add the sizer to the panel
-        self.SetSizer(self.__value_sizer)
+    def show(self, node):
+        """
+        Shows the values for a settings node.
+        :param node: The node name for the settings who's values will be presented
+        :return:
+        """
+        self.__model.show(node)
+        self.__set_help(None)
 
-        # Display every value
-        for setting in leaf_settings:
-            # Setting path
-            setting_path = f"{node}.{setting}"
+    def select_setting(self, setting_path):
+        """
+        Selects the row for a leaf setting.
+        :param setting_path: path of the setting
+        :return:
+        """
+        row = self.__model.get_row(setting_path)
+        if row is not None:
+            item = self.__model.GetItem(row)
+            self.__view.Select(item)
+            self.__view.EnsureVisible(item)
+            self.__set_help(row)
+
+    def __on_select(self, event):
+        item = event.GetItem()
+        self.__set_help(self.__model.GetRow(item) if item.IsOk() else None)
 
-            # Value. Make sure that we display changed value if already changed
-            if setting_path in self.__parent_frame.changed_settings:
-                value = self.__parent_frame.changed_settings[setting_path]
-            else:
-                value = leaf_settings[setting]
+    def __set_help(self, row):
+        """
+        Shows the help text for a row. If we have helptext defined in metadata, show it and set it as tooltip.
+        :param row: row index. None to clear.
+        :return:
+        """
+        help_text = None if row is None else self.__model.get_helptext(row)
+        self.__help.SetLabel("" if help_text is None else help_text)
+        self.__view.SetToolTip(help_text)
 
-            # Create the label. If we have a label defined in metadata, use it, else use the setting.
-            label_text = Config().get_meta(setting_path, '__label')
-            label_text = setting if label_text is None else label_text
-            label = wx.StaticText(self, wx.ID_ANY, label_text, style=wx.ALIGN_LEFT)
 
-            # Create the value box. If we have a helptext defined in metadata, set as tooltip.
-            help_text = Config().get_meta(setting_path, '__helptext')
-            self.__value_boxes.append(wx.TextCtrl(self, wx.ID_ANY, f"{value}", style=wx.ALIGN_LEFT))
-            if help_text is not None:
-                self.__value_boxes[-1].SetToolTip(help_text)
+class SettingsValueModel(wx.dataview.DataViewIndexListModel):
+    """
+    Model for the values of the leaf settings of a settings node. Column 0 is the label, column 1 is the value.
+    """
 
-            # Add label and value to value sizer
-            self.__value_sizer.AddMany([(label, 0, wx.EXPAND), (self.__value_boxes[-1], 0, wx.EXPAND)])
+    def __init__(self, parent_frame, settings_model):
+        """
+        Creates an empty model.
 
-            # Bind to text change. We need to generate a handler as this will have a parameter.
-            self.__value_boxes[-1].Bind(wx.EVT_TEXT, self.__get_on_change_evt_handler(setting_path=setting_path))
+        :param parent_frame: The frame containing the notebook. Changed values are stored in its changed_settings.
+        :param settings_model: The SettingsModel to get the leaf settings of each node from
+        """
+        # Super Constructor
+        wx.dataview.DataViewIndexListModel.__init__(self, 0)
 
-        # Layout the value sizer
-        self.__value_sizer.Layout()
+        # Create logger
+        self.__log = logging.getLogger(__name__)
 
-        # Setup scrollbars
-        self.SetScrollbars(1, 1, 1000, 1000)
+        # Store the parent frame. Rows are (setting path, label, help text) for each leaf setting.
+        self.__parent_frame = parent_frame
+        self.__settings_model = settings_model
+        self.__rows = []
 
-    def __get_on_change_evt_handler(self, setting_path):
+    def show(self, node):
         """
-        Returns a new event handler with a parameter of the settings path
-        :param setting_path:
+        Changes the model to hold the leaf settings of a settings node.
+        :param node: The node name
         :return:
         """
+        # Rows are shared with the settings model and must not be changed
+        self.__rows = self.__settings_model.leaves(node)
+        self.Reset(len(self.__rows))
+
+    def get_row(self, setting_path):
+        """
+        Gets the row for a setting.
+        :param setting_path: path of the setting
+        :return: row index. None if the setting isn't in the model.
+        """
+        for row, (path, _, _) in enumerate(self.__rows):
+            if path == setting_path:
+                return row
+
+        return None
+
+    def get_helptext(self, row):
+        """
+        Gets the help text for a row.
+        :param row: row index
+        :return: help text. None if there is none.
+        """
+        return self.__rows[row][2]
+
+    def GetColumnCount(self):
+        return 2
+
+    def GetColumnType(self, col):
+        return 'string'
+
+    def GetCount(self):
+        return len(self.__rows)
+
+    def GetValueByRow(self, row, col):
+        setting_path, label_text, _ = self.__rows[row]
+        if col == 0:
+            return label_text
+
+        # Value. Make sure that we display changed value if already changed
+        if setting_path in self.__parent_frame.changed_settings:
+            return self.__parent_frame.changed_settings[setting_path]
+        return f"{Config().get(setting_path)}"
 
-        def on_value_changed(event):
-            old_val = self.__settings.get(setting_path)
-            self.__parent_frame.changed_settings[setting_path] = event.String
-            self.__log.debug(f"Value changed from {old_val} to {self.__parent_frame.changed_settings[setting_path]} "
-                             f"for {setting_path}.")
+    def SetValueByRow(self, value, row, col):
+        if col != 1:
+            return False
 
-        return on_value_changed
+        setting_path = self.__rows[row][0]
+        old_val = Config().get(setting_path)
+        self.__parent_frame.changed_settings[setting_path] = value
+        self.__log.debug(f"Value changed from {old_val} to {value} for {setting_path}.")
+        return True
 
 
 if __name__ == '__main__':
@@ -0,0 +1,164 @@
+import bisect
+import datetime
+import yaml
+from wxconfig import cache
+from wxconfig import snapshot
+from wxconfig import writer
+
+MERGE_TAG = 'tag:yaml.org,2002:merge'
+
+# Styles of scalars that can be patched: plain, which libyaml reports as '', and quoted. Not block scalars.
+PATCHABLE_STYLES = (None, '', "'", '"')
+
+
+def render(value):
+    """
+    Renders a scalar value as yaml that can replace a scalar in a block mapping.
+    :param value: the value
+    :return: str. None if the value isn't a scalar or can't be written on one line.
+    """
+    if not isinstance(value, (str, int, float, bool, type(None), datetime.date)):
+        return None
+
+    text = writer.dump_flow(value)
+    return None if '\n' in text else text
+
+
+def check(text, changes):
+    """
+    Checks that a patched document can be parsed and has the changed values.
+    :param text: the patched document
+    :param changes: list of (path, value)
+    :return: True if the document is as expected
+    """
+    try:
+        tree = yaml.load(text, Loader=cache.Loader)
+    except yaml.YAMLError:
+        return False
+
+    for path, value in changes:
+        # Find the value by matching keys against the start of the path, as keys may contain .
+        branch, branch_path = tree, None
+        while True:
+            if not isinstance(branch, dict):
+                return False
+            for key in branch:
+                key_path = snapshot.join(branch_path, key)
+                if path == key_path or path.startswith(f'{key_path}.'):
+                    break
+            else:
+                return False
+            branch, branch_path = branch[key], key_path
+            if key_path == path:
+                break
+        if type(branch) is not type(value) or branch != value:
+            return False
+
+    return True
+
+
+class PatchableDocument(object):
+    """
+    A yaml document whose scalar values can be changed in place, keeping its comments and formatting. The position of
+    each scalar value in the document is recorded when it is composed, and kept up to date as the document is
+    patched.
+    """
+
+    def __init__(self, text, spans):
+        """
+        Use compose to create.
+        :param text: the document
+        :param spans: dict of path -> [start, end] character positions of each scalar value that can be patched
+        """
+        self.text = text
+        self.__spans = spans
+
+    @classmethod
+    def compose(cls, text):
+        """
+        Composes a document, recording the position of each scalar value in a block mapping. Block scalars, empty
+            values and values in flow collections aren't recorded, so changing them needs the whole document to be
+            written.
+        :param text: the document, without a byte order mark
+        :return: PatchableDocument. None if the document can't be patched, for example if it uses anchors or merge
+            keys, which can make one scalar the value of more than one path.
+        """
+        try:
+            root = yaml.compose(text, Loader=cache.Loader)
+        except yaml.YAMLError:
+            return None
+        if not isinstance(root, yaml.MappingNode):
+            return None
+
+        spans = {}
+        seen = set()  # ids of the nodes visited. A node visited twice is an alias.
+        stack = [(None, root)]
+        while len(stack) > 0:
+            path, node = stack.pop()
+            for key_node, value_node in node.value:
+                if key_node.tag == MERGE_TAG or id(value_node) in seen:
+                    return None
+                seen.add(id(value_node))
+
+                key = key_node.value if key_node.tag == cache.STR_TAG else \
+                    yaml.load(key_node.value, Loader=cache.Loader)
+                key_path = snapshot.join(path, key)
+                if isinstance(value_node, yaml.MappingNode):
+                    if not value_node.flow_style:
+                        stack.append((key_path, value_node))
+                elif isinstance(value_node, yaml.ScalarNode) and value_node.style in PATCHABLE_STYLES:
+                    start, end = value_node.start_mark.index, value_node.end_mark.index
+                    if end > start:
+                        spans[key_path] = [start, end]
+
+        return cls(text, spans)
+
+    def patch(self, changes):
+        """
+        Changes scalar values in place. The patched document is parsed to check that it has the changed values.
+        :param changes: list of (path, value)
+        :return: the patched document. None if any change can't be patched, in which case nothing is changed.
+        """
+        edits = []
+        for path, value in changes:
+            span = self.__spans.get(path)
+            text = None if span is None else render(value)
+            if text is None:
+                return None
+            edits.append((span[0], span[1], text, span))
+        edits.sort(key=lambda edit: edit[0])
+
+        # Build the patched document
+        pieces = []
+        position = 0
+        for start, end, text, _ in edits:
+            pieces.append(self.text[position:start])
+            pieces.append(text)
+            position = end
+        pieces.append(self.text[position:])
+        text = ''.join(pieces)
+        if not check(text, changes):
+            return None
+        self.text = text
+
+        # Move every span by the change in length of the edits before it
+        starts = []
+        shifts = []  # total change in length of the edits up to and including each edit
+        shift = 0
+        for start, end, text, span in edits:
+            starts.append(start)
+            shift += len(text) - (end - start)
+            shifts.append(shift)
+        edited = {id(edit[3]): edit[2] for edit in edits}
+        for span in self.__spans.values():
+            i = bisect.bisect_left(starts, span[0])
+            before = shifts[i - 1] if i > 0 else 0
+            text = edited.get(id(span))
+            if text is None:
+                span[0] += before
+                span[1] += before
+            else:
+                span[0] += before
+                span[1] = span[0] + len(text)
+
+        return self.text
@@ -1,5 +1,23 @@
+import asyncio
+import os
+import subprocess
+import shutil
+import sys
+import tempfile
+import threading
+import time
 import unittest
+import zlib
+from unittest import mock
 import wxconfig as cgf
+from wxconfig import backends
+from wxconfig import cache
+from wxconfig import layers
+from wxconfig import journal
+from wxconfig import lazyload
+from wxconfig import schema
+from wxconfig import subscriptions
+from wxconfig import writer
 
 
 class TestConfig(unittest.TestCase):
@@ -30,6 +48,34 @@ class TestConfig(unittest.TestCase):
         config.set(path, orig_value)
         config.save()
 
+    def test_get_missing(self):
+        config = cgf.Config()
+        config.load("testconfig.yaml")
+
+        # Missing leaves and branches, and paths through leaves, should all return None
+        self.assertTrue(config.get('test1.test1_2.missing') is None)
+        self.assertTrue(config.get('missing.test1_2') is None)
+        self.assertTrue(config.get('test1.test1_2.val1_2_1.missing') is None)
+
+        # Setting a missing path should not create it
+        config.set('test1.test1_2.missing', 'newval')
+        self.assertTrue(config.get('test1.test1_2.missing') is None)
+
+    def test_set_branch(self):
+        config = cgf.Config()
+        config.load("testconfig.yaml")
+
+        # Replace a branch. Paths under the old branch should no longer resolve, paths under the new one should.
+        config.set('test1.test1_2', {'new1': 'a', 'new2': {'new3': 'b'}})
+        self.assertTrue(config.get('test1.test1_2.val1_2_1') is None)
+        self.assertEqual(config.get('test1.test1_2.new1'), 'a')
+        self.assertEqual(config.get('test1.test1_2.new2.new3'), 'b')
+
+        # Replace the branch with a leaf
+        config.set('test1.test1_2', 'leaf')
+        self.assertEqual(config.get('test1.test1_2'), 'leaf')
+        self.assertTrue(config.get('test1.test1_2.new1') is None)
+
     def test_get_root_nodes(self):
         config = cgf.Config()
         config.load("testconfig.yaml")
@@ -76,6 +122,836 @@ class TestConfig(unittest.TestCase):
         self.assertTrue(label is None)
         self.assertTrue(helptext is None)
 
+    def test_get_all_meta(self):
+        config = cgf.Config()
+        config.load("testconfig.yaml", meta='testconfigmeta.yaml')
+
+        # All metakeys for a leaf should be returned together
+        meta = config.get_all_meta('test1.test1_1.val1_1_1')
+        self.assertEqual(dict(meta), {'__label': 'val 1.1.1', '__helptext': 'Value 1.1.1 Leaf'})
+
+        # Paths without metadata should return an empty dict
+        self.assertEqual(len(config.get_all_meta('test1.test1_2')), 0)
+        self.assertEqual(len(config.get_all_meta('missing')), 0)
+
+    def test_import_without_wx(self):
+        # Importing wxconfig and using Config should not import wx. Run in a fresh interpreter.
+        script = "import sys, wxconfig; wxconfig.Config().load('testconfig.yaml'); print('wx' in sys.modules)"
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        output = subprocess.run([sys.executable, '-c', script], env=env, check=True, capture_output=True, text=True)
+        self.assertEqual(output.stdout.strip(), 'False', "wx was imported.")
+
+    def test_load_cache(self):
+        config = cgf.Config()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = shutil.copy("testconfig.yaml", directory)
+            cache_dir = os.path.join(directory, 'cache')
+
+            # First load should parse and write the cache
+            config.load(path, cache_dir=cache_dir)
+            self.assertTrue(os.path.exists(cache.cache_filepath(path, cache_dir)), "Cache file wasn't written.")
+
+            # Second load should come from cache and return the same values
+            config.load(path, cache_dir=cache_dir)
+            self.assertEqual(config.get('test1.test1_2.val1_2_1'), 'val1_2_1')
+
+            # Changing the file should invalidate the cache
+            config.set('test1.test1_2.val1_2_1', 'newval')
+            config.save()
+            config.load(path, cache_dir=cache_dir)
+            self.assertEqual(config.get('test1.test1_2.val1_2_1'), 'newval', "Stale cache was used.")
+
+    def test_save_only_if_dirty(self):
+        config = cgf.Config()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = shutil.copy("testconfig.yaml", directory)
+            config.load(path)
+            self.assertFalse(config.dirty)
+
+            with mock.patch('os.replace', wraps=os.replace) as replace:
+                # Nothing changed, or set to the same value. Shouldn't write.
+                config.save()
+                config.set('test1.test1_2.val1_2_1', 'val1_2_1')
+                config.save()
+                self.assertEqual(replace.call_count, 0, "Unchanged config was written.")
+
+                # Changed. Should write once, and be clean afterwards.
+                config.set('test1.test1_2.val1_2_1', 'newval')
+                self.assertTrue(config.dirty)
+                config.save()
+                config.save()
+                self.assertEqual(replace.call_count, 1)
+                self.assertFalse(config.dirty)
+
+            # Only the config file should remain, no temp files.
+            self.assertEqual(os.listdir(directory), ['testconfig.yaml'])
+
+    def test_background_save(self):
+        config = cgf.Config()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = shutil.copy("testconfig.yaml", directory)
+            config.load(path)
+
+            with mock.patch('os.replace', wraps=os.replace) as replace:
+                # A burst of saves should be merged into a single write
+                config.start_background_save(delay=0.2)
+                for i in range(10):
+                    config.set('test1.test1_2.val1_2_1', f'newval{i}')
+                    config.save()
+                config.stop_background_save()
+                self.assertEqual(replace.call_count, 1, "Saves were not merged.")
+
+            config.load(path)
+            self.assertEqual(config.get('test1.test1_2.val1_2_1'), 'newval9')
+
+    def test_reload(self):
+        config = cgf.Config()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = shutil.copy("testconfig.yaml", directory)
+            config.load(path)
+
+            # Edit the file outside of config
+            with open(path) as file:
+                text = file.read()
+            with open(path, 'w') as file:
+                file.write(text.replace("val1_2_1: val1_2_1", "val1_2_1: edited").replace("  test2_2:", "  test2_3:"))
+
+            changed = []
+            config.add_reload_listener(changed.extend)
+            try:
+                config.reload()
+            finally:
+                config.remove_reload_listener(changed.extend)
+
+            # Only the changed paths should be notified. Renamed branches should include everything under them.
+            self.assertEqual(config.get('test1.test1_2.val1_2_1'), 'edited')
+            self.assertEqual(sorted(changed), sorted([
+                'test1.test1_2.val1_2_1',
+                'test2.test2_2', 'test2.test2_2.val2_2_1', 'test2.test2_2.val2_2_2', 'test2.test2_2.val2_2_3',
+                'test2.test2_3', 'test2.test2_3.val2_2_1', 'test2.test2_3.val2_2_2', 'test2.test2_3.val2_2_3']))
+
+    def test_watch(self):
+        config = cgf.Config()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = shutil.copy("testconfig.yaml", directory)
+            config.load(path)
+
+            reloaded = threading.Event()
+
+            def listener(changed):
+                reloaded.set()
+
+            config.add_reload_listener(listener)
+            config.start_watching(interval=0.05)
+            try:
+                # Our own saves shouldn't be reloaded
+                config.set('test1.test1_2.val1_2_1', 'saved')
+                config.save()
+                self.assertFalse(reloaded.wait(0.3), "Own save was reloaded.")
+
+                # Edits by anything else should be
+                with open(path) as file:
+                    text = file.read()
+                with open(path, 'w') as file:
+                    file.write(text.replace("val1_2_2: val1_2_2", "val1_2_2: edited"))
+                self.assertTrue(reloaded.wait(5), "Changed file was not reloaded.")
+                self.assertEqual(config.get('test1.test1_2.val1_2_2'), 'edited')
+
+                # An emptied file isn't reloaded
+                reloaded.clear()
+                open(path, 'w').close()
+                self.assertFalse(reloaded.wait(0.5), "Empty file was reloaded.")
+                self.assertEqual(config.get('test1.test1_2.val1_2_2'), 'edited')
+            finally:
+                config.stop_watching()
+                config.remove_reload_listener(listener)
+
+    def test_thread_safe_snapshots(self):
+        config = cgf.Config()
+        config.load("testconfig.yaml")
+        config.set_thread_safe()
+        try:
+            # A snapshot shouldn't see changes made after it was taken
+            before = config.snapshot()
+            config.set('test1.test1_2.val1_2_1', 'newval')
+            after = config.snapshot()
+            self.assertEqual(before.get('test1.test1_2.val1_2_1'), 'val1_2_1')
+            self.assertEqual(after.get('test1.test1_2.val1_2_1'), 'newval')
+            self.assertEqual(config.get('test1.test1_2.val1_2_1'), 'newval')
+            self.assertEqual(before.get('test1.test1_2')['val1_2_1'], 'val1_2_1')
+            self.assertGreater(after.version, before.version)
+
+            # Unchanged branches should be shared, not copied
+            self.assertIs(before.get('test2'), after.get('test2'))
+
+            # Readers on other threads should always see a value set by the writer, never a partial change
+            errors = []
+
+            def read():
+                for _ in range(2000):
+                    state = config.snapshot()
+                    branch = state.get('test1.test1_2')
+                    if branch['val1_2_1'] != state.get('test1.test1_2.val1_2_1'):
+                        errors.append(branch)
+
+            readers = [threading.Thread(target=read) for _ in range(4)]
+            for reader in readers:
+                reader.start()
+            for i in range(500):
+                config.set('test1.test1_2.val1_2_1', f'newval{i}')
+            for reader in readers:
+                reader.join()
+            self.assertEqual(errors, [])
+
+            # Replaced branches are indexed, and earlier snapshots keep their paths, across many changes
+            before = config.snapshot()
+            for i in range(50):
+                config.set('test2.test2_1', {'new': {'value': i}})
+                config.set('test2.test2_1.new.value', i + 1)
+            self.assertEqual(config.get('test2.test2_1.new.value'), 50)
+            self.assertTrue(config.get('test2.test2_1.val2_1_1') is None)
+            self.assertEqual(before.get('test2.test2_1.val2_1_1'), 'val1_1_1')
+            self.assertTrue(before.get('test2.test2_1.new') is None)
+        finally:
+            config.set_thread_safe(False)
+        config.set('test2.test2_1.new.value', 0)
+        self.assertEqual(config.get('test2.test2_1'), {'new': {'value': 0}})
+
+    def test_get_many_and_set_many(self):
+        config = cgf.Config()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = shutil.copy("testconfig.yaml", directory)
+            config.load(path)
+
+            values = config.get_many(['test1.test1_1.val1_1_1', 'test2.test2_1.val2_1_1', 'missing'])
+            self.assertEqual(values, {'test1.test1_1.val1_1_1': 'val1_1_1', 'test2.test2_1.val2_1_1': 'val1_1_1',
+                                      'missing': None})
+
+            # A missing path or overlapping paths should set nothing
+            self.assertRaises(KeyError, config.set_many, {'test1.test1_1.val1_1_1': 'new', 'test1.missing': 'new'})
+            self.assertRaises(ValueError, config.set_many, {'test1.test1_1.val1_1_1': 'new', 'test1.test1_1': {}})
+            self.assertEqual(config.get('test1.test1_1.val1_1_1'), 'val1_1_1')
+            self.assertFalse(config.dirty)
+
+            # All should be set and saved once, in both modes
+            for thread_safe in [False, True]:
+                config.load(path)
+                config.set_thread_safe(thread_safe)
+                with mock.patch('os.replace', wraps=os.replace) as replace:
+                    config.set_many({'test1.test1_1.val1_1_1': f'new{thread_safe}',
+                                     'test1.test1_1.val1_1_2': f'new{thread_safe}',
+                                     'test2.test2_1': {'val2_1_1': 'new'}})
+                    self.assertEqual(replace.call_count, 1)
+                config.set_thread_safe(False)
+
+                config.load(path)
+                self.assertEqual(config.get('test1.test1_1.val1_1_1'), f'new{thread_safe}')
+                self.assertEqual(config.get('test1.test1_1.val1_1_2'), f'new{thread_safe}')
+                self.assertEqual(config.get('test2.test2_1.val2_1_1'), 'new')
+                self.assertTrue(config.get('test2.test2_1.val2_1_2') is None)
+
+    def test_transaction(self):
+        config = cgf.Config()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = shutil.copy("testconfig.yaml", directory)
+            config.load(path)
+
+            # Changes should only be set when the transaction completes
+            with config.transaction() as txn:
+                txn.set('test1.test1_1.val1_1_1', 'new1')
+                with config.transaction() as inner:
+                    inner.set('test1.test1_1.val1_1_2', 'new2')
+                self.assertEqual(txn.get('test1.test1_1.val1_1_2'), 'new2')
+                self.assertEqual(config.get('test1.test1_1.val1_1_2'), 'val1_1_2')
+            self.assertEqual(config.get_many(['test1.test1_1.val1_1_1', 'test1.test1_1.val1_1_2']),
+                             {'test1.test1_1.val1_1_1': 'new1', 'test1.test1_1.val1_1_2': 'new2'})
+            self.assertFalse(config.dirty, "Transaction was not saved.")
+
+            # Changes should be discarded if the transaction fails
+            with self.assertRaises(RuntimeError):
+                with config.transaction() as txn:
+                    txn.set('test1.test1_1.val1_1_1', 'new3')
+                    raise RuntimeError()
+            self.assertEqual(config.get('test1.test1_1.val1_1_1'), 'new1')
+
+            # A failed nested transaction discards only its own changes
+            with config.transaction() as txn:
+                txn.set('test1.test1_1.val1_1_1', 'new4')
+                with self.assertRaises(RuntimeError):
+                    with config.transaction() as inner:
+                        inner.set('test1.test1_1.val1_1_2', 'new5')
+                        raise RuntimeError()
+            self.assertEqual(config.get_many(['test1.test1_1.val1_1_1', 'test1.test1_1.val1_1_2']),
+                             {'test1.test1_1.val1_1_1': 'new4', 'test1.test1_1.val1_1_2': 'new2'})
+
+    def test_search(self):
+        config = cgf.Config()
+        config.load("testconfig.yaml", meta='testconfigmeta.yaml')
+
+        # Search paths, keys, labels and helptext, case insensitive
+        self.assertEqual(config.search('val1_2_3'), ['test1.test1_2.val1_2_3'])
+        self.assertEqual(config.search('TEST 1.1 BRANCH'), ['test1.test1_1'])
+        self.assertEqual(config.search('value 1.1.'), ['test1.test1_1.val1_1_1', 'test1.test1_1.val1_1_2',
+                                                       'test1.test1_1.val1_1_3', 'test1.test1_2.val1_2_1'])
+        self.assertEqual(config.search('test2_2.', limit=2), ['test2.test2_2.val2_2_1', 'test2.test2_2.val2_2_2'])
+        self.assertEqual(config.search('nothing'), [])
+
+        # Short searches match the start of words
+        self.assertEqual(config.search('te'), config.search('test'))
+
+        # Replacing a branch should update the results
+        config.set('test2.test2_2', {'found': 1})
+        self.assertEqual(config.search('found'), ['test2.test2_2.found'])
+
+    def test_layers(self):
+        config = cgf.Config()
+
+        with tempfile.TemporaryDirectory() as directory:
+            defaults = shutil.copy("testconfig.yaml", directory)
+            site = os.path.join(directory, 'site.yaml')
+            with open(site, 'w') as file:
+                file.write("test1:\n  test1_1:\n    val1_1_1: site\n    val1_1_2: site\n")
+
+            with mock.patch.dict(os.environ, {'TESTCFG_TEST1__TEST1_1__VAL1_1_2': '12'}):
+                config.load_layers([layers.FileLayer(defaults), layers.FileLayer(site, name='site'),
+                                    layers.DictLayer({'test2': {'test2_1': {'val2_1_1': 'dict'}}}),
+                                    layers.EnvLayer('TESTCFG_')])
+
+            # Higher layers should override lower ones, leaving the rest
+            self.assertEqual(config.get('test1.test1_1.val1_1_1'), 'site')
+            self.assertEqual(config.get('test1.test1_1.val1_1_2'), 12)
+            self.assertEqual(config.get('test1.test1_1.val1_1_3'), 'val1_1_3')
+            self.assertEqual(config.get('test2.test2_1.val2_1_1'), 'dict')
+            self.assertEqual(config.get_root_nodes(), ['test1', 'test2'])
+
+            # Saving should write only to the layer that owns the changed setting
+            with open(defaults) as file:
+                defaults_text = file.read()
+            config.set('test1.test1_1.val1_1_1', 'newsite')
+            config.save()
+            with open(defaults) as file:
+                self.assertEqual(file.read(), defaults_text, "Defaults layer was written.")
+            with open(site) as file:
+                self.assertIn('newsite', file.read())
+
+            # Updating a layer should merge only what changed
+            test1 = config.get('test1')
+            changed = config.update_layer('dict', {'test2': {'test2_1': {'val2_1_1': 'new'}, 'test2_3': {'a': 1}}})
+            self.assertEqual(sorted(changed), ['test2.test2_1.val2_1_1', 'test2.test2_3', 'test2.test2_3.a'])
+            self.assertEqual(config.get('test2.test2_1.val2_1_1'), 'new')
+            self.assertEqual(config.get('test2.test2_3.a'), 1)
+            self.assertEqual(config.get('test2.test2_2.val2_2_1'), 'val1_2_1')
+            self.assertIs(config.get('test1'), test1, "Unchanged branch was merged again.")
+
+            # Removing the override should restore the value from the layer below
+            config.update_layer('dict', {})
+            self.assertEqual(config.get('test2.test2_1.val2_1_1'), 'val1_1_1')
+            self.assertTrue(config.get('test2.test2_3') is None)
+
+    def test_config_store(self):
+        store = cgf.ConfigStore(max_configs=2)
+
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ['a', 'b', 'c']:
+                store.register(name, shutil.copy("testconfig.yaml", os.path.join(directory, f'{name}.yaml')))
+
+            # Configs should be independent of each other and of the singleton
+            config_a = store.get('a')
+            config_b = store.get('b')
+            config_b.set('test1.test1_1.val1_1_1', 'b')
+            self.assertIsNot(config_a, cgf.Config())
+            self.assertEqual(config_a.get('test1.test1_1.val1_1_1'), 'val1_1_1')
+            self.assertIs(store.get('a'), config_a)
+
+            # Loading a third should unload the least recently used, saving its changes. It should be loaded again on
+            # next access.
+            store.get('c')
+            stats = store.stats()
+            self.assertEqual((stats['resident'], stats['evictions'], stats['hits'], stats['misses']), (2, 1, 1, 3))
+            self.assertGreater(stats['resident_bytes'], 0)
+            self.assertEqual(stats['hit_rate'], 0.25)
+            self.assertIsNot(store.get('b'), config_b)
+            self.assertEqual(store.get('b').get('test1.test1_1.val1_1_1'), 'b')
+            self.assertEqual(store.stats()['evictions'], 2)
+
+            # A config that fails to save when unloaded should stay loaded with its changes
+            config_b = store.get('b')
+            config_b.set('test1.test1_1.val1_1_1', 'unsaved')
+            with mock.patch.object(cgf.Config, 'save', side_effect=OSError):
+                store.get('c')
+                self.assertRaises(OSError, store.get, 'a')
+            self.assertIs(store.get('b'), config_b)
+            self.assertTrue(config_b.dirty)
+
+            # Loading one config shouldn't block getting another that is loaded
+            loading = threading.Event()
+            release = threading.Event()
+
+            def load(cfg, path, **kwargs):
+                loading.set()
+                release.wait(5)
+                return original_load(cfg, path, **kwargs)
+
+            original_load = cgf.Config.load
+            store.register('slow', os.path.join(directory, 'c.yaml'))
+            with mock.patch.object(cgf.Config, 'load', autospec=True, side_effect=load):
+                thread = threading.Thread(target=store.get, args=('slow',))
+                thread.start()
+                self.assertTrue(loading.wait(5))
+                getter = threading.Thread(target=store.get, args=('b',))
+                getter.start()
+                getter.join(5)
+                self.assertFalse(getter.is_alive())
+                release.set()
+                thread.join(5)
+
+            self.assertRaises(KeyError, store.get, 'missing')
+
+    def test_lazy_load(self):
+        config = cgf.Config()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = shutil.copy("testconfig.yaml", directory)
+            parse = mock.patch('wxconfig.lazyload.LazyDocument.parse', autospec=True,
+                               side_effect=lazyload.LazyDocument.parse)
+            with parse as parsed:
+                config.load(path, lazy=True)
+
+                # Root nodes shouldn't need parsing
+                self.assertEqual(config.get_root_nodes(), ['test1', 'test2'])
+                self.assertEqual(parsed.call_count, 0)
+
+                # Only the root node used should be parsed
+                self.assertEqual(config.get('test2.test2_1.val2_1_1'), 'val1_1_1')
+                self.assertTrue(config.get('test2.missing') is None)
+                self.assertEqual(parsed.call_count, 1)
+
+                # Saving should parse and save everything
+                config.set('test2.test2_1.val2_1_1', 'newval')
+                config.save()
+                self.assertEqual(parsed.call_count, 2)
+
+            config.load(path)
+            self.assertEqual(config.get('test2.test2_1.val2_1_1'), 'newval')
+            self.assertEqual(config.get('test1.test1_1.val1_1_1'), 'val1_1_1')
+
+            # Documents that can't be split should be loaded in full
+            with open(path, 'w') as file:
+                file.write("a: &anchor\n  b: 1\nc: *anchor\n")
+            config.load(path, lazy=True)
+            self.assertEqual(config.get('c.b'), 1)
+
+            # Block scalars ending a root node keep their final line break
+            with open(path, 'w') as file:
+                file.write("a: |\n  line one\n  line two\nb: >\n  folded\n  text\nc: 1\n")
+            config.load(path)
+            full = [config.get('a'), config.get('b')]
+            config.load(path, lazy=True)
+            self.assertEqual([config.get('a'), config.get('b')], full)
+            self.assertEqual(full, ['line one\nline two\n', 'folded text\n'])
+
+    def test_instrumentation(self):
+        config = cgf.Config.new_instance()
+        self.assertTrue(config.stats() is None)
+
+        hooked = []
+        recorder = config.enable_instrumentation()
+        recorder.add_hook(lambda operation, seconds, path: hooked.append((operation, path)))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = shutil.copy("testconfig.yaml", directory)
+            config.load(path)
+            size = os.path.getsize(path)
+            config.get('test1.test1_1.val1_1_1')
+            config.get('test1.test1_1.val1_1_1')
+            config.get('test1.missing')
+            config.set('test1.test1_1.val1_1_1', 'newval')
+            config.save()
+
+            stats = config.stats()
+            self.assertEqual(stats['operations']['get']['count'], 3)
+            self.assertEqual(stats['operations']['get']['misses'], 1)
+            self.assertEqual(stats['operations']['set']['count'], 1)
+            self.assertEqual(stats['paths']['test1.test1_1.val1_1_1'], 3)
+            self.assertEqual(stats['bytes_read'], size)
+            self.assertEqual(stats['bytes_written'], os.path.getsize(path))
+            self.assertIn(('get', 'test1.missing'), hooked)
+
+        # Disabling should restore the uninstrumented methods
+        config.disable_instrumentation()
+        self.assertTrue(config.stats() is None)
+        self.assertFalse('get' in vars(config))
+
+    def test_async(self):
+        config = cgf.Config.new_instance()
+
+        async def run(path):
+            await config.aload(path)
+            self.assertEqual(config.get('test1.test1_1.val1_1_1'), 'val1_1_1')
+
+            # Concurrent saves are written one at a time
+            config.set('test1.test1_1.val1_1_1', 'newval')
+            writes = mock.patch('wxconfig.writer.atomic_write', autospec=True, side_effect=writer.atomic_write)
+            with writes as written:
+                await asyncio.gather(config.asave(), config.asave(), config.asave())
+            self.assertEqual(written.call_count, 1)
+            self.assertFalse(config.dirty)
+
+            # Gets whilst reloading see the old config until the new one is published
+            with open(path, 'r') as file:
+                text = file.read()
+            with open(path, 'w') as file:
+                file.write(text.replace('newval', 'reloaded'))
+            reload = asyncio.ensure_future(config.areload())
+            self.assertEqual(config.get('test1.test1_1.val1_1_1'), 'newval')
+            self.assertEqual(await reload, ['test1.test1_1.val1_1_1'])
+            self.assertEqual(config.get('test1.test1_1.val1_1_1'), 'reloaded')
+
+        with tempfile.TemporaryDirectory() as directory:
+            asyncio.run(run(shutil.copy("testconfig.yaml", directory)))
+
+    def test_subscribe(self):
+        config = cgf.Config.new_instance()
+        config.load("testconfig.yaml")
+
+        test1, test1_1, root = [], [], []
+        config.subscribe('test1', test1.append)
+        config.subscribe('test1.test1_1.val1_1_1', test1_1.append)
+        config.subscribe(None, root.append)
+
+        # Only subscribers to the path, or to paths above or below it, are called
+        config.set('test2.test2_1.val2_1_1', 'newval')
+        self.assertEqual((test1, test1_1), ([], []))
+        self.assertEqual(root, [{'test2.test2_1.val2_1_1': 'newval'}])
+
+        # Changes made together are delivered together
+        with config.transaction(save=False) as txn:
+            txn.set('test1.test1_1.val1_1_1', 'a')
+            txn.set('test1.test1_1.val1_1_2', 'b')
+        self.assertEqual(test1, [{'test1.test1_1.val1_1_1': 'a', 'test1.test1_1.val1_1_2': 'b'}])
+        self.assertEqual(test1_1, [{'test1.test1_1.val1_1_1': 'a'}])
+
+        # Setting a branch is delivered to subscribers below it
+        config.set('test1.test1_1', {'val1_1_1': 'c', 'val1_1_2': 'd'})
+        self.assertEqual(test1_1[-1], {'test1.test1_1': {'val1_1_1': 'c', 'val1_1_2': 'd'}})
+
+        # Reloads are delivered on a worker thread
+        delivered = threading.Event()
+        reloaded = []
+        config.unsubscribe('test1', test1.append)
+        config.subscribe('test1', lambda changes: (reloaded.append(changes), delivered.set()),
+                         deliver=subscriptions.WORKER)
+        config.reload()
+        self.assertTrue(delivered.wait(5))
+        self.assertEqual(reloaded[0]['test1.test1_1.val1_1_1'], 'val1_1_1')
+        self.assertEqual(len(test1), 2)
+
+    def test_shared_snapshot(self):
+        config = cgf.Config.new_instance()
+        config.load("testconfig.yaml", meta="testconfigmeta.yaml")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'config.shared')
+            self.assertEqual(config.publish_shared(path), 1)
+
+            shared = cgf.SharedSnapshot(path)
+            self.assertEqual(shared.generation, 1)
+            self.assertEqual(shared.get_root_nodes(), config.get_root_nodes())
+            self.assertEqual(shared.get('test1.test1_1.val1_1_1'), 'val1_1_1')
+            self.assertEqual(shared.get('test1'), config.get('test1'))
+            self.assertEqual(list(shared.get('test1')), list(config.get('test1')))
+            self.assertTrue(shared.get('test1.missing') is None)
+            self.assertEqual(shared.get_all_meta('test1'), config.get_all_meta('test1'))
+            self.assertEqual(shared.get_meta('test1', '__label'), config.get_meta('test1', '__label'))
+
+            # Workers pick up newer snapshots when they refresh
+            self.assertFalse(shared.refresh())
+            config.set('test1.test1_1.val1_1_1', 'newval')
+            self.assertEqual(config.publish_shared(path), 2)
+            self.assertEqual(shared.get('test1.test1_1.val1_1_1'), 'val1_1_1')
+            self.assertTrue(shared.refresh())
+            self.assertEqual(shared.generation, 2)
+            self.assertEqual(shared.get('test1.test1_1.val1_1_1'), 'newval')
+
+    def test_journal(self):
+        config = cgf.Config.new_instance()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = shutil.copy("testconfig.yaml", directory)
+            with open(path, 'rb') as file:
+                original = file.read()
+
+            config.load(path)
+            config.start_journal(max_bytes=1024 * 1024, max_age=3600)
+
+            # Saves append to the journal, leaving the config file unchanged
+            config.set('test1.test1_1.val1_1_1', 'a')
+            config.save()
+            config.set('test1.test1_1', {'val1_1_1': 'b', 'val1_1_2': 'c'})
+            config.set('test1.test1_1.val1_1_1', 'd')
+            config.save()
+            with open(path, 'rb') as file:
+                self.assertEqual(file.read(), original)
+
+            # The journal is replayed on load. A partly written record at its end is ignored.
+            with open(journal.journal_filepath(path), 'ab') as file:
+                file.write(b'\x40\x00')
+            other = cgf.Config.new_instance()
+            other.load(path)
+            self.assertEqual(other.get('test1.test1_1'), {'val1_1_1': 'd', 'val1_1_2': 'c'})
+
+            # Compacting saves the config file and empties the journal
+            config.compact()
+            self.assertEqual(os.path.getsize(journal.journal_filepath(path)), 0)
+            other.load(path)
+            self.assertEqual(other.get('test1.test1_1'), {'val1_1_1': 'd', 'val1_1_2': 'c'})
+
+            # The journal is compacted once it reaches max_bytes
+            config.start_journal(max_bytes=1, max_age=3600)
+            config.set('test2.test2_1.val2_1_1', 'e')
+            config.save()
+            for _ in range(100):
+                if os.path.getsize(journal.journal_filepath(path)) == 0:
+                    break
+                time.sleep(0.05)
+            self.assertEqual(os.path.getsize(journal.journal_filepath(path)), 0)
+            config.stop_journal()
+            self.assertFalse(os.path.exists(journal.journal_filepath(path)))
+            other.load(path)
+            self.assertEqual(other.get('test2.test2_1.val2_1_1'), 'e')
+
+            # Changes below a branch replaced earlier in the journal are replayed
+            config.set_thread_safe(True)
+            config.start_journal(max_bytes=1024 * 1024, max_age=3600)
+            config.set('test1.test1_2', {'a': 1})
+            config.set('test1.test1_2.a', 2)
+            config.save()
+            with open(journal.journal_filepath(path), 'rb') as file:
+                record = file.read()
+            config.stop_journal()
+
+            # A journal left behind by a crash is replayed, and isn't replayed over a later save without a journal
+            with open(path, 'wb') as file:
+                file.write(original)
+            with open(journal.journal_filepath(path), 'wb') as file:
+                file.write(record)
+            other.load(path)
+            self.assertEqual(other.get('test1.test1_2'), {'a': 2})
+            other.set('test1.test1_2.a', 3)
+            other.save()
+            self.assertFalse(os.path.exists(journal.journal_filepath(path)))
+            other.load(path)
+            self.assertEqual(other.get('test1.test1_2'), {'a': 3})
+
+            # Records are data only, so a journal can't run code when loaded
+            payload = b"[[test1.test1_2.a, !!python/object/apply:os.getpid []]]"
+            with open(journal.journal_filepath(path), 'wb') as file:
+                file.write(journal.RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            other.load(path)
+            self.assertEqual(other.get('test1.test1_2'), {'a': 3})
+            os.remove(journal.journal_filepath(path))
+
+    def test_sqlite_backend(self):
+        config = cgf.Config.new_instance()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'config.db')
+            backends.SqliteBackend(path).write(backends.YamlBackend("testconfig.yaml").read())
+            yaml_config = cgf.Config.new_instance()
+            yaml_config.load("testconfig.yaml")
+
+            config.load(backends.SqliteBackend(path))
+            self.assertEqual(config.get('test1'), yaml_config.get('test1'))
+            self.assertEqual(list(config.get('test1')), list(yaml_config.get('test1')))
+            self.assertEqual(config.get_root_nodes(), yaml_config.get_root_nodes())
+
+            # Saves update the rows for the changed settings
+            config.set('test1.test1_1.val1_1_1', 'newval')
+            config.set('test2.test2_1', {'a': 1, 'b': {'c': [1, 2]}})
+            config.save()
+            with backends.SqliteBackend(path).connect() as connection:
+                rows = connection.execute("SELECT path, value FROM settings WHERE path LIKE 'test2.test2_1%' "
+                                          "OR path = 'test1.test1_1.val1_1_1' ORDER BY path").fetchall()
+            self.assertEqual(rows, [('test1.test1_1.val1_1_1', 'newval'), ('test2.test2_1', None),
+                                    ('test2.test2_1.a', '1'), ('test2.test2_1.b', None),
+                                    ('test2.test2_1.b.c', '[1, 2]')])
+
+            # Loaded lazily, only the root nodes used are read
+            other = cgf.Config.new_instance()
+            with mock.patch('wxconfig.backends.SqliteBackend.read_branch', autospec=True,
+                            side_effect=backends.SqliteBackend.read_branch) as read:
+                other.load(backends.SqliteBackend(path), lazy=True)
+                self.assertEqual(other.get_root_nodes(), ['test1', 'test2'])
+                self.assertEqual(other.get('test1.test1_1.val1_1_1'), 'newval')
+                self.assertEqual(read.call_count, 1)
+                self.assertEqual(other.get('test2.test2_1'), {'a': 1, 'b': {'c': [1, 2]}})
+                self.assertEqual(read.call_count, 2)
+
+    def test_save_preserves_format(self):
+        config = cgf.Config.new_instance()
+        text = ("# Settings\n"
+                "test1:\n"
+                "  val1: 'one'   # the first value\n"
+                "  val2: 2\n"
+                "  list: [1, 2]\n"
+                "test2: {val3: 3}\n")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'config.yaml')
+            with open(path, 'w') as file:
+                file.write(text)
+            config.load(path)
+
+            # Changed scalar values are patched in place, keeping comments and formatting
+            config.set('test1.val1', 'é un')
+            config.set('test1.val2', True)
+            config.save()
+            config.set('test1.val1', 'three')
+            config.save()
+            with open(path, 'rb') as file:
+                self.assertEqual(file.read().decode(), text.replace("'one'", "three").replace('2\n', 'true\n', 1))
+
+            # Other changes write the whole file
+            config.set('test1.list', [3])
+            config.save()
+            other = cgf.Config.new_instance()
+            other.load(path)
+            self.assertEqual(other.get('test1'), {'val1': 'three', 'val2': True, 'list': [3]})
+            with open(path, 'r') as file:
+                self.assertFalse('#' in file.read())
+
+            # Files with a byte order mark and non ascii values are patched in the right place, keeping the mark
+            with open(path, 'wb') as file:
+                file.write('\ufeffa:\n  x: é  # accent\n  y: two\n'.encode())
+            config.load(path)
+            config.set('a.y', 'Z')
+            config.save()
+            with open(path, 'rb') as file:
+                self.assertEqual(file.read().decode(), '\ufeffa:\n  x: é  # accent\n  y: Z\n')
+            other.load(path)
+            self.assertEqual(other.get('a'), {'x': 'é', 'y': 'Z'})
+
+    def test_validation(self):
+        config = cgf.Config.new_instance()
+
+        with tempfile.TemporaryDirectory() as directory:
+            meta_path = os.path.join(directory, 'meta.yaml')
+            with open(meta_path, 'w') as file:
+                file.write("test1:\n"
+                           "  test1_1:\n"
+                           "    val1_1_1: {__type: int, __min: 1, __max: 10}\n"
+                           "    val1_1_2: {__choices: [a, b]}\n"
+                           "    val1_1_3: {__type: str, __pattern: '[a-z]+'}\n"
+                           "test2:\n"
+                           "  test2_1:\n"
+                           "    val2_1_1: {__type: bool}\n")
+            config.load("testconfig.yaml", meta=meta_path)
+
+            # Values are converted to their type
+            config.set('test1.test1_1.val1_1_1', '5')
+            self.assertEqual(config.get('test1.test1_1.val1_1_1'), 5)
+            self.assertEqual(config.validate('test2.test2_1.val2_1_1', 'yes'), True)
+            self.assertEqual(config.validate('test2.test2_2.val2_2_1', 'anything'), 'anything')
+
+            # Invalid values are rejected
+            self.assertRaises(ValueError, config.set, 'test1.test1_1.val1_1_1', 11)
+            self.assertRaises(ValueError, config.set, 'test1.test1_1.val1_1_1', 'five')
+            self.assertRaises(ValueError, config.set, 'test1.test1_1.val1_1_2', 'c')
+            self.assertRaises(ValueError, config.set, 'test1.test1_1.val1_1_3', 'ABC')
+            self.assertRaises(ValueError, config.set_many, {'test1.test1_1.val1_1_2': 'b',
+                                                            'test2.test2_1.val2_1_1': 'maybe'})
+            self.assertEqual(config.get('test1.test1_1.val1_1_1'), 5)
+            self.assertEqual(config.get('test1.test1_1.val1_1_2'), 'val1_1_2')
+
+            # Values entered as strings for settings without a __type are converted to the current values type, then
+            # checked against the constraints
+            limited = schema.compile_validator('limited', {'__min': 1, '__max': 10})
+            self.assertEqual(limited(schema.convert_like('limited', '5', 3)), 5)
+            self.assertRaises(ValueError, limited, schema.convert_like('limited', '11', 3))
+            self.assertRaises(ValueError, schema.convert_like, 'limited', 'five', 3)
+            choices = schema.compile_validator('choices', {'__choices': [1, 2]})
+            self.assertEqual(choices(schema.convert_like('choices', '1', 2)), 1)
+            self.assertEqual(schema.convert_like('text', '1', 'a'), '1')
+
+            # Invalid constraints are rejected when loaded
+            with open(meta_path, 'w') as file:
+                file.write("test1: {__type: decimal}\n")
+            self.assertRaises(ValueError, config.load, "testconfig.yaml", meta=meta_path)
+
+    def test_compact(self):
+        config = cgf.Config.new_instance()
+        text = ("zeta:\n"
+                "  b: 1\n"
+                "  a: {2: two, 1: one}\n"
+                "alpha: [1, 2]\n")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'config.yaml')
+            with open(path, 'w') as file:
+                file.write(text)
+            config.load(path, compact=True)
+
+            # Settings are got as for a config stored as dicts, in the order of the file
+            self.assertEqual(config.get_root_nodes(), ['zeta', 'alpha'])
+            self.assertEqual(config.get('zeta.a.1'), 'one')
+            self.assertEqual(config.get('zeta'), {'b': 1, 'a': {2: 'two', 1: 'one'}})
+            self.assertEqual(list(config.get('zeta.a')), [2, 1])
+            self.assertTrue(config.get('zeta.missing') is None)
+            self.assertTrue(config.get('alpha.missing') is None)
+
+            # Set, in place and copy on write, keeping earlier snapshots unchanged
+            config.set('zeta.a.2', 'deux')
+            config.set_thread_safe(True)
+            before = config.snapshot()
+            config.set_many({'zeta.b': 3, 'zeta.a': {'c': 'd'}})
+            config.set_thread_safe(False)
+            self.assertEqual(before.get('zeta'), {'b': 1, 'a': {2: 'deux', 1: 'one'}})
+            self.assertEqual(config.get('zeta.a.c'), 'd')
+            self.assertEqual(config.search('zeta.a.c'), ['zeta.a.c'])
+
+            # Saved in the order of the file
+            config.save()
+            other = cgf.Config.new_instance()
+            other.load(path)
+            self.assertEqual(other.get_root_nodes(), ['zeta', 'alpha'])
+            self.assertEqual(other.get('zeta'), {'b': 3, 'a': {'c': 'd'}})
+            self.assertEqual(other.get('alpha'), [1, 2])
+
+    def test_settings_model(self):
+        config = cgf.Config.new_instance()
+        config.load("testconfig.yaml", meta="testconfigmeta.yaml")
+        model = config.settings_model()
+        self.assertTrue(config.settings_model() is model)
+
+        # Structure, labels and help text, as shown in the settings dialog
+        self.assertEqual(model.root_nodes(['test2']), ['test1'])
+        self.assertEqual(model.branches('test1')[0], ('test1.test1_1', 'Test 1.1', 'Test 1.1 Branch', False))
+        self.assertEqual(model.leaves('test1.test1_1')[0], ('test1.test1_1.val1_1_1', 'val 1.1.1', 'Value 1.1.1 Leaf'))
+        self.assertTrue(model.is_branch('test1.test1_2'))
+        self.assertFalse(model.is_branch('test1.test1_2.val1_2_1'))
+
+        # Setting leaves keeps the model, replacing a leaf with a branch updates it
+        leaves = model.leaves('test1.test1_2')
+        config.set('test1.test1_2.val1_2_1', 'newval')
+        self.assertTrue(model.leaves('test1.test1_2') is leaves)
+        config.set('test1.test1_2.val1_2_1', {'a': 1})
+        self.assertEqual([path for path, _, _ in model.leaves('test1.test1_2')],
+                         ['test1.test1_2.val1_2_2', 'test1.test1_2.val1_2_3'])
+        self.assertEqual(model.branches('test1')[1][3], True)
+        self.assertEqual(model.leaves('test1.test1_2.val1_2_1'), [('test1.test1_2.val1_2_1.a', 'a', None)])
+
+        # Reloading starts again
+        config.reload()
+        self.assertEqual(len(model.leaves('test1.test1_2')), 3)
+        self.assertEqual(model.branches('test1')[1][3], False)
+
 
 if __name__ == '__main__':
     unittest.main()